@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Memory allocated and time taken to serve a request, by I/O path.
+
+A caller sends requests echoing payloads of growing size over a socket
+pair, one at a time, to a server loop in this process reading them in
+one of three ways:
+    --  makefile :: a text file over the socket, read line by line, as
+        orb.Request and the lab1 Request used to.
+    --  recv :: recv() into new bytes, joined to what came before and
+        sliced, as orb.Channel used to.
+    --  wire :: recv_into() a preallocated wire.ReceiveBuffer, decoded
+        in place, and the response sent with wire.send_buffers().
+The decoding and running of the request is the same in all three. For
+every path, the time per request and the peak of the memory allocated
+while serving it, also as a multiple of the payload, are reported.
+
+"""
+
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import tracemalloc
+
+sys.path.append("../modules")
+from Common import orb
+from Common import wire
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Allocations and time per request of the I/O paths."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-s", "--sizes", metavar="BYTES", dest="sizes", type=int, nargs="+",
+    default=[64, 4096, 262144, 4194304],
+    help="Payload sizes. Default: 64 4096 262144 4194304."
+)
+parser.add_argument(
+    "-n", "--requests", metavar="N", dest="requests", type=int, default=500,
+    help="Requests timed for the smallest payloads; fewer are sent for "
+         "the large ones. Default: 500."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class Echo(object):
+
+    def echo(self, text):
+        return text
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def makefile_server(conn):
+    stream = conn.makefile(mode="rw")
+
+    def serve():
+        message = json.loads(stream.readline())
+        stream.write(orb.encode_response(orb.execute(Echo(), message)))
+        stream.flush()
+    return serve
+
+
+def recv_server(conn):
+    state = {"buffer": b""}
+
+    def serve():
+        buffer = state["buffer"]
+        while b"\n" not in buffer:
+            buffer += conn.recv(65536)
+        end = buffer.find(b"\n")
+        line, state["buffer"] = buffer[:end], buffer[end + 1:]
+        message = json.loads(line.decode())
+        conn.sendall(
+            orb.encode_response(orb.execute(Echo(), message)).encode())
+    return serve
+
+
+def wire_server(conn):
+    received = wire.ReceiveBuffer()
+
+    def serve():
+        message = json.loads(str(received.read_line(conn), "utf-8"))
+        response = orb.execute(Echo(), message)
+        wire.send_buffers(conn, [json.dumps(response, default=str).encode(),
+                                 b"\n"])
+    return serve
+
+
+PATHS = [
+    ("makefile", makefile_server),
+    ("recv", recv_server),
+    ("wire", wire_server),
+]
+
+
+def caller(sock, request, count):
+    received = wire.ReceiveBuffer()
+    for i in range(count):
+        sock.sendall(request)
+        received.read_line(sock)
+
+
+def measure(server, size, count, traced):
+    """Serve count requests of size bytes; return the seconds and the
+    peak bytes allocated per request."""
+
+    request = (json.dumps({"method": "echo", "args": ["x" * size]}) +
+               "\n").encode()
+    ours, theirs = socket.socketpair()
+    serve = server(ours)
+    client = threading.Thread(target=caller, args=(theirs, request, count))
+    client.start()
+    peaks = []
+    start = time.perf_counter()
+    for i in range(count):
+        if traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        serve()
+        if traced:
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    elapsed = time.perf_counter() - start
+    client.join()
+    ours.close()
+    theirs.close()
+    return elapsed / count, sum(peaks) / len(peaks) if peaks else 0
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+print("{:>9} {:<9} {:>12} {:>14} {:>10}".format(
+    "bytes", "path", "us/request", "peak KiB/req", "x payload"))
+for size in opts.sizes:
+    count = max(10, min(opts.requests, opts.requests * 4096 // size))
+    for name, server in PATHS:
+        # Warm up, then time without tracing and trace without timing.
+        measure(server, size, 3, False)
+        seconds, peak = measure(server, size, count, False)
+        tracemalloc.start()
+        ignored, peak = measure(server, size, count, True)
+        tracemalloc.stop()
+        print("{:>9} {:<9} {:>12.1f} {:>14.1f} {:>10.1f}".format(
+            size, name, seconds * 1e6, peak / 1024, peak / size))
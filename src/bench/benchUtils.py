@@ -0,0 +1,64 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Helpers shared by the benchmarks.
+
+The benchmarks import this module by name, being in the same directory.
+
+"""
+
+import math
+import time
+import random
+import socket
+
+
+def free_port(low=40001, high=50000):
+    """Return a port in [low, high) nobody listens to.
+
+    The port is probed by binding it: after many connections, ports of
+    the range may still be in TIME_WAIT even though nobody listens.
+
+    """
+
+    while True:
+        port = random.randrange(low, high)
+        probe = socket.socket()
+        try:
+            probe.bind(("", port))
+            return port
+        except OSError:
+            continue
+        finally:
+            probe.close()
+
+
+def wait_for(predicate, timeout=30.0):
+    """Wait until predicate() holds, taking its errors as false."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise Exception("Timed out waiting for the servers")
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of the values, NaN if there
+    are none."""
+
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[min(rank, len(values)) - 1]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Bulk load of fortunes into a lab5 server replica.
+
+It starts a local name service and a lab5 server on a copy of the
+database, then loads the same number of fortunes with write_local in
+several ways: one call per fortune, over a connection per call or a
+persistent one, and batches of calls sent with Stub.call_many() or
+Stub.batch(). The fortunes loaded per second and the round trips made
+are reported for each.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append("../modules")
+from Common import orb
+from Server.database import Database
+from benchUtils import free_port, wait_for
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Load fortunes one call at a time or in batches."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--fortunes", metavar="N", dest="fortunes", type=int, default=2000,
+    help="Fortunes loaded in every mode. Default: 2000."
+)
+parser.add_argument(
+    "-b", "--batch", metavar="SIZE", dest="batch", type=int, default=100,
+    help="Calls sent in one batch. Default: 100."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file",
+    default=os.path.join(here, "..", "lab5", "dbs", "fortune.db"),
+    help="Database copied for the server. Default: lab5's fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def chunks(fortunes):
+    for i in range(0, len(fortunes), opts.batch):
+        yield fortunes[i:i + opts.batch]
+
+
+def load_single(address, persistent, fortunes):
+    stub = orb.Stub(address, persistent)
+    for fortune in fortunes:
+        stub.write_local(fortune)
+    return len(fortunes)
+
+
+def load_call_many(address, persistent, fortunes):
+    stub = orb.Stub(address, persistent)
+    trips = 0
+    for chunk in chunks(fortunes):
+        for result in stub.call_many([("write_local", [fortune])
+                                      for fortune in chunk]):
+            if isinstance(result, Exception):
+                raise result
+        trips += 1
+    return trips
+
+
+def load_batch(address, persistent, fortunes):
+    stub = orb.Stub(address, persistent)
+    trips = 0
+    for chunk in chunks(fortunes):
+        with stub.batch() as batch:
+            calls = [batch.write_local(fortune) for fortune in chunk]
+        for call in calls:
+            call.result()
+        trips += 1
+    return trips
+
+
+MODES = [
+    ("single", load_single, False),
+    ("single-persistent", load_single, True),
+    ("call_many", load_call_many, False),
+    ("call_many-persistent", load_call_many, True),
+    ("batch", load_batch, False),
+]
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+workdir = tempfile.mkdtemp(prefix="bulkload-")
+processes = []
+try:
+    ns_port = free_port()
+    env = dict(os.environ, TDDD25_NAME_SERVICE="localhost:{}".format(ns_port))
+    processes.append(subprocess.Popen(
+        [sys.executable, "nameService.py", "-p", str(ns_port)],
+        cwd=os.path.join(here, "..", "nameService"), env=env,
+        stdout=subprocess.DEVNULL))
+    name_service = orb.Stub(("localhost", ns_port))
+    wait_for(lambda: name_service.require_all("bench") is not None)
+
+    db_file = os.path.join(workdir, "fortune.db")
+    shutil.copyfile(opts.file, db_file)
+    before = len(Database(db_file))
+    processes.append(subprocess.Popen(
+        [sys.executable, "serverPeer.py", "--headless", "-t", "bench",
+         "-f", db_file, "-p", str(free_port())],
+        cwd=os.path.join(here, "..", "lab5"), env=env,
+        stdout=subprocess.DEVNULL))
+    wait_for(lambda: len(name_service.require_all("bench")) == 1)
+    address = tuple(name_service.require_all("bench")[0][1])
+
+    print("{:<21} {:>8} {:>8} {:>12}".format(
+        "mode", "trips", "seconds", "fortunes/s"))
+    for name, load, persistent in MODES:
+        fortunes = ["Fortune {} loaded by {}.".format(i, name)
+                    for i in range(opts.fortunes)]
+        start = time.perf_counter()
+        trips = load(address, persistent, fortunes)
+        elapsed = time.perf_counter() - start
+        print("{:<21} {:>8} {:>8.2f} {:>12.0f}".format(
+            name, trips, elapsed, len(fortunes) / elapsed))
+
+    # Every fortune has been written, whatever the way.
+    loaded = len(Database(db_file)) - before
+    print("Fortunes loaded: {} of {}".format(loaded,
+                                             opts.fortunes * len(MODES)))
+finally:
+    # The server goes first so that it can unregister.
+    for process in reversed(processes):
+        process.terminate()
+        process.wait()
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of read_many(k) against k calls of read().
+
+Fortunes are read k at a time, first from a Database in this process
+and then from a lab1 server, started on a copy of the database, through
+connect-per-call stubs as the clients use. Every row gives the fortunes
+read per second with k calls of read() and with one call of
+read_many(k).
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append("../modules")
+from Common import orb
+from Server.database import Database
+from benchUtils import free_port
+
+here = os.path.dirname(os.path.abspath(__file__))
+modules = os.path.join(here, "..", "modules")
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Fortunes per second read with read() and read_many()."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-k", "--count", metavar="K", dest="counts", type=int, nargs="+",
+    default=[1, 10, 100, 1000],
+    help="Numbers of fortunes read at a time. Default: 1 10 100 1000."
+)
+parser.add_argument(
+    "-s", "--seconds", metavar="SECONDS", dest="seconds", type=float,
+    default=1.0,
+    help="How long every case is measured. Default: 1 second."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file",
+    default=os.path.join(here, "..", "lab5", "dbs", "fortune.db"),
+    help="Database to read from. Default: lab5's fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def rate(read, k):
+    """Return the fortunes per second read k at a time by read(k)."""
+
+    fortunes = 0
+    start = time.perf_counter()
+    stop = start + opts.seconds
+    while time.perf_counter() < stop:
+        fortunes += len(read(k))
+    return fortunes / (time.perf_counter() - start)
+
+
+def compare(title, single, many):
+    print(title)
+    print("{:>8} {:>18} {:>18} {:>8}".format(
+        "k", "k x read (f/s)", "read_many (f/s)", "speedup"))
+    for k in opts.counts:
+        one = rate(lambda k: [single() for i in range(k)], k)
+        bulk = rate(many, k)
+        print("{:>8} {:>18.0f} {:>18.0f} {:>7.1f}x".format(
+            k, one, bulk, bulk / one))
+    print()
+
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+db = Database(opts.file)
+compare("Database in this process:", db.read, db.read_many)
+
+workdir = tempfile.mkdtemp(prefix="bulk-")
+server = None
+try:
+    db_file = os.path.join(workdir, "fortune.db")
+    shutil.copyfile(opts.file, db_file)
+    port = free_port()
+    # Run from the work directory, where the server leaves its address.
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(here, "..", "lab1", "server.py"),
+         "-p", str(port), "-f", db_file, "--log-level", "off"],
+        cwd=workdir, env=dict(os.environ, PYTHONPATH=modules),
+        stdout=subprocess.DEVNULL)
+    stub = orb.Stub(("localhost", port))
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            stub.read()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+    compare("lab1 server:", stub.read, stub.read_many)
+finally:
+    if server is not None:
+        server.terminate()
+        server.wait()
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of the wire formats of the ORB.
+
+For typical messages it reports the bytes sent on the wire and the cost
+of encoding and decoding them as JSON lines, JSON frames and marshal
+frames, then the calls per second of persistent stubs using each of
+them.
+
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+sys.path.append("../modules")
+from Common import orb
+from Common import codec
+from Server.database import Database
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Bytes on the wire and encode/decode cost per call."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--repeat", metavar="TIMES", dest="repeat", type=int, default=20000,
+    help="Number of encodings timed for every message. Default: 20000."
+)
+parser.add_argument(
+    "-c", "--calls", metavar="CALLS", dest="calls", type=int, default=2000,
+    help="Number of remote calls timed for every format. Default: 2000."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file", default="../lab1/dbs/fortune.db",
+    help="Database the fortunes come from. Default: ../lab1/dbs/fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class JsonLines(object):
+
+    """The original format: a line of JSON text."""
+
+    name = "json lines"
+
+    def dumps(self, message):
+        return ''.join((json.dumps(message), '\n')).encode()
+
+    def loads(self, data):
+        return json.loads(data.decode())
+
+
+class Frames(object):
+
+    """Length-prefixed frames of a codec."""
+
+    def __init__(self, name):
+        self.codec = codec.CODECS[name]
+        self.name = name + " frames"
+
+    def dumps(self, message):
+        return codec.frame(self.codec.dumps(message))
+
+    def loads(self, data):
+        return self.codec.loads(data[codec.HEADER.size:])
+
+
+class Echo(object):
+
+    """Object served by the benchmark skeleton."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def read(self):
+        return self.db.read()
+
+    def request_token(self, time, pid):
+        return
+
+
+def cost(fmt, message, repeat):
+    data = fmt.dumps(message)
+    start = time.perf_counter()
+    for i in range(repeat):
+        fmt.dumps(message)
+    encode = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for i in range(repeat):
+        fmt.loads(data)
+    decode = (time.perf_counter() - start) / repeat
+    return len(data), encode, decode
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+db = Database(opts.file)
+fortune = max(db.data, key=len)
+messages = [
+    ("read request", {"id": 1, "method": "read", "args": []}),
+    ("read response", {"id": 1, "result": fortune}),
+    ("token", {"id": 1, "method": "obtain_token",
+               "args": [[[pid, pid * 7] for pid in range(8)]]}),
+    ("write request", {"id": 1, "method": "write_local", "args": [fortune]}),
+]
+formats = [JsonLines(), Frames("json"), Frames("marshal")]
+
+print("{:<14} {:<16} {:>8} {:>12} {:>12}".format(
+    "message", "format", "bytes", "encode (us)", "decode (us)"))
+for name, message in messages:
+    for fmt in formats:
+        size, encode, decode = cost(fmt, message, opts.repeat)
+        print("{:<14} {:<16} {:>8} {:>12.2f} {:>12.2f}".format(
+            name, fmt.name, size, encode * 1e6, decode * 1e6))
+
+# The benchmark trusts itself with marshal.
+skeleton = orb.Skeleton(Echo(db), ("127.0.0.1", 0),
+                        codecs=tuple(codec.CODECS))
+skeleton.start()
+address = skeleton.server_socket.getsockname()
+
+print()
+print("{:<16} {:>10}".format("format", "calls/s"))
+for name, codecs in (("json lines", ()), ("json frames", ("json", )),
+                     ("marshal frames", ("marshal", ))):
+    orb.connection_pool = orb.ConnectionPool(codecs)
+    stub = orb.Stub(address, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stub.read()
+        start = time.perf_counter()
+        for i in range(opts.calls):
+            stub.read()
+        rate = opts.calls / (time.perf_counter() - start)
+    print("{:<16} {:>10.0f}".format(name, rate))
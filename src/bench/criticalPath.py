@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Critical path of a traced request.
+
+Reads the spans that servers started with --trace have written, puts
+the spans of every trace back into a tree and picks the slowest traces
+whose root has a given name, by default the writes of clients. The
+critical path of a trace is the chain of spans its end waited for: from
+the end of a span, the child that finished last before it, then the
+one that finished last before that child started, and so on, each of
+them followed down the same way. For every span of the path, the time
+it spent itself, outside its children on the path, is printed, and
+these times are summed by name.
+
+"""
+
+import sys
+import json
+import argparse
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Critical path of the slowest traced requests."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "files", metavar="FILE", nargs="+",
+    help="Files of spans, as written by the servers."
+)
+parser.add_argument(
+    "-t", "--trace", metavar="TRACE", dest="trace", default=None,
+    help="Show this trace instead of the slowest ones."
+)
+parser.add_argument(
+    "-n", "--name", metavar="NAME", dest="name", default="serve write",
+    help="Name of the root spans of the traces to choose from. "
+         "Default: 'serve write'."
+)
+parser.add_argument(
+    "-k", "--top", metavar="TRACES", dest="top", type=int, default=1,
+    help="Number of traces shown, the slowest first. Default: 1."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Rebuilding the traces
+# -----------------------------------------------------------------------------
+
+
+def end(span):
+    return span["start"] + span["duration"]
+
+
+def load(paths):
+    """Return the spans of the files, by trace."""
+
+    traces = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                span = json.loads(line)
+                traces.setdefault(span["trace"], []).append(span)
+    return traces
+
+
+def tree(spans):
+    """Return the root of a trace and the children of every span.
+
+    A span whose parent was not recorded, e.g., because its process
+    was not tracing, is taken as a root."""
+
+    ids = set(span["span"] for span in spans)
+    children = {}
+    roots = []
+    for span in spans:
+        if span["parent"] in ids:
+            children.setdefault(span["parent"], []).append(span)
+        else:
+            roots.append(span)
+    return max(roots, key=lambda span: span["duration"]), children
+
+
+def critical_path(span, children, depth=0):
+    """Return the spans on the critical path below span, with their
+    depth and the time they spent themselves."""
+
+    path = []
+    cursor = end(span)
+    waited = 0.0
+    for child in sorted(children.get(span["span"], []), key=end,
+                        reverse=True):
+        if child["start"] >= cursor:
+            # It ran while a later child was the one being waited for.
+            continue
+        below = critical_path(child, children, depth + 1)
+        path = below + path
+        waited += min(end(child), cursor) - child["start"]
+        cursor = child["start"]
+    return [(span, depth, max(0.0, span["duration"] - waited))] + path
+
+
+def show(root, children):
+    path = critical_path(root, children)
+    print("trace {}: {} took {:.3f} ms on {}".format(
+        root["trace"], root["name"], root["duration"] * 1000,
+        root["process"]))
+    print("  {:>10} {:>10} {:>10}  {}".format("at ms", "ms", "self ms",
+                                             "span"))
+    for span, depth, own in sorted(path, key=lambda entry: entry[0]["start"]):
+        details = [span["process"]]
+        if "peer" in span:
+            details.append("to " + span["peer"])
+        if "error" in span:
+            details.append(span["error"])
+        print("  {:10.3f} {:10.3f} {:10.3f}  {}{} ({})".format(
+            (span["start"] - root["start"]) * 1000, span["duration"] * 1000,
+            own * 1000, "  " * depth, span["name"], ", ".join(details)))
+
+    by_name = {}
+    for span, depth, own in path:
+        by_name[span["name"]] = by_name.get(span["name"], 0.0) + own
+    print("  time on the critical path, by span:")
+    for name, own in sorted(by_name.items(), key=lambda item: -item[1]):
+        print("  {:10.3f} ms {:5.1f} %  {}".format(
+            own * 1000, own / root["duration"] * 100 if root["duration"]
+            else 0.0, name))
+    print()
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+traces = load(opts.files)
+if opts.trace is not None:
+    if opts.trace not in traces:
+        sys.exit("No trace {} in the files.".format(opts.trace))
+    chosen = [tree(traces[opts.trace])]
+else:
+    chosen = [tree(spans) for spans in traces.values()]
+    chosen = [(root, children) for root, children in chosen
+              if root["name"] == opts.name and root["parent"] is None]
+    if not chosen:
+        sys.exit("No trace starts with '{}'.".format(opts.name))
+    chosen.sort(key=lambda entry: -entry[0]["duration"])
+    print("{} traces start with '{}'.".format(len(chosen), opts.name))
+    print()
+    chosen = chosen[:opts.top]
+
+for root, children in chosen:
+    show(root, children)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Regression benchmark for the parsing of the fortune databases.
+
+For every database file it reports how many records are found, the
+size of the JSON response a server sends for a read() and how long the
+load and the reads take, both for the old split on the wrong separator
+and for the record parser of Server.database.
+
+"""
+
+import sys
+import json
+import time
+import glob
+import argparse
+
+sys.path.append("../modules")
+from Server.database import Database, MappedDatabase
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Records, response size and latency of the fortune databases."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--reads", metavar="READS", dest="reads", type=int, default=10000,
+    help="Number of reads timed for each database. Default: 10000."
+)
+parser.add_argument(
+    "files", metavar="FILE", nargs="*",
+    default=sorted(glob.glob("../lab1/dbs/*.db") + glob.glob("../lab5/dbs/*.db")),
+    help="Database files. Default: the ones of lab1 and lab5."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class SplitDatabase(Database):
+
+    """The database as it was parsed before the record parser."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.rand = Database(db_file).rand
+        with open(self.db_file) as file:
+            self.data = file.read().split('"\n" + "%" + "\n"')
+        del self.data[len(self.data)-1]
+        self.snapshot = (self.data, len(self.data))
+        self.version = 0
+
+
+def measure(cls, db_file, reads):
+    start = time.perf_counter()
+    db = cls(db_file)
+    load = time.perf_counter() - start
+
+    sizes = []
+    start = time.perf_counter()
+    for i in range(reads):
+        sizes.append(len(json.dumps({"result": db.read()})) + 1)
+    latency = (time.perf_counter() - start) / reads
+    return load, sum(sizes) / len(sizes), max(sizes), latency
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+print("{:<24} {:<8} {:>7} {:>10} {:>10} {:>9} {:>10}".format(
+    "file", "parser", "records", "load (ms)", "avg (B)", "max (B)",
+    "read (us)"))
+for db_file in opts.files:
+    for name, cls in (("split", SplitDatabase), ("records", Database),
+                      ("mmap", MappedDatabase)):
+        load, average, largest, latency = measure(cls, db_file, opts.reads)
+        db = cls(db_file)
+        count = len(db)
+        print("{:<24} {:<8} {:>7} {:>10.2f} {:>10.0f} {:>9} {:>10.2f}".format(
+            db_file[-24:], name, count, load * 1000, average, largest,
+            latency * 1e6))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Time for a peer to join and leave groups of growing size.
+
+A name service and a group of peers run in this process. The peers
+take a while to answer register_peer and unregister_peer, standing for
+the latency of the network. A new peer then joins the group and leaves
+it, first calling the peers one after the other, as PeerList used to,
+then through PeerList, which calls them all at once.
+
+"""
+
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.append("../modules")
+from Common import orb
+from Common.nameService import NameService
+from Server.peerList import PeerList
+from benchUtils import free_port
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Join and leave times as the group grows."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-s", "--sizes", metavar="N", dest="sizes", type=int, nargs="+",
+    default=[1, 4, 16, 32],
+    help="Sizes of the group. Default: 1 4 16 32."
+)
+parser.add_argument(
+    "-d", "--delay", metavar="SECONDS", dest="delay", type=float,
+    default=0.005,
+    help="Time a peer takes to answer. Default: 0.005."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class JoinPeer(orb.Peer):
+
+    """Peer with nothing but a peer list, slow to answer."""
+
+    def __init__(self, ns_address, ptype):
+        orb.Peer.__init__(self, ("127.0.0.1", free_port()), ns_address, ptype)
+        self.peer_list = PeerList(self)
+        orb.Peer.start(self)
+
+    def register_peer(self, pid, paddr):
+        time.sleep(opts.delay)
+        self.peer_list.register_peer(pid, paddr)
+
+    def unregister_peer(self, pid):
+        time.sleep(opts.delay)
+        self.peer_list.unregister_peer(pid)
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def join_one_by_one(peer):
+    for pid, address in peer.require_all():
+        if pid < peer.id:
+            stub = orb.Stub(address)
+            stub.register_peer(peer.id, peer.address)
+            peer.peer_list.peers[pid] = stub
+
+
+def leave_one_by_one(peer):
+    for stub in peer.peer_list.peers.values():
+        stub.unregister_peer(peer.id)
+    peer.peer_list.peers = {}
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+name_service = NameService()
+skeleton = orb.Skeleton(name_service, ("127.0.0.1", free_port()))
+skeleton.start()
+
+table = sys.stdout
+print("{:>6} {:>16} {:>16} {:>16} {:>16}".format(
+    "peers", "join 1-by-1 ms", "join gather ms", "leave 1-by-1 ms",
+    "leave gather ms"))
+group = []
+# The peers report every connection; only the table is printed.
+with contextlib.redirect_stdout(io.StringIO()):
+    for size in opts.sizes:
+        while len(group) < size:
+            peer = JoinPeer(skeleton.address, "bench")
+            peer.peer_list.initialize()
+            group.append(peer)
+
+        peer = JoinPeer(skeleton.address, "bench")
+        join_sequential = timed(join_one_by_one, peer)
+        leave_sequential = timed(leave_one_by_one, peer)
+        join_gathered = timed(peer.peer_list.initialize)
+        leave_gathered = timed(peer.peer_list.destroy)
+        orb.Peer.destroy(peer)
+        print("{:>6} {:>16.1f} {:>16.1f} {:>16.1f} {:>16.1f}".format(
+            size, join_sequential, join_gathered, leave_sequential,
+            leave_gathered), file=table)
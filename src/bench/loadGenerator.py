@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Headless load generator for the fortune services.
+
+For every target, it starts the servers on copies of the database:
+    --  lab1 :: the lab1 server alone.
+    --  lab5 :: a local name service and a group of lab5 server
+        replicas joining it one at a time.
+Client threads then read and write fortunes of a given size as fast as
+the servers answer, for a warm-up period and then for the measured
+one. The calls per second and the percentiles of their latency, for
+reads, writes and both, are written as JSON along with the metrics of
+every server, so that runs can be compared from one version to the
+next.
+
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.append("../modules")
+from Common import orb
+from Common import readCache
+from benchUtils import free_port, wait_for, percentile
+
+here = os.path.dirname(os.path.abspath(__file__))
+modules = os.path.join(here, "..", "modules")
+
+TARGETS = ["lab1", "lab5"]
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Throughput and latency of the lab1 and lab5 servers."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "targets", metavar="TARGET", nargs="*",
+    help="Services to load: lab1, lab5 or both. Default: both."
+)
+parser.add_argument(
+    "-c", "--concurrency", metavar="CLIENTS", dest="concurrency", type=int,
+    default=8,
+    help="Number of client threads. Default: 8."
+)
+parser.add_argument(
+    "-s", "--seconds", metavar="SECONDS", dest="seconds", type=float,
+    default=5.0,
+    help="How long every target is measured. Default: 5 seconds."
+)
+parser.add_argument(
+    "-u", "--warm-up", metavar="SECONDS", dest="warm_up", type=float,
+    default=1.0,
+    help="Time the clients run before the measurement. Default: 1 second."
+)
+parser.add_argument(
+    "-W", "--writes", metavar="RATIO", dest="writes", type=float, default=0.1,
+    help="Fraction of the calls that are writes. Default: 0.1."
+)
+parser.add_argument(
+    "-P", "--payload", metavar="BYTES", dest="payload", type=int, default=64,
+    help="Size of the fortunes written. Default: 64 bytes."
+)
+parser.add_argument(
+    "-n", "--replicas", metavar="N", dest="replicas", type=int, default=3,
+    help="Number of lab5 server replicas. Default: 3."
+)
+parser.add_argument(
+    "-a", "--server-args", metavar="ARGS", dest="server_args", default="",
+    help="Extra arguments of every server, e.g., \"-d fsync\" or "
+         "\"-r quorum\". Default: none."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file",
+    default=os.path.join(here, "..", "lab5", "dbs", "fortune.db"),
+    help="Database copied for every server. Default: lab5's fortune.db."
+)
+parser.add_argument(
+    "-o", "--output", metavar="FILE", dest="output", default=None,
+    help="Write the JSON report to this file. Default: standard output."
+)
+parser.add_argument(
+    "-C", "--cache", metavar="SIZE", dest="cache", type=int, default=0,
+    help="Read through a cache of SIZE fortunes in every client, see "
+         "Common.readCache. Default: 0, no cache."
+)
+parser.add_argument(
+    "--cache-policy", dest="cache_policy", default=readCache.LRU,
+    choices=[readCache.LRU, readCache.CLOCK],
+    help="Eviction policy of the caches. Default: lru."
+)
+parser.add_argument(
+    "--seed", metavar="SEED", dest="seed", type=int, default=0,
+    help="Seed of the choices of the clients. Default: 0."
+)
+opts = parser.parse_args()
+targets = opts.targets or TARGETS
+for target in targets:
+    if target not in TARGETS:
+        parser.error("unknown target: '{}'".format(target))
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def start_lab1(workdir, env, processes):
+    """Start the lab1 server; return its address."""
+
+    db_file = os.path.join(workdir, "fortune.db")
+    shutil.copyfile(opts.file, db_file)
+    port = free_port()
+    # Run from the work directory, where the server leaves its address.
+    processes.append(subprocess.Popen(
+        [sys.executable, os.path.join(here, "..", "lab1", "server.py"),
+         "-p", str(port), "-f", db_file] + shlex.split(opts.server_args),
+        cwd=workdir, env=dict(env, PYTHONPATH=modules),
+        stdout=subprocess.DEVNULL))
+    address = ("localhost", port)
+    wait_for(lambda: orb.Stub(address).read() is not None)
+    return [address]
+
+
+def start_lab5(workdir, env, processes):
+    """Start a name service and the lab5 replicas; return their
+    addresses."""
+
+    ns_port = free_port()
+    env["TDDD25_NAME_SERVICE"] = "localhost:{}".format(ns_port)
+    processes.append(subprocess.Popen(
+        [sys.executable, "nameService.py", "-p", str(ns_port)],
+        cwd=os.path.join(here, "..", "nameService"), env=env,
+        stdout=subprocess.DEVNULL))
+    name_service = orb.Stub(("localhost", ns_port))
+    wait_for(lambda: name_service.require_all("load") is not None)
+
+    for i in range(opts.replicas):
+        db_file = os.path.join(workdir, "fortune{}.db".format(i))
+        shutil.copyfile(opts.file, db_file)
+        processes.append(subprocess.Popen(
+            [sys.executable, "serverPeer.py", "--headless", "-t", "load",
+             "-f", db_file, "-p", str(free_port()),
+             "-N", str(opts.replicas)] +
+            shlex.split(opts.server_args),
+            cwd=os.path.join(here, "..", "lab5"), env=env,
+            stdout=subprocess.DEVNULL))
+        # The replicas join one at a time, as they do by hand.
+        wait_for(lambda: len(name_service.require_all("load")) == i + 1)
+    return [tuple(address)
+            for pid, address in name_service.require_all("load")]
+
+
+def client(addresses, start, stop, samples, errors, rand, caches):
+    """Call the servers until stop; keep the latencies of the calls
+    started after start."""
+
+    stubs = [orb.Stub(address) for address in addresses]
+    if opts.cache > 0:
+        stubs = [readCache.ReadCache(stub, opts.cache, opts.cache_policy)
+                 for stub in stubs]
+        caches.extend(stubs)
+    padding = "x" * opts.payload
+    while True:
+        now = time.monotonic()
+        if now >= stop:
+            return
+        write = rand.random() < opts.writes
+        stub = rand.choice(stubs)
+        begin = time.perf_counter()
+        try:
+            if write:
+                fortune = "Load {} ".format(rand.random())
+                stub.write((fortune + padding)[:max(opts.payload,
+                                                    len(fortune))])
+            else:
+                stub.read()
+        except Exception:
+            if now >= start:
+                errors.append(1)
+            continue
+        if now >= start:
+            samples.append((write, time.perf_counter() - begin))
+
+
+def summary(latencies):
+    if not latencies:
+        return {"count": 0}
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "p999_ms": percentile(latencies, 0.999) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def run(target):
+    """Start the servers of target, load them and report."""
+
+    workdir = tempfile.mkdtemp(prefix="load-")
+    processes = []
+    try:
+        env = dict(os.environ)
+        if target == "lab1":
+            addresses = start_lab1(workdir, env, processes)
+        else:
+            addresses = start_lab5(workdir, env, processes)
+        log("Loading {} at {}".format(target, addresses))
+
+        start = time.monotonic() + opts.warm_up
+        stop = start + opts.seconds
+        samples = [[] for i in range(opts.concurrency)]
+        errors = []
+        caches = []
+        clients = [threading.Thread(
+            target=client,
+            args=(addresses, start, stop, samples[i], errors,
+                  random.Random(opts.seed + i), caches))
+            for i in range(opts.concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+
+        server_metrics = [orb.Stub(address).metrics()
+                          for address in addresses]
+        samples = [sample for local in samples for sample in local]
+        reads = [latency for write, latency in samples if not write]
+        writes = [latency for write, latency in samples if write]
+        result = {
+            "target": target,
+            "servers": len(addresses),
+            "seconds": opts.seconds,
+            "calls": len(samples),
+            "calls_per_s": len(samples) / opts.seconds,
+            "errors": len(errors),
+            "latency": {
+                "all": summary(reads + writes),
+                "read": summary(reads),
+                "write": summary(writes),
+            },
+            "server_metrics": server_metrics,
+        }
+        if caches:
+            # Counted from the start, warm-up included.
+            stats = [cache.stats() for cache in caches]
+            hits = sum(stat["hits"] for stat in stats)
+            misses = sum(stat["misses"] for stat in stats)
+            result["cache"] = {
+                "caches": len(caches),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else None,
+                "invalidations": sum(stat["invalidations"] for stat in stats),
+                "evictions": sum(stat["evictions"] for stat in stats),
+            }
+        return result
+    finally:
+        # The servers go first so that they can unregister.
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+report = {
+    "config": {
+        "concurrency": opts.concurrency,
+        "seconds": opts.seconds,
+        "warm_up": opts.warm_up,
+        "writes": opts.writes,
+        "payload": opts.payload,
+        "replicas": opts.replicas,
+        "server_args": opts.server_args,
+        "cache": opts.cache,
+        "cache_policy": opts.cache_policy,
+        "seed": opts.seed,
+    },
+    "results": [run(target) for target in targets],
+}
+
+if opts.output is None:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+else:
+    with open(opts.output, "w") as f:
+        json.dump(report, f, indent=2)
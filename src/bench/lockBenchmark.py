@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Contention benchmark for the readers-writers locks.
+
+Reader and writer threads repeatedly take the lock, hold it for a
+while and release it. For every lock, the time the threads waited to
+get in is reported as median, tail and worst case, separately for the
+readers and the writers.
+
+"""
+
+import sys
+import time
+import threading
+import argparse
+
+sys.path.append("../modules")
+from Server.Lock.readWriteLock import ReadWriteLock
+from Server.Lock import fairReadWriteLock
+from benchUtils import percentile
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Wait times of readers and writers under contention."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-r", "--readers", metavar="THREADS", dest="readers", type=int, default=8,
+    help="Number of reader threads. Default: 8."
+)
+parser.add_argument(
+    "-w", "--writers", metavar="THREADS", dest="writers", type=int, default=2,
+    help="Number of writer threads. Default: 2."
+)
+parser.add_argument(
+    "-d", "--duration", metavar="SECONDS", dest="duration", type=float,
+    default=2.0, help="Duration of every measurement. Default: 2 seconds."
+)
+parser.add_argument(
+    "--read-hold", metavar="SECONDS", dest="read_hold", type=float,
+    default=0.0005, help="Time a reader holds the lock. Default: 0.0005."
+)
+parser.add_argument(
+    "--write-hold", metavar="SECONDS", dest="write_hold", type=float,
+    default=0.001, help="Time a writer holds the lock. Default: 0.001."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def run(lock, readers, writers, duration):
+    """Return the lists of wait times of the readers and of the writers."""
+
+    stop = time.monotonic() + duration
+    waits = {"read": [], "write": []}
+
+    def worker(kind, acquire, release, hold):
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            acquire()
+            local.append(time.perf_counter() - start)
+            time.sleep(hold)
+            release()
+            # Leave the others a chance to ask for the lock.
+            time.sleep(0)
+        waits[kind].extend(local)
+
+    threads = []
+    for i in range(readers):
+        threads.append(threading.Thread(target=worker, args=(
+            "read", lock.read_acquire, lock.read_release, opts.read_hold)))
+    for i in range(writers):
+        threads.append(threading.Thread(target=worker, args=(
+            "write", lock.write_acquire, lock.write_release, opts.write_hold)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return waits["read"], waits["write"]
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+locks = [
+    ("classic", ReadWriteLock),
+    ("reader", lambda: fairReadWriteLock.FairReadWriteLock(
+        fairReadWriteLock.READER_PREFERRING)),
+    ("writer", lambda: fairReadWriteLock.FairReadWriteLock(
+        fairReadWriteLock.WRITER_PREFERRING)),
+    ("fifo", lambda: fairReadWriteLock.FairReadWriteLock(
+        fairReadWriteLock.FIFO)),
+]
+
+print("{:<8} {:<6} {:>7} {:>10} {:>10} {:>10}".format(
+    "lock", "side", "count", "p50 (ms)", "p99 (ms)", "max (ms)"))
+for name, create in locks:
+    read_waits, write_waits = run(create(), opts.readers, opts.writers,
+                                  opts.duration)
+    for side, waits in (("read", read_waits), ("write", write_waits)):
+        print("{:<8} {:<6} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+            name, side, len(waits), percentile(waits, 0.5) * 1000,
+            percentile(waits, 0.99) * 1000,
+            max(waits) * 1000 if waits else float("nan")))
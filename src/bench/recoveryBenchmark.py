@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Unavailability of the lab5 servers when the token holder fails.
+
+For every configuration of the failure detector, it starts a local name
+service and a group of lab5 server replicas, and client threads writing
+fortunes to them. The replica holding the token of the distributed lock
+is then stopped (SIGSTOP), as if it hung, or killed (SIGKILL). The
+longest time without any write completed after the failure is
+reported, along with the number of times the token was regenerated.
+
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.append("../modules")
+from Common import orb
+from benchUtils import free_port, wait_for
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+CONFIGS = {
+    "phi": ["--phi", "4"],
+    "timeout": ["--suspect-after", "1"],
+    "lease": ["--heartbeat", "0", "--lease", "2"],
+}
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Time to recover the token after its holder fails."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--replicas", metavar="N", dest="replicas", type=int, default=3,
+    help="Number of server replicas. Default: 3."
+)
+parser.add_argument(
+    "-c", "--clients", metavar="CLIENTS", dest="clients", type=int,
+    default=4,
+    help="Number of client threads. Default: 4."
+)
+parser.add_argument(
+    "-k", "--crash", dest="crash", default="stop", choices=["stop", "kill"],
+    help="Stop the holder, as if it hung, or kill it. Default: stop."
+)
+parser.add_argument(
+    "-C", "--configs", metavar="CONFIG", dest="configs", nargs="+",
+    default=sorted(CONFIGS), choices=sorted(CONFIGS),
+    help="Failure detector configurations to measure. Default: all."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file",
+    default=os.path.join(here, "..", "lab5", "dbs", "fortune.db"),
+    help="Database copied for every replica. Default: lab5's fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def client(servers, stop, done, rand):
+    while not stop.is_set():
+        alive = [stub for stub in servers if stub is not None]
+        try:
+            rand.choice(alive).write(
+                "Benchmark fortune {}.".format(rand.random()))
+        except Exception:
+            time.sleep(0.01)
+            continue
+        done.append(time.monotonic())
+
+
+def crash_holder(processes, servers):
+    """Fail the replica holding the token; return its index."""
+
+    while True:
+        for i, process in enumerate(processes):
+            process.send_signal(signal.SIGSTOP)
+            # fence_token(0) moves nobody's epoch, it only reports.
+            others = [stub.fence_token(0)
+                      for j, stub in enumerate(servers) if j != i]
+            if not any(reply[1] for reply in others):
+                # The token is here, or on its way from or to here.
+                servers[i] = None
+                if opts.crash == "kill":
+                    process.kill()
+                return i
+            process.send_signal(signal.SIGCONT)
+
+
+def run(config):
+    """Start a cluster with the given detector, fail the holder and
+    measure the recovery."""
+
+    workdir = tempfile.mkdtemp(prefix="recovery-")
+    processes = []
+    try:
+        ns_port = free_port()
+        env = dict(os.environ,
+                   TDDD25_NAME_SERVICE="localhost:{}".format(ns_port))
+        processes.append(subprocess.Popen(
+            [sys.executable, "nameService.py", "-p", str(ns_port)],
+            cwd=os.path.join(here, "..", "nameService"), env=env,
+            stdout=subprocess.DEVNULL))
+        name_service = orb.Stub(("localhost", ns_port))
+        wait_for(lambda: name_service.require_all("bench") is not None)
+
+        for i in range(opts.replicas):
+            db_file = os.path.join(workdir, "fortune{}.db".format(i))
+            shutil.copyfile(opts.file, db_file)
+            processes.append(subprocess.Popen(
+                [sys.executable, "serverPeer.py", "--headless",
+                 "-t", "bench", "-f", db_file, "-T", "1",
+                 "-p", str(free_port())] + CONFIGS[config],
+                cwd=os.path.join(here, "..", "lab5"), env=env,
+                stdout=subprocess.DEVNULL))
+            wait_for(lambda: len(name_service.require_all("bench")) == i + 1)
+        # A client calling the stopped replica must not hang with it.
+        servers = [orb.Stub(address, timeout=3.0)
+                   for pid, address in name_service.require_all("bench")]
+
+        stop = threading.Event()
+        done = []
+        clients = [threading.Thread(target=client,
+                                    args=(servers, stop, done,
+                                          random.Random(i)))
+                   for i in range(opts.clients)]
+        for thread in clients:
+            thread.daemon = True
+            thread.start()
+        time.sleep(1.0)
+
+        victim = crash_holder(processes[1:], servers)
+        crashed = time.monotonic()
+        wait_for(lambda: len([t for t in done if t > crashed]) >= 10,
+                 timeout=60.0)
+        time.sleep(1.0)
+        stop.set()
+        # The longest time without any write completed.
+        after = [crashed] + sorted(t for t in done if t > crashed)
+        unavailable = max(b - a for a, b in zip(after, after[1:]))
+
+        regenerations = sum(stub.lock_stats()["regenerations"]
+                            for stub in servers if stub is not None)
+        return {
+            "config": config,
+            "victim": victim,
+            "unavailable_s": unavailable,
+            "regenerations": regenerations,
+            "writes": len(done),
+        }
+    finally:
+        # The servers go first so that they can unregister.
+        for process in reversed(processes):
+            process.send_signal(signal.SIGCONT)
+            process.terminate()
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+results = [run(config) for config in opts.configs]
+
+print("{:<8} {:>7} {:>15} {:>13} {:>7}".format(
+    "config", "victim", "unavailable (s)", "regenerated", "writes"))
+for r in results:
+    print("{:<8} {:>7} {:>15.2f} {:>13} {:>7}".format(
+        r["config"], r["victim"], r["unavailable_s"], r["regenerations"],
+        r["writes"]))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Throughput of the replication modes of the lab5 servers.
+
+For every mode it starts a local name service and a group of lab5
+server replicas, each on its own copy of the database, then runs client
+threads calling read or write on random replicas for a while and
+reports the calls per second and the mean latency of both.
+
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.append("../modules")
+from Common import orb
+from benchUtils import free_port, wait_for
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Compare write-all and quorum replication."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--replicas", metavar="N", dest="replicas", type=int, default=3,
+    help="Number of server replicas. Default: 3."
+)
+parser.add_argument(
+    "-c", "--clients", metavar="CLIENTS", dest="clients", type=int,
+    default=8,
+    help="Number of client threads. Default: 8."
+)
+parser.add_argument(
+    "-s", "--seconds", metavar="SECONDS", dest="seconds", type=float,
+    default=5.0,
+    help="How long every mode is measured. Default: 5 seconds."
+)
+parser.add_argument(
+    "-W", "--writes", metavar="RATIO", dest="writes", type=float, default=0.1,
+    help="Fraction of the calls that are writes. Default: 0.1."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file",
+    default=os.path.join(here, "..", "lab5", "dbs", "fortune.db"),
+    help="Database copied for every replica. Default: lab5's fortune.db."
+)
+parser.add_argument(
+    "-m", "--modes", metavar="MODE", dest="modes", nargs="+",
+    default=["write-all", "quorum"],
+    help="Replication modes to measure. Default: write-all quorum."
+)
+parser.add_argument(
+    "-P", "--persistent", action="store_true", dest="persistent",
+    default=False,
+    help="Keep the connections between the replicas open."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def client(addresses, deadline, stats, rand):
+    stubs = [orb.Stub(address) for address in addresses]
+    while time.monotonic() < deadline:
+        write = rand.random() < opts.writes
+        stub = rand.choice(stubs)
+        start = time.perf_counter()
+        try:
+            if write:
+                stub.write("Benchmark fortune {}.".format(rand.random()))
+            else:
+                stub.read()
+        except Exception:
+            stats["errors"] += 1
+            continue
+        kind = "write" if write else "read"
+        stats[kind] += 1
+        stats[kind + "_time"] += time.perf_counter() - start
+
+
+def run(mode):
+    """Start a cluster in the given mode and measure it."""
+
+    workdir = tempfile.mkdtemp(prefix="replication-")
+    processes = []
+    try:
+        ns_port = free_port()
+        env = dict(os.environ,
+                   TDDD25_NAME_SERVICE="localhost:{}".format(ns_port))
+        processes.append(subprocess.Popen(
+            [sys.executable, "nameService.py", "-p", str(ns_port)],
+            cwd=os.path.join(here, "..", "nameService"), env=env,
+            stdout=subprocess.DEVNULL))
+        name_service = orb.Stub(("localhost", ns_port))
+        wait_for(lambda: name_service.require_all("bench") is not None)
+
+        for i in range(opts.replicas):
+            db_file = os.path.join(workdir, "fortune{}.db".format(i))
+            shutil.copyfile(opts.file, db_file)
+            processes.append(subprocess.Popen(
+                [sys.executable, "serverPeer.py", "--headless",
+                 "-t", "bench", "-r", mode, "-f", db_file,
+                 "-p", str(free_port()), "-N", str(opts.replicas)] +
+                (["--persistent"] if opts.persistent else []),
+                cwd=os.path.join(here, "..", "lab5"), env=env,
+                stdout=subprocess.DEVNULL))
+            # The replicas join one at a time, as they do by hand.
+            wait_for(lambda: len(name_service.require_all("bench")) == i + 1)
+        addresses = [address
+                     for pid, address in name_service.require_all("bench")]
+
+        stats = [dict(read=0, write=0, read_time=0.0, write_time=0.0,
+                      errors=0) for i in range(opts.clients)]
+        deadline = time.monotonic() + opts.seconds
+        clients = [threading.Thread(
+            target=client,
+            args=(addresses, deadline, stats[i], random.Random(i)))
+            for i in range(opts.clients)]
+        start = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        total = dict((key, sum(s[key] for s in stats)) for key in stats[0])
+        return {
+            "mode": mode,
+            "calls_per_s": (total["read"] + total["write"]) / elapsed,
+            "reads": total["read"],
+            "writes": total["write"],
+            "errors": total["errors"],
+            "read_ms": (total["read_time"] / total["read"] * 1000
+                        if total["read"] else None),
+            "write_ms": (total["write_time"] / total["write"] * 1000
+                         if total["write"] else None),
+        }
+    finally:
+        # The servers go first so that they can unregister.
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+results = [run(mode) for mode in opts.modes]
+
+print("{:<10} {:>10} {:>8} {:>8} {:>7} {:>10} {:>10}".format(
+    "mode", "calls/s", "reads", "writes", "errors", "read ms", "write ms"))
+for r in results:
+    print("{:<10} {:>10.0f} {:>8} {:>8} {:>7} {:>10} {:>10}".format(
+        r["mode"], r["calls_per_s"], r["reads"], r["writes"], r["errors"],
+        "-" if r["read_ms"] is None else "{:.2f}".format(r["read_ms"]),
+        "-" if r["write_ms"] is None else "{:.2f}".format(r["write_ms"])))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of database reads while writes are in flight.
+
+Reader threads read fortunes while writer threads add new ones to a
+copy of the database at a fixed rate. The reads either take the read
+side of a readers-writers lock that the writers hold while writing, as
+the lab5 servers used to, or read the published snapshot without any
+lock. The reads per second and the read latencies are reported for
+both, along with the rate the writes reached: a writer starved by the
+readers would otherwise leave the reads to run with no write in
+flight. For the same reason, the lock prefers the writers, where
+ReadWriteLock lets a steady flow of readers keep them out, and the
+interpreter switches threads more often than by default, so that a
+writer waking up gets to run among the busy readers.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.append("../modules")
+from Server.database import Database, MappedDatabase
+from Server.Lock import fairReadWriteLock
+from benchUtils import percentile
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Reads per second with and without the read lock."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-r", "--readers", metavar="THREADS", dest="readers", type=int, default=8,
+    help="Number of reader threads. Default: 8."
+)
+parser.add_argument(
+    "-w", "--writers", metavar="THREADS", dest="writers", type=int, default=2,
+    help="Number of writer threads. Default: 2."
+)
+parser.add_argument(
+    "-W", "--write-rate", metavar="WRITES", dest="write_rate", type=float,
+    default=200.0,
+    help="Writes per second, shared by the writers. Default: 200."
+)
+parser.add_argument(
+    "-d", "--duration", metavar="SECONDS", dest="duration", type=float,
+    default=2.0, help="Duration of every measurement. Default: 2 seconds."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file", default="../lab1/dbs/fortune.db",
+    help="Database copied for the measurements. "
+         "Default: ../lab1/dbs/fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def run(db, locked, duration):
+    """Return the read latencies and the number of writes done."""
+
+    lock = fairReadWriteLock.FairReadWriteLock(
+        fairReadWriteLock.WRITER_PREFERRING)
+    begin = time.monotonic()
+    stop = begin + duration
+    latencies = []
+    writes = [0]
+
+    def reader():
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            if locked:
+                lock.read_acquire()
+                try:
+                    db.read()
+                finally:
+                    lock.read_release()
+            else:
+                db.read()
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    def writer():
+        count = 0
+        interval = opts.writers / opts.write_rate
+        while True:
+            # Keep to the schedule of the whole run, catching up after
+            # starting or waking up late.
+            delay = begin + count * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if time.monotonic() >= stop:
+                break
+            lock.write_acquire()
+            try:
+                db.write("Fortune {} written by the benchmark.".format(count))
+            finally:
+                lock.write_release()
+            count += 1
+        writes[0] += count
+
+    # The writers start first, before the readers take the interpreter.
+    threads = [threading.Thread(target=writer) for i in range(opts.writers)]
+    threads += [threading.Thread(target=reader) for i in range(opts.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, writes[0]
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+# Seconds a thread runs before the others may take the interpreter.
+sys.setswitchinterval(0.0001)
+
+workdir = tempfile.mkdtemp(prefix="snapshot-")
+try:
+    print("Target: {:.0f} writes/s.".format(opts.write_rate))
+    print("{:<8} {:<9} {:>10} {:>9} {:>10} {:>10}".format(
+        "db", "reads", "reads/s", "writes/s", "p50 (us)", "p99 (us)"))
+    missed = []
+    for name, cls in (("records", Database), ("mmap", MappedDatabase)):
+        for mode, locked in (("locked", True), ("snapshot", False)):
+            db_file = os.path.join(workdir, "{}-{}.db".format(name, mode))
+            shutil.copyfile(opts.file, db_file)
+            latencies, writes = run(cls(db_file), locked, opts.duration)
+            rate = writes / opts.duration
+            if rate < 0.9 * opts.write_rate:
+                missed.append("{} {}".format(name, mode))
+            print("{:<8} {:<9} {:>10.0f} {:>9.0f} {:>10.1f} {:>10.1f}".format(
+                name, mode, len(latencies) / opts.duration, rate,
+                percentile(latencies, 0.5) * 1e6,
+                percentile(latencies, 0.99) * 1e6))
+    # Reached means within 10% of the target.
+    if missed:
+        print("The target write rate was missed by: {}.".format(
+            ", ".join(missed)))
+    else:
+        print("The target write rate was reached in every run.")
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
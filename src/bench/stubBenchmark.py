@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of remote calls per second through orb.Stub.
+
+A Skeleton serving a trivial object is started in this process and a
+number of threads call it, first with connect-per-call stubs and then
+with persistent stubs sharing a pooled connection.
+
+"""
+
+import io
+import sys
+import time
+import threading
+import argparse
+import contextlib
+
+sys.path.append("../modules")
+from Common import orb
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Calls per second of connect-per-call and persistent stubs."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--calls", metavar="CALLS", dest="calls", type=int, default=2000,
+    help="Number of calls made by each thread. Default: 2000."
+)
+parser.add_argument(
+    "-c", "--concurrency", metavar="THREADS", dest="threads", type=int,
+    nargs="+", default=[1, 8],
+    help="Numbers of calling threads to measure. Default: 1 8."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class Echo(object):
+
+    """Object served by the benchmark skeleton."""
+
+    def echo(self, value):
+        return value
+
+
+def run(address, persistent, threads, calls):
+    """Return the number of calls per second made by threads callers."""
+
+    def caller():
+        stub = orb.Stub(address, persistent)
+        for i in range(calls):
+            stub.echo(i)
+
+    workers = [threading.Thread(target=caller) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * calls / (time.perf_counter() - start)
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+skeleton = orb.Skeleton(Echo(), ("127.0.0.1", 0))
+skeleton.start()
+address = skeleton.server_socket.getsockname()
+
+print("{:>8} {:>16} {:>16} {:>8}".format(
+    "threads", "per-call (op/s)", "persistent (op/s)", "speedup"))
+for threads in opts.threads:
+    # The skeleton prints a line per accepted connection.
+    with contextlib.redirect_stdout(io.StringIO()):
+        plain = run(address, False, threads, opts.calls)
+        pooled = run(address, True, threads, opts.calls)
+    print("{:>8} {:>16.0f} {:>16.0f} {:>7.1f}x".format(
+        threads, plain, pooled, pooled / plain))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of the modes of the distributed lock.
+
+A group of peers, each with a few threads, runs in this process along
+with a name service. The threads repeatedly acquire the distributed
+lock, hold it for a while and release it. For every mode, the critical
+sections entered, the messages sent per critical section and the time
+spent waiting for the lock are reported.
+
+"""
+
+import io
+import sys
+import time
+import argparse
+import threading
+import contextlib
+
+sys.path.append("../modules")
+from Common import orb
+from Common.nameService import NameService
+from Server.peerList import PeerList
+from Server.Lock import distributedLock
+from benchUtils import free_port, percentile
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Messages and waits per critical section of the token lock."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--peers", metavar="PEERS", dest="peers", type=int, default=4,
+    help="Number of peers. Default: 4."
+)
+parser.add_argument(
+    "-t", "--threads", metavar="THREADS", dest="threads", type=int, default=3,
+    help="Number of threads of every peer. Default: 3."
+)
+parser.add_argument(
+    "-d", "--duration", metavar="SECONDS", dest="duration", type=float,
+    default=3.0, help="Duration of every measurement. Default: 3 seconds."
+)
+parser.add_argument(
+    "--hold", metavar="SECONDS", dest="hold", type=float, default=0.001,
+    help="Time the lock is held. Default: 0.001."
+)
+parser.add_argument(
+    "-b", "--local-bound", metavar="GRANTS", dest="local_bound", type=int,
+    default=distributedLock.LOCAL_BOUND,
+    help="Times in a row the token goes to the next thread of a peer "
+         "while other peers wait. "
+         "Default: {}.".format(distributedLock.LOCAL_BOUND)
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary classes
+# -----------------------------------------------------------------------------
+
+
+class LockPeer(orb.Peer):
+
+    """Peer with nothing but a distributed lock."""
+
+    def __init__(self, ns_address, ptype, mode):
+        orb.Peer.__init__(self, ("127.0.0.1", free_port()), ns_address, ptype)
+        self.peer_list = PeerList(self)
+        self.distributed_lock = distributedLock.DistributedLock(
+            self, self.peer_list, mode, opts.local_bound)
+        orb.Peer.start(self)
+        self.peer_list.initialize()
+        self.distributed_lock.initialize()
+
+    def destroy(self):
+        orb.Peer.destroy(self)
+        self.distributed_lock.destroy()
+        self.peer_list.destroy()
+
+    def register_peer(self, pid, paddr):
+        self.peer_list.register_peer(pid, paddr)
+        self.distributed_lock.register_peer(pid)
+
+    def unregister_peer(self, pid):
+        self.peer_list.unregister_peer(pid)
+        self.distributed_lock.unregister_peer(pid)
+
+    def request_token(self, time, pid, stamp=None):
+        return self.distributed_lock.request_token(time, pid, stamp)
+
+    def obtain_token(self, token, pending=None, epoch=0):
+        return self.distributed_lock.obtain_token(token, pending, epoch)
+
+    def fence_token(self, epoch):
+        return self.distributed_lock.fence_token(epoch)
+
+    def recover_token(self):
+        return self.distributed_lock.recover_token()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def run(mode, ns_address, duration):
+    ptype = "bench-" + mode
+    peers = [LockPeer(ns_address, ptype, mode) for i in range(opts.peers)]
+    stop = time.monotonic() + duration
+    waits = []
+
+    def worker(peer):
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            peer.distributed_lock.acquire()
+            local.append(time.perf_counter() - start)
+            time.sleep(opts.hold)
+            peer.distributed_lock.release()
+        waits.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(peer, ))
+               for peer in peers for i in range(opts.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = [peer.distributed_lock.stats() for peer in peers]
+    for peer in peers:
+        peer.destroy()
+    messages = sum(s["messages"] for s in stats)
+    batched = sum(s["batched"] for s in stats)
+    return len(waits), messages, batched, waits
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+name_service = NameService()
+skeleton = orb.Skeleton(name_service, ("127.0.0.1", free_port()))
+skeleton.start()
+
+print("{:<12} {:>6} {:>9} {:>7} {:>10} {:>10}".format(
+    "mode", "CS", "msgs/CS", "batched", "p50 (ms)", "p99 (ms)"))
+for mode in (distributedLock.SEQUENTIAL, distributedLock.ROUND_ROBIN,
+             distributedLock.TIMESTAMP):
+    with contextlib.redirect_stdout(io.StringIO()):
+        count, messages, batched, waits = run(mode, skeleton.address,
+                                              opts.duration)
+    print("{:<12} {:>6} {:>9.2f} {:>7} {:>10.2f} {:>10.2f}".format(
+        mode, count, messages / count if count else float("nan"), batched,
+        percentile(waits, 0.5) * 1000, percentile(waits, 0.99) * 1000))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of Database writes per second.
+
+Concurrent writers follow the path of the lab1 server: append the
+fortune while holding the write lock, then commit it after releasing
+the lock. Every durability level of the group-commit writer is compared
+with the default of opening the file for every write.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import argparse
+
+sys.path.append("../modules")
+from Server.database import Database
+from Server.groupCommit import DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC
+from Server.Lock.readWriteLock import ReadWriteLock
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Writes per second for concurrent writers."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-n", "--writes", metavar="WRITES", dest="writes", type=int, default=2000,
+    help="Total number of writes for every measurement. Default: 2000."
+)
+parser.add_argument(
+    "-c", "--concurrency", metavar="WRITERS", dest="writers", type=int,
+    nargs="+", default=[1, 16, 128],
+    help="Numbers of concurrent writers. Default: 1 16 128."
+)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file", default="../lab1/dbs/fortune.db",
+    help="Database copied as the starting point. Default: ../lab1/dbs/fortune.db."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def run(db_file, durability, writers, writes):
+    """Return the writes per second and the number of file writes."""
+
+    db = Database(db_file, durability)
+    rwlock = ReadWriteLock()
+
+    def writer(count):
+        for i in range(count):
+            rwlock.write_acquire()
+            try:
+                ticket = db.append("Benchmark fortune number {}.".format(i))
+            finally:
+                rwlock.write_release()
+            db.commit(ticket)
+
+    threads = [threading.Thread(target=writer, args=(writes // writers, ))
+               for i in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    batches = writes
+    if db.writer is not None:
+        batches = db.writer.batches
+        db.writer.close()
+    return (writes // writers) * writers / elapsed, batches
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+directory = tempfile.mkdtemp()
+try:
+    print("{:>8} {:>8} {:>12} {:>8}".format("writers", "mode", "writes/s",
+                                            "batches"))
+    for writers in opts.writers:
+        for durability in (None, DURABILITY_NONE, DURABILITY_FLUSH,
+                           DURABILITY_FSYNC):
+            db_file = os.path.join(directory, "fortune.db")
+            shutil.copy(opts.file, db_file)
+            rate, batches = run(db_file, durability, writers, opts.writes)
+            print("{:>8} {:>8} {:>12.0f} {:>8}".format(
+                writers, durability or "open", rate, batches))
+finally:
+    shutil.rmtree(directory)
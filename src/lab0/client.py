@@ -15,7 +15,7 @@ import argparse
 
 import sys
 sys.path.append("../modules")
-from Server.database import Database
+from Server.database import Database, MappedDatabase
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -33,6 +33,11 @@ parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
     default=False, help="Interactive session with the fortune database."
 )
+parser.add_argument(
+    "-m", "--mmap", action="store_true", dest="mmap", default=False,
+    help="Read the fortunes from a memory map of the database file "
+         "instead of loading them all into memory."
+)
 opts = parser.parse_args()
 
 # -----------------------------------------------------------------------------
@@ -40,7 +45,10 @@ opts = parser.parse_args()
 # -----------------------------------------------------------------------------
 
 # Create the database object
-db = Database("dbs/fortune.db")
+if opts.mmap:
+    db = MappedDatabase("dbs/fortune.db")
+else:
+    db = Database("dbs/fortune.db")
 
 if not opts.interactive:
     # Run in the normal mode
@@ -17,6 +17,12 @@ import json
 import select
 import argparse
 
+sys.path.append("../modules")
+from Common import readCache
+
+# Initial size of the buffer the response is received into.
+BUFFER_SIZE = 4096
+
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
 # -----------------------------------------------------------------------------
@@ -42,6 +48,17 @@ parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
     default=False, help="Interactive session with the fortune database."
 )
+parser.add_argument(
+    "-c", "--cache", metavar="SIZE", dest="cache", type=int, default=0,
+    help="Keep up to SIZE fortunes read and read from them while the "
+         "database does not change. Default: 0, no cache."
+)
+parser.add_argument(
+    "--cache-policy", dest="cache_policy", default=readCache.LRU,
+    choices=[readCache.LRU, readCache.CLOCK],
+    help="Fortune evicted from a full cache: the least recently read (lru) "
+         "or one not read since the last sweep (clock). Default: lru."
+)
 parser.add_argument(
     "address", type=address, nargs=1, metavar="addr:port",
     help="Server address."
@@ -77,15 +94,31 @@ class DatabaseProxy(object):
     def send_to_server(self, message):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect(self.address)
-        self.sock.send(message)
+        self.sock.sendall(message)
 
     def receive_from_server(self):
-        result = self.sock.recv(2048)
-        self.sock.close()
-        return result.decode()
+        """Receive the response line, however long it is."""
 
-    def read(self):
-        message = json.dumps({"method": "read", "args": []})
+        data = bytearray(BUFFER_SIZE)
+        size = 0
+        try:
+            while True:
+                if size == len(data):
+                    data.extend(bytes(len(data)))
+                received = self.sock.recv_into(memoryview(data)[size:])
+                if not received:
+                    break
+                size += received
+                if data.find(b"\n", size - received, size) >= 0:
+                    break
+        finally:
+            self.sock.close()
+        return str(memoryview(data)[:size], "utf-8")
+
+    def call(self, method, args):
+        """Call method on the server and return its result."""
+
+        message = json.dumps({"method": method, "args": args})
         message += '\n'
         self.send_to_server(message.encode())
         receive = self.receive_from_server()
@@ -101,33 +134,30 @@ class DatabaseProxy(object):
         except ComunicationError as e:
             print(e)
 
-        # will never be reached
+    def read(self):
+        return self.call("read", [])
 
-    def write(self, fortune):
-        message = json.dumps({"method": "write", "args": [fortune]})
-        message += '\n'
-        self.send_to_server(message.encode())
-        receive = self.receive_from_server()
-        try:
-            response = json.loads(receive)
-            if "result" in response:
-                return response["result"]
-            elif "error" in response:
-                exception = type(response["error"]["name"], (Exception, ), {})
-                raise exception(response["error"]["args"])
-            else:
-                raise ComunicationError("ProtocolError", ["Protocol not followed"])
-        except ComunicationError as e:
-            print(e)
+    def read_many(self, k, distinct=True):
+        return self.call("read_many", [k, distinct])
 
+    def write(self, fortune):
+        self.call("write", [fortune])
         return
 
+    def version(self):
+        return self.call("version", [])
+
+    def read_records(self, indices):
+        return self.call("read_records", [indices])
+
 # -----------------------------------------------------------------------------
 # The main program
 # -----------------------------------------------------------------------------
 
 # Create the database object.
 db = DatabaseProxy(server_address)
+if opts.cache > 0:
+    db = readCache.ReadCache(db, opts.cache, opts.cache_policy)
 
 if not opts.interactive:
     # Run in the normal mode.
@@ -143,6 +173,7 @@ else:
 Choose one of the following commands:
     r            ::  read a random fortune from the database,
     w <FORTUNE>  ::  write a new fortune into the database,
+    c            ::  display the hit rate of the cache (with -c),
     h            ::  print this menu,
     q            ::  exit.\
 """)
@@ -157,5 +188,8 @@ Choose one of the following commands:
         elif (len(command) > 1 and command[0] == "w" and
                 command[1] in [" ", "\t"]):
             db.write(command[2:].strip())
+        elif command == "c" and opts.cache > 0:
+            for name, value in sorted(db.stats().items()):
+                print("    {}: {}".format(name, value))
         elif command == "h":
             menu()
@@ -13,14 +13,22 @@
 
 import threading
 import socket
+import time
 import json
 import random
 import argparse
 
 import sys
 sys.path.append("../modules")
-from Server.database import Database
+from Common import log
+from Common import orb
+from Common import wire
+from Common import metrics
+from Common.metrics import registry
+from Server.database import Database, MappedDatabase
+from Server.groupCommit import DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC
 from Server.Lock.readWriteLock import ReadWriteLock
+from Server.Lock import fairReadWriteLock
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -43,8 +51,69 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-m", "--mmap", action="store_true", dest="mmap", default=False,
+    help="Read the fortunes from a memory map of the database file "
+         "instead of loading them all into memory."
+)
+parser.add_argument(
+    "-d", "--durability", dest="durability", default=None,
+    choices=[DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC],
+    help="Keep the database file open and save concurrent writes together, "
+         "waiting for them to be buffered, flushed or synced to the disk. "
+         "Default: open the file for every write."
+)
+parser.add_argument(
+    "-w", "--workers", metavar="WORKERS", dest="workers", type=int, default=0,
+    help="Serve the requests on a fixed number of worker threads. "
+         "Default: 0, a new thread for every request."
+)
+parser.add_argument(
+    "-q", "--queue", metavar="SIZE", dest="queue_size", type=int, default=64,
+    help="Number of requests waiting for a worker. Default: 64."
+)
+parser.add_argument(
+    "-o", "--overload", dest="overload", default=orb.OVERLOAD_BLOCK,
+    choices=[orb.OVERLOAD_BLOCK, orb.OVERLOAD_REJECT],
+    help="What to do with requests when the queue is full: wait for room "
+         "or answer with an error. Default: block."
+)
+parser.add_argument(
+    "-b", "--backlog", metavar="BACKLOG", dest="backlog", type=int,
+    default=socket.SOMAXCONN,
+    help="Length of the queue of pending connections. "
+         "Default: the system maximum."
+)
+parser.add_argument(
+    "-l", "--lock", dest="lock", default="classic",
+    choices=["classic", fairReadWriteLock.READER_PREFERRING,
+             fairReadWriteLock.WRITER_PREFERRING, fairReadWriteLock.FIFO],
+    help="Fairness of the readers-writers lock: the classic reader-preferring "
+         "lock, or a FairReadWriteLock preferring readers, writers, or "
+         "first come, first served. Default: classic."
+)
+parser.add_argument(
+    "-k", "--max-read-many", metavar="K", dest="max_read_many", type=int,
+    default=1000,
+    help="Most fortunes a client may read with one call of read_many; "
+         "larger calls are answered with an error. Default: 1000."
+)
+parser.add_argument(
+    "--log-level", dest="log_level", default="info",
+    choices=sorted(log.LEVELS),
+    help="Least level of the messages printed; debug shows every "
+         "connection. Default: info."
+)
+parser.add_argument(
+    "--metrics-every", metavar="SECONDS", dest="metrics_every", type=float,
+    default=0,
+    help="Write the metrics of the server to the standard error every so "
+         "many seconds; 0 never does. Default: 0."
+)
 opts = parser.parse_args()
 
+logger = log.get("server")
+
 db_file = opts.file
 server_address = ("", opts.port)
 
@@ -57,9 +126,17 @@ class Server(object):
 
     """Class that provides synchronous access to the database."""
 
-    def __init__(self, db_file):
-        self.db = Database(db_file)
-        self.rwlock = ReadWriteLock()
+    def __init__(self, db_file, mapped=False, durability=None, policy=None,
+                 max_read_many=1000):
+        if mapped:
+            self.db = MappedDatabase(db_file)
+        else:
+            self.db = Database(db_file, durability)
+        if policy is None:
+            self.rwlock = ReadWriteLock()
+        else:
+            self.rwlock = fairReadWriteLock.FairReadWriteLock(policy)
+        self.max_read_many = max_read_many
 
     # Public methods
 
@@ -76,6 +153,27 @@ class Server(object):
 
         return result
 
+    def read_many(self, args):
+        """ Reading k random fortunes under a single hold of the read-lock
+            args: [k] or [k, distinct], distinct being True by default,
+            k being at most max_read_many
+        :return result (list of fortunes read from the database) """
+
+        k = args[0]
+        distinct = args[1] if len(args) > 1 else True
+        if k > self.max_read_many:
+            raise ValueError("Cannot read more than {} fortunes at once"
+                             .format(self.max_read_many))
+
+        self.rwlock.read_acquire()
+
+        try:
+            result = self.db.read_many(k, distinct)
+        finally:
+            self.rwlock.read_release()
+
+        return result
+
     def write(self, fortune):
         """ Writing to the database and utilizing the write-lock
         :return result) """
@@ -83,12 +181,43 @@ class Server(object):
         self.rwlock.write_acquire()
 
         try:
-            self.db.write(fortune[0])
+            ticket = self.db.append(fortune[0])
         finally:
             self.rwlock.write_release()
 
+        # Wait for the fortune to be saved outside of the lock, so that
+        # the writes made meanwhile can be saved along with it.
+        self.db.commit(ticket)
+
         return
 
+    def version(self):
+        """ Return the version of the database, bumped by every write,
+            and its number of fortunes, for clients caching them
+        :return [version, count] """
+
+        return [self.db.version, len(self.db)]
+
+    def read_records(self, indices):
+        """ Reading the fortunes at the given positions at once
+        :return [[version, count], fortunes] """
+
+        self.rwlock.read_acquire()
+
+        try:
+            state = self.version()
+            result = self.db.records(indices[0])
+        finally:
+            self.rwlock.read_release()
+
+        return [state, result]
+
+    def metrics(self):
+        """Return the counters, gauges and latency histograms of the
+        server."""
+
+        return registry.snapshot()
+
 
 class Request(threading.Thread):
 
@@ -130,6 +259,7 @@ class Request(threading.Thread):
         """
         message = json.loads(request)
 
+        start = time.perf_counter()
         try:
             method = getattr(self.db_server, message["method"])
             arguments = message["args"]
@@ -139,27 +269,42 @@ class Request(threading.Thread):
                 result = json.dumps({"result": method()})
 
         except Exception as e:
+            registry.counter("server.errors").add()
             result = json.dumps({"error": {"name": type(e).__name__, "args": e.args}})
 
+        registry.histogram("server.call.{}".format(message.get("method"))
+                           ).record(time.perf_counter() - start)
         return result
 
     def run(self):
         try:
-            # Threat the socket as a file stream.
-            worker = self.conn.makefile(mode="rw")
-            # Read the request in a serialized form (JSON).
-            request = worker.readline()
+            # Receive the request line (JSON) into the buffer of this
+            # thread, however long it is, and decode it from there.
+            request = wire.thread_buffer().read_line(self.conn)
+            if request is None:
+                raise EOFError("The caller sent no request")
             # Process the request.
-            result = self.process_request(request)
+            result = self.process_request(str(request, "utf-8"))
 
-            # Send the result.
-            worker.write(result + '\n')
-            worker.flush()
+            # Send the result and its line end without joining them.
+            wire.send_buffers(self.conn, [result.encode(), b"\n"])
         except Exception as e:
             # Catch all errors in order to prevent the object from crashing
             # due to bad connections coming from outside.
-            print("The connection to the caller has died:")
-            print("\t{}: {}".format(type(e), e))
+            logger.info("The connection to the caller has died:\n\t%s: %s",
+                        type(e), e)
+        finally:
+            self.conn.close()
+
+    def reject(self):
+        """Answer with an error as no worker can take the request."""
+
+        registry.counter("server.rejected").add()
+        try:
+            error = {"name": "ServerOverloaded", "args": ["Server is overloaded"]}
+            self.conn.sendall((json.dumps({"error": error}) + '\n').encode())
+        except OSError:
+            pass
         finally:
             self.conn.close()
 
@@ -167,15 +312,25 @@ class Request(threading.Thread):
 # The main program
 # -----------------------------------------------------------------------------
 
+log.set_level(opts.log_level)
 print("Listening to: {}:{}".format(socket.gethostname(), opts.port))
 with open("srv_address.tmp", "w") as f:
     f.write("{}:{}\n".format(socket.gethostname(), opts.port))
 
-sync_db = Server(db_file)
+policy = None if opts.lock == "classic" else opts.lock
+sync_db = Server(db_file, opts.mmap, opts.durability, policy,
+                 opts.max_read_many)
 
 server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 server.bind(server_address)
-server.listen(1)
+server.listen(opts.backlog)
+
+pool = None
+if opts.workers > 0:
+    pool = orb.WorkerPool(opts.workers, opts.queue_size, opts.overload)
+
+if opts.metrics_every > 0:
+    metrics.Dump(registry, opts.metrics_every).start()
 
 print("Press Ctrl-C to stop the server...")
 
@@ -184,8 +339,12 @@ try:
         try:
             conn, addr = server.accept()
             req = Request(sync_db, conn, addr)
-            print("Serving a request from {0}".format(addr))
-            req.start()
+            registry.counter("server.connections").add()
+            logger.debug("Serving a request from %s", addr)
+            if pool is None:
+                req.start()
+            elif not pool.submit(req.run):
+                req.reject()
         except socket.error:
             continue
 except KeyboardInterrupt:
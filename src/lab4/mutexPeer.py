@@ -23,6 +23,7 @@ from Common.objectType import object_type
 
 from Server.peerList import PeerList
 from Server.Lock.distributedLock import DistributedLock
+from Server.Lock import distributedLock
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -42,6 +43,13 @@ parser.add_argument(
     "-t", "--type", metavar="TYPE", dest="type", default=object_type,
     help="Set the type of the client."
 )
+parser.add_argument(
+    "-L", "--lock-mode", dest="lock_mode", default=distributedLock.SEQUENTIAL,
+    choices=[distributedLock.SEQUENTIAL, distributedLock.ROUND_ROBIN,
+             distributedLock.TIMESTAMP],
+    help="How the distributed lock asks for the token and whom it passes "
+         "it on to. Default: {}.".format(distributedLock.SEQUENTIAL)
+)
 opts = parser.parse_args()
 
 local_port = opts.port
@@ -57,18 +65,23 @@ class Client(orb.Peer):
 
     """Distributed mutual exclusion client class."""
 
-    def __init__(self, local_address, ns_address, cient_type):
+    def __init__(self, local_address, ns_address, cient_type,
+                 lock_mode=distributedLock.SEQUENTIAL):
         """Initialize the client."""
         orb.Peer.__init__(self, local_address, ns_address, client_type)
         self.peer_list = PeerList(self)
-        self.distributed_lock = DistributedLock(self, self.peer_list)
+        self.distributed_lock = DistributedLock(self, self.peer_list,
+                                                lock_mode)
         self.dispatched_calls = {
             "display_peers":      self.peer_list.display_peers,
             "acquire":            self.distributed_lock.acquire,
             "release":            self.distributed_lock.release,
             "request_token":      self.distributed_lock.request_token,
             "obtain_token":       self.distributed_lock.obtain_token,
-            "display_status":     self.distributed_lock.display_status
+            "fence_token":        self.distributed_lock.fence_token,
+            "recover_token":      self.distributed_lock.recover_token,
+            "display_status":     self.distributed_lock.display_status,
+            "lock_stats":         self.distributed_lock.stats
         }
         orb.Peer.start(self)
         self.peer_list.initialize()
@@ -103,7 +116,7 @@ class Client(orb.Peer):
 
 # Initialize the client object.
 local_address = (socket.gethostname(), local_port)
-p = Client(local_address, name_service_address, client_type)
+p = Client(local_address, name_service_address, client_type, opts.lock_mode)
 
 
 def menu():
@@ -16,6 +16,8 @@ import argparse
 
 sys.path.append("../modules")
 from Common import orb
+from Common import readCache
+from Common import replicaSet
 from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
 
@@ -44,6 +46,23 @@ parser.add_argument(
     "-p", "--peer", metavar="PEER_ID", dest="peer_id", type=int,
     help="The identifier of a particular server peer."
 )
+parser.add_argument(
+    "-b", "--balance", dest="balance", default=None,
+    choices=[replicaSet.POWER_OF_TWO, replicaSet.EWMA],
+    help="Spread the reads over all the server peers, choosing among two "
+         "random ones (p2c) or the fastest one (ewma)."
+)
+parser.add_argument(
+    "-c", "--cache", metavar="SIZE", dest="cache", type=int, default=0,
+    help="Keep up to SIZE fortunes read and read from them while the "
+         "database does not change. Default: 0, no cache."
+)
+parser.add_argument(
+    "--cache-policy", dest="cache_policy", default=readCache.LRU,
+    choices=[readCache.LRU, readCache.CLOCK],
+    help="Fortune evicted from a full cache: the least recently read (lru) "
+         "or one not read since the last sweep (clock). Default: lru."
+)
 opts = parser.parse_args()
 
 server_type = opts.type
@@ -57,23 +76,35 @@ assert server_type != "object", "Change the object type to something unique!"
 # Connect to the name service to obtain the address of the server.
 ns = orb.Stub(name_service_address)
 
-if server_id is None:
-    server_address = tuple(ns.require_any(server_type))
+if opts.balance is not None:
+    # Create the database object over all the replicas.
+    db = replicaSet.ReplicaSetStub(
+        ns, server_type, opts.balance,
+        read_methods=("read", "read_many", "read_records", "version"))
+    print("Connecting to servers: {}".format(sorted(db.replicas)))
 else:
-    server_address = tuple(ns.require_object(server_type, server_id))
+    if server_id is None:
+        server_address = tuple(ns.require_any(server_type))
+    else:
+        server_address = tuple(ns.require_object(server_type, server_id))
+
+    print("Connecting to server: {}".format(server_address))
 
-print("Connecting to server: {}".format(server_address))
+    # Create the database object.
+    db = orb.Stub(server_address)
 
-# Create the database object.
-db = orb.Stub(server_address)
+# Reads and writes go through the cache, if any.
+fortunes = db
+if opts.cache > 0:
+    fortunes = readCache.ReadCache(db, opts.cache, opts.cache_policy)
 
 if not opts.interactive:
     # Run in the normal mode.
     if opts.fortune is not None:
         print("Writing '{}' to the fortune database.".format(opts.fortune))
-        db.write(opts.fortune)
+        fortunes.write(opts.fortune)
     else:
-        print(db.read())
+        print(fortunes.read())
 
 else:
     # Run in the interactive mode.
@@ -82,6 +113,8 @@ else:
 Choose one of the following commands:
     r            ::  read a random fortune from the database,
     w <FORTUNE>  ::  write a new fortune into the database,
+    s            ::  display the latency of the servers (with -b),
+    c            ::  display the hit rate of the cache (with -c),
     h            ::  print this menu,
     q            ::  exit.\
 """)
@@ -92,9 +125,15 @@ Choose one of the following commands:
         sys.stdout.write("Command> ")
         command = input()
         if command == "r":
-            print(db.read())
+            print(fortunes.read())
         elif (len(command) > 1 and command[0] == "w" and
                 command[1] in [" ", "\t"]):
-            db.write(command[2:].strip())
+            fortunes.write(command[2:].strip())
+        elif command == "s" and opts.balance is not None:
+            for pid, stats in sorted(db.stats().items()):
+                print("    id: {:>2}, {}".format(pid, stats))
+        elif command == "c" and opts.cache > 0:
+            for name, value in sorted(fortunes.stats().items()):
+                print("    {}: {}".format(name, value))
         elif command == "h":
             menu()
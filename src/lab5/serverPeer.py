@@ -13,29 +13,54 @@
 a database.
 
 This server is one in a group of servers that all replicate the same
-data, so they implement 'read any write all' protocol.
+data, so they implement 'read any write all' protocol, or, with
+--replication quorum, read and write quorums (see Server.quorum).
 
 """
 
 import sys
+import json
+import signal
 import random
 import socket
 import argparse
 
 sys.path.append("../modules")
+from Common import log
 from Common import orb
+from Common import metrics
+from Common import tracing
 from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
 
 from Server import database
+from Server.groupCommit import DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC
 from Server.peerList import PeerList
+from Server import failureDetector
+from Server.failureDetector import FailureDetector
+from Server.quorum import QuorumStore
 from Server.Lock.distributedLock import DistributedLock
+from Server.Lock import distributedLock
 from Server.Lock.distributedReadWriteLock import DistributedReadWriteLock
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
 # -----------------------------------------------------------------------------
 
+WRITE_ALL = "write-all"
+QUORUM = "quorum"
+
+# Calls to the other replicas that may safely be made twice.
+IDEMPOTENT = ["quorum_store", "quorum_digest", "quorum_keys",
+              "quorum_records", "fence_token", "lock_stats"]
+
+# Calls of the replicas to each other, served outside the worker pool
+# (--workers): the writes of clients hold the workers while they wait
+# for the token or for the other replicas, which then depend on these.
+UNPOOLED = ["request_token", "obtain_token", "fence_token", "recover_token",
+            "check", "register_peer", "unregister_peer", "write_local",
+            "quorum_store", "quorum_digest", "quorum_keys", "quorum_records"]
+
 rand = random.Random()
 rand.seed()
 description = """Database server replica. """
@@ -54,8 +79,164 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-m", "--mmap", action="store_true", dest="mmap", default=False,
+    help="Read the fortunes from a memory map of the database file "
+         "instead of loading them all into memory."
+)
+parser.add_argument(
+    "-d", "--durability", dest="durability", default=None,
+    choices=[DURABILITY_NONE, DURABILITY_FLUSH, DURABILITY_FSYNC],
+    help="Keep the database file open and save concurrent writes together, "
+         "waiting for them to be buffered, flushed or synced to the disk. "
+         "Default: open the file for every write."
+)
+parser.add_argument(
+    "-w", "--workers", metavar="WORKERS", dest="workers", type=int, default=0,
+    help="Serve the requests on a fixed number of worker threads. "
+         "Default: 0, a new thread for every connection."
+)
+parser.add_argument(
+    "-q", "--queue", metavar="SIZE", dest="queue_size", type=int, default=64,
+    help="Number of requests waiting for a worker. Default: 64."
+)
+parser.add_argument(
+    "-o", "--overload", dest="overload", default=orb.OVERLOAD_BLOCK,
+    choices=[orb.OVERLOAD_BLOCK, orb.OVERLOAD_REJECT],
+    help="What to do with requests when the queue is full: wait for room "
+         "or answer with an error. Default: block."
+)
+parser.add_argument(
+    "-b", "--backlog", metavar="BACKLOG", dest="backlog", type=int,
+    default=socket.SOMAXCONN,
+    help="Length of the queue of pending connections. "
+         "Default: the system maximum."
+)
+parser.add_argument(
+    "-T", "--write-timeout", metavar="SECONDS", dest="write_timeout",
+    type=float, default=10.0,
+    help="How long to wait for the other replicas to write a fortune. "
+         "Default: 10 seconds."
+)
+parser.add_argument(
+    "-r", "--replication", dest="replication", default=WRITE_ALL,
+    choices=[WRITE_ALL, QUORUM],
+    help="Replicate the writes on all the replicas under the distributed "
+         "lock, or on quorums. Default: {}.".format(WRITE_ALL)
+)
+parser.add_argument(
+    "-N", "--replicas", metavar="N", dest="replicas", type=int, default=3,
+    help="Number of replicas of the group in quorum mode, whether they "
+         "are running or not. Default: 3."
+)
+parser.add_argument(
+    "-R", "--read-quorum", metavar="R", dest="read_quorum", type=int,
+    default=None,
+    help="Replicas consulted by a read in quorum mode. "
+         "Default: a majority."
+)
+parser.add_argument(
+    "-W", "--write-quorum", metavar="W", dest="write_quorum", type=int,
+    default=None,
+    help="Replicas that must store a write in quorum mode. "
+         "Default: a majority."
+)
+parser.add_argument(
+    "--headless", action="store_true", dest="headless", default=False,
+    help="Run without the command menu until interrupted or terminated."
+)
+parser.add_argument(
+    "-L", "--lock-mode", dest="lock_mode", default=distributedLock.SEQUENTIAL,
+    choices=[distributedLock.SEQUENTIAL, distributedLock.ROUND_ROBIN,
+             distributedLock.TIMESTAMP],
+    help="How the distributed lock asks for the token and whom it passes "
+         "it on to. Default: {}.".format(distributedLock.SEQUENTIAL)
+)
+parser.add_argument(
+    "--local-bound", metavar="WRITES", dest="local_bound", type=int,
+    default=distributedLock.LOCAL_BOUND,
+    help="Times in a row the token goes to the next local write while "
+         "other replicas wait for it. "
+         "Default: {}.".format(distributedLock.LOCAL_BOUND)
+)
+parser.add_argument(
+    "--lease", metavar="SECONDS", dest="lease", type=float,
+    default=distributedLock.LEASE,
+    help="How long to wait for the token before asking the other replicas "
+         "to recover it. Default: {} seconds.".format(distributedLock.LEASE)
+)
+parser.add_argument(
+    "--heartbeat", metavar="SECONDS", dest="heartbeat", type=float,
+    default=failureDetector.INTERVAL,
+    help="Interval between the heartbeats of the failure detector; 0 turns "
+         "it off. Default: {} seconds.".format(failureDetector.INTERVAL)
+)
+parser.add_argument(
+    "--suspect-after", metavar="SECONDS", dest="suspect_after", type=float,
+    default=None,
+    help="Suspect a replica after this long without a heartbeat. "
+         "Default: use the phi threshold."
+)
+parser.add_argument(
+    "--phi", metavar="PHI", dest="phi", type=float,
+    default=failureDetector.PHI,
+    help="Suspicion level at which a replica is suspected. "
+         "Default: {}.".format(failureDetector.PHI)
+)
+parser.add_argument(
+    "--call-timeout", metavar="SECONDS", dest="call_timeout", type=float,
+    default=30.0,
+    help="Deadline of the calls to the other replicas that are given none "
+         "of their own. Default: 30 seconds."
+)
+parser.add_argument(
+    "--persistent", action="store_true", dest="persistent", default=False,
+    help="Keep a pooled connection open to every other replica instead of "
+         "connecting for every call."
+)
+parser.add_argument(
+    "--trusted-peers", action="store_true", dest="trusted", default=False,
+    help="The replicas and their callers trust each other: offer and "
+         "accept the compact marshal codec on persistent connections."
+)
+parser.add_argument(
+    "--retries", metavar="RETRIES", dest="retries", type=int, default=2,
+    help="Times an idempotent call to another replica is retried when it "
+         "cannot reach it. Default: 2."
+)
+parser.add_argument(
+    "--max-read-many", metavar="K", dest="max_read_many", type=int,
+    default=1000,
+    help="Most fortunes a client may read with one call of read_many; "
+         "larger calls are answered with an error. Default: 1000."
+)
+parser.add_argument(
+    "--log-level", dest="log_level", default="info",
+    choices=sorted(log.LEVELS),
+    help="Least level of the messages printed; debug shows every "
+         "connection and lock operation. Default: info."
+)
+parser.add_argument(
+    "--metrics-every", metavar="SECONDS", dest="metrics_every", type=float,
+    default=0,
+    help="Write the metrics of the server to the standard error every so "
+         "many seconds; 0 never does. Default: 0."
+)
+parser.add_argument(
+    "--trace", metavar="FILE", dest="trace", default=None,
+    help="Append the spans of the traced requests to FILE, which the "
+         "servers may share; see bench/criticalPath.py."
+)
+parser.add_argument(
+    "--trace-sample", metavar="FRACTION", dest="trace_sample", type=float,
+    default=1.0,
+    help="Fraction of the reads and writes of clients that are traced. "
+         "Default: 1.0."
+)
 opts = parser.parse_args()
 
+logger = log.get("serverPeer")
+
 local_port = opts.port
 db_file = opts.file
 server_type = opts.type
@@ -71,29 +252,78 @@ class Server(orb.Peer):
 
     """Distributed mutual exclusion client class."""
 
-    def __init__(self, local_address, ns_address, server_type, db_file):
+    def __init__(self, local_address, ns_address, server_type, db_file,
+                 pool=None, backlog=socket.SOMAXCONN, write_timeout=None,
+                 mapped=False, durability=None, replication=WRITE_ALL,
+                 replicas=3, read_quorum=None, write_quorum=None,
+                 lock_mode=distributedLock.SEQUENTIAL,
+                 local_bound=distributedLock.LOCAL_BOUND,
+                 lease=distributedLock.LEASE,
+                 heartbeat=failureDetector.INTERVAL, suspect_after=None,
+                 phi=failureDetector.PHI, call_timeout=None, retries=0,
+                 persistent=False, trusted=False, max_read_many=1000):
         """Initialize the client."""
 
-        orb.Peer.__init__(self, local_address, ns_address, server_type)
-        self.peer_list = PeerList(self)
-        self.distributed_lock = DistributedLock(self, self.peer_list)
+        orb.Peer.__init__(self, local_address, ns_address, server_type,
+                          pool, backlog, UNPOOLED, trusted)
+        self.write_timeout = write_timeout
+        self.max_read_many = max_read_many
+        self.peer_list = PeerList(self, persistent, call_timeout,
+                                  orb.Retry(IDEMPOTENT, retries))
+        self.distributed_lock = DistributedLock(self, self.peer_list,
+                                                lock_mode, local_bound, lease)
+        self.failure_detector = None
+        if heartbeat > 0:
+            self.failure_detector = FailureDetector(
+                self, self.peer_list, heartbeat, suspect_after, phi,
+                self._peer_failed)
         self.drwlock = DistributedReadWriteLock(self.distributed_lock)
-        self.db = database.Database(db_file)
+        if mapped:
+            self.db = database.MappedDatabase(db_file)
+        else:
+            self.db = database.Database(db_file, durability)
+        self.quorum = None
+        if replication == QUORUM:
+            self.quorum = QuorumStore(self, self.peer_list, self.db,
+                                      replicas, read_quorum, write_quorum,
+                                      write_timeout)
         self.dispatched_calls = {
             "display_peers":      self.peer_list.display_peers,
             "acquire":            self.distributed_lock.acquire,
             "release":            self.distributed_lock.release,
             "request_token":      self.distributed_lock.request_token,
             "obtain_token":       self.distributed_lock.obtain_token,
-            "display_status":     self.distributed_lock.display_status
+            "fence_token":        self.distributed_lock.fence_token,
+            "recover_token":      self.distributed_lock.recover_token,
+            "display_status":     self.distributed_lock.display_status,
+            "lock_stats":         self.distributed_lock.stats
         }
+        if self.quorum is not None:
+            self.dispatched_calls.update({
+                "quorum_store":   self.quorum.quorum_store,
+                "quorum_digest":  self.quorum.quorum_digest,
+                "quorum_keys":    self.quorum.quorum_keys,
+                "quorum_records": self.quorum.quorum_records
+            })
         orb.Peer.start(self)
         self.peer_list.initialize()
         self.distributed_lock.initialize()
+        if self.failure_detector is not None:
+            self.failure_detector.start()
+
+    # Private methods
+
+    def _peer_failed(self, pid):
+        """Called by the failure detector for every failed replica."""
+
+        if self.quorum is None:
+            self.distributed_lock.peer_failed(pid)
 
     # Public methods
 
     def destroy(self):
+        if self.failure_detector is not None:
+            self.failure_detector.stop()
         orb.Peer.destroy(self)
         self.distributed_lock.destroy()
         self.peer_list.destroy()
@@ -110,13 +340,25 @@ class Server(orb.Peer):
     # Public methods
 
     def read(self):
-        """Read a fortune from the database."""
-        self.drwlock.read_acquire()
-        try:
-            fortune = self.db.read()
-        finally:
-            self.drwlock.read_release()
-        return fortune
+        """Read a fortune from the database.
+
+        No lock is taken: the database publishes a snapshot of its
+        fortunes after every write, and reads from the last one."""
+        if self.quorum is not None:
+            return self.quorum.read()
+        return self.db.read()
+
+    def read_many(self, k, distinct=True):
+        """Read k random fortunes from the database in one call.
+
+        If distinct, no fortune is read twice. As read(), it takes no
+        lock. At most max_read_many fortunes are read at once."""
+        if k > self.max_read_many:
+            raise ValueError("Cannot read more than {} fortunes at once"
+                             .format(self.max_read_many))
+        if self.quorum is not None:
+            return self.quorum.read_many(k, distinct)
+        return self.db.read_many(k, distinct)
 
     def write(self, fortune):
         """Write a fortune to the database.
@@ -124,17 +366,45 @@ class Server(orb.Peer):
         Obtain the distributed lock and call all other servers to write
         the fortune as well. Call their 'write_local' as they cannot
         attempt to obtain the distributed lock when writing their
-        copies."""
+        copies. The replicas are called in parallel, so the time spent
+        here is that of the slowest of them, bounded by write_timeout.
+
+        In quorum mode, no lock is taken and the fortune is stored on a
+        write quorum instead."""
+
+        if self.quorum is not None:
+            return self.quorum.write(fortune)
 
-        self.drwlock.write_acquire()
+        with tracing.span("lock.acquire"):
+            self.drwlock.write_acquire()
 
         try:
-            self.db.write(fortune)
-            for peer_id, peer_adress in self.peer_list.peers.items():
-                peer = self.peer_list.peers[peer_id]
-                peer.write_local(fortune)
+            ticket = self.db.append(fortune)
+            with tracing.span("replicate"):
+                results, failures = self.peer_list.broadcast(
+                    "write_local", fortune, timeout=self.write_timeout)
+            for peer_id, error in failures.items():
+                logger.warning("Replica %s has not written the fortune: %s",
+                               peer_id, error)
         finally:
-            self.drwlock.write_release()
+            with tracing.span("lock.release"):
+                self.drwlock.write_release()
+        with tracing.span("db.commit"):
+            self.db.commit(ticket)
+
+    def version(self):
+        """Return the version of the database, bumped by every write,
+        and its number of fortunes, for clients caching them."""
+
+        return [self.db.version, len(self.db)]
+
+    def read_records(self, indices):
+        """Read the fortunes at the given positions at once.
+
+        Return them along with version(). As read(), it takes no lock;
+        in quorum mode, the fortunes are those of this replica."""
+
+        return [self.version(), self.db.records(indices)]
 
     def write_local(self, fortune):
         """Write a fortune to the database.
@@ -144,9 +414,11 @@ class Server(orb.Peer):
 
         self.drwlock.write_acquire_local()
         try:
-            self.db.write(fortune)
+            ticket = self.db.append(fortune)
         finally:
             self.drwlock.write_release_local()
+        with tracing.span("db.commit"):
+            self.db.commit(ticket)
 
     def register_peer(self, pid, paddr):
         """Register a server peer in this server's peer list."""
@@ -164,9 +436,27 @@ class Server(orb.Peer):
 # The main program
 # -----------------------------------------------------------------------------
 
+log.set_level(opts.log_level)
+if opts.trace is not None:
+    tracing.enable(opts.trace, ["read", "write"], opts.trace_sample,
+                   "{}:{}".format(server_type, local_port))
+
 # Initialize the client object.
 local_address = (socket.gethostname(), local_port)
-p = Server(local_address, name_service_address, server_type, db_file)
+pool = None
+if opts.workers > 0:
+    pool = orb.WorkerPool(opts.workers, opts.queue_size, opts.overload)
+p = Server(local_address, name_service_address, server_type, db_file,
+           pool, opts.backlog, opts.write_timeout, opts.mmap,
+           opts.durability, opts.replication, opts.replicas, opts.read_quorum,
+           opts.write_quorum, opts.lock_mode, opts.local_bound, opts.lease,
+           opts.heartbeat, opts.suspect_after, opts.phi, opts.call_timeout,
+           opts.retries, opts.persistent, opts.trusted, opts.max_read_many)
+
+dump = None
+if opts.metrics_every > 0:
+    dump = metrics.Dump(metrics.registry, opts.metrics_every)
+    dump.start()
 
 
 def menu():
@@ -174,13 +464,26 @@ def menu():
 Choose one of the following commands:
     l  ::  list peers,
     s  ::  display status,
+    m  ::  display metrics,
     h  ::  print this menu,
     q  ::  exit.\
 """)
 
-command = ""
+if opts.headless:
+    # Terminating the server unregisters it, as Ctrl-C does.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print("Running as {}({}), press Ctrl-C to stop...".format(p.type, p.id))
+    try:
+        while True:
+            signal.pause()
+    except KeyboardInterrupt:
+        pass
+    command = "q"
+else:
+    command = ""
+    menu()
+
 cursor = "{}({})> ".format(p.type, p.id)
-menu()
 while command != "q":
     try:
         sys.stdout.write(cursor)
@@ -189,6 +492,8 @@ while command != "q":
             p.display_peers()
         elif command == "s":
             p.display_status()
+        elif command == "m":
+            print(json.dumps(p.metrics(), indent=2))
         elif command == "h":
             menu()
     except KeyboardInterrupt:
@@ -198,4 +503,6 @@ while command != "q":
         print("An error has occurred: {}.".format(e))
 
 # Kill our peer object.
+if dump is not None:
+    dump.stop()
 p.destroy()
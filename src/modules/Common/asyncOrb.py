@@ -0,0 +1,262 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Asynchronous Object Request Broker
+
+asyncio counterpart of the orb module. It speaks the same JSON-line
+protocol, so its objects can talk to the ones in orb:
+
+--  AsyncStub ::
+        Awaitable image of a remote object. All the calls made through
+        a stub share one connection and are tagged with an "id", like
+        the calls of a persistent orb.Stub.
+--  AsyncSkeleton ::
+        Serves an owner object from an event loop. Coroutine methods of
+        the owner run on the loop; plain methods, which may block, run
+        in an executor.
+--  call_all ::
+        Make the same call on many stubs concurrently.
+
+A single event loop can keep thousands of these connections open
+without a thread for each of them.
+"""
+
+import asyncio
+import functools
+import itertools
+import json
+import time
+
+from . import log
+from . import orb
+from . import tracing
+from .metrics import registry
+
+logger = log.get("asyncOrb")
+
+# Longest request or response line accepted on a connection.
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+def _traced(context, method, args):
+    with tracing.activated(context):
+        return method(*args)
+
+
+class AsyncStub(object):
+
+    """Awaitable stub for a remote object.
+
+    Every attribute is a coroutine function forwarding the call over
+    the network:
+
+        result = await stub.read()
+
+    """
+
+    def __init__(self, address):
+        self.address = tuple(address)
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.connect_lock = asyncio.Lock()
+
+    # Private methods
+
+    async def _connect(self):
+        async with self.connect_lock:
+            if self.writer is None or self.writer.is_closing():
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.address[0], self.address[1], limit=LINE_LIMIT)
+                asyncio.ensure_future(self._read_responses(self.reader))
+            return self.writer
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line.decode())
+                future = self.pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (OSError, ValueError):
+            pass
+        finally:
+            if self.reader is reader:
+                self.writer = None
+            pending, self.pending = self.pending, {}
+            error = orb.CommunicationError(
+                "ConnectionLost",
+                ["Connection to {} lost".format(self.address)])
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def _rmi(self, method, *args):
+        writer = await self._connect()
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+
+        request = ''.join((json.dumps({"id": request_id, "method": method,
+                                       "args": args}), '\n'))
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            raise orb.CommunicationError("ConnectionClosed", [str(e)])
+        return orb.read_result(await future)
+
+    # Public methods
+
+    async def close(self):
+        """Close the connection to the remote object."""
+
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    def __getattr__(self, attr):
+        """Forward call to name over the network at the given address."""
+        async def rmi_call(*args):
+            return await self._rmi(attr, *args)
+        return rmi_call
+
+
+class AsyncSkeleton(object):
+
+    """Serve an owner object from an asyncio event loop.
+
+    Plain requests, as sent by orb.Stub, are answered in order; tagged
+    requests run concurrently and are answered as they complete.
+
+    """
+
+    def __init__(self, owner, address, executor=None):
+        self.owner = owner
+        self.address = tuple(address)
+        self.executor = executor
+        self.server = None
+
+    # Private methods
+
+    async def _execute(self, message):
+        if "batch" in message:
+            # The calls of a batch run one after the other.
+            return {"batch": [orb.deadline_exceeded() if orb.expired(message)
+                              else await self._execute(call)
+                              for call in message["batch"]]}
+        if orb.expired(message):
+            registry.counter("server.expired").add()
+            return orb.deadline_exceeded()
+        start = time.perf_counter()
+        span = tracing.server_span(message.get("method"), message.get("trace"))
+        context = message.get("trace") if span is None else span.context()
+        try:
+            method = getattr(self.owner, message["method"])
+            if asyncio.iscoroutinefunction(method):
+                result = await method(*message["args"])
+            else:
+                # The context is per thread: hand it over to the worker.
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self.executor, functools.partial(
+                        _traced, context, method, message["args"]))
+            return {"result": result}
+        except Exception as e:
+            registry.counter("server.errors").add()
+            return {"error": {"name": type(e).__name__, "args": list(e.args)}}
+        finally:
+            registry.histogram("server.call.{}".format(message.get("method"))
+                               ).record(time.perf_counter() - start)
+            if span is not None:
+                span.finish()
+
+    async def _serve(self, message, writer):
+        in_flight = registry.gauge("server.in_flight")
+        in_flight.add()
+        try:
+            response = await self._execute(message)
+        finally:
+            in_flight.remove()
+        if "id" in message:
+            response["id"] = message["id"]
+        try:
+            writer.write(orb.encode_response(response).encode())
+            await writer.drain()
+        except OSError:
+            # The caller has gone away; nobody is left to answer.
+            pass
+
+    async def _serve_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line.decode())
+                if "timeout" in message:
+                    message["received"] = time.monotonic()
+                if "id" in message:
+                    task = asyncio.ensure_future(self._serve(message, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    await self._serve(message, writer)
+            if tasks:
+                await asyncio.wait(tasks)
+        except (OSError, ValueError) as e:
+            logger.info("The connection to %s has died: %s",
+                        writer.get_extra_info("peername"), e)
+        finally:
+            writer.close()
+
+    # Public methods
+
+    async def start(self):
+        """Start listening; the bound address is stored in address."""
+
+        self.server = await asyncio.start_server(
+            self._serve_connection, self.address[0], self.address[1],
+            limit=LINE_LIMIT)
+        self.address = self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+async def call_all(stubs, method, *args, timeout=None):
+    """Call method(*args) on every stub concurrently.
+
+    Return a list with, for each stub, either its result or the
+    exception raised by the call (asyncio.TimeoutError if it did not
+    complete within timeout seconds).
+
+    """
+
+    async def call(stub):
+        return await asyncio.wait_for(getattr(stub, method)(*args), timeout)
+
+    return await asyncio.gather(*(call(stub) for stub in stubs),
+                                return_exceptions=True)
@@ -0,0 +1,117 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Codecs for the messages exchanged by the ORB.
+
+The original protocol sends every message as a line of JSON text. A
+persistent connection may instead switch to binary frames: a 4-byte
+big-endian length followed by the message serialized by one of:
+
+--  JsonCodec ("json") ::
+        JSON encoded as UTF-8, the default.
+--  MarshalCodec ("marshal") ::
+        Python's marshal format: more compact and cheaper to encode and
+        decode. marshal is not meant to read untrusted data, so it
+        should only be offered between peers that trust each other.
+
+The codec is negotiated when a connection is opened. The client sends,
+still as a JSON line, the request
+
+    {"method": "_negotiate_codec", "args": [[name, ...]]}
+
+listing the codecs it accepts, best first. A skeleton answers with the
+name of the first one it accepts, and from then on both sides exchange
+frames encoded with it. Skeletons accept only JSON unless given other
+codecs (ACCEPTED_CODECS), so that marshal is never run on the bytes of
+a caller that has not been trusted explicitly. Peers that trust each
+other offer and accept TRUSTED_CODECS instead. An older skeleton
+answers with an error; the client then keeps to a connection per call.
+
+"""
+
+import json
+import struct
+import marshal
+
+NEGOTIATE = "_negotiate_codec"
+
+# Seconds to wait for the answer to an offer before giving up on it.
+NEGOTIATION_TIMEOUT = 2.0
+
+# Length prefix of a frame.
+HEADER = struct.Struct(">I")
+
+
+class JsonCodec(object):
+
+    """Messages as JSON encoded as UTF-8."""
+
+    name = "json"
+
+    def dumps(self, message):
+        return json.dumps(message, default=str).encode()
+
+    def loads(self, data):
+        return json.loads(str(data, "utf-8"))
+
+
+class MarshalCodec(object):
+
+    """Messages in the marshal format."""
+
+    name = "marshal"
+
+    def dumps(self, message):
+        try:
+            return marshal.dumps(message)
+        except ValueError:
+            # Values marshal does not know are sent as JSON would send
+            # them, i.e., as strings.
+            return marshal.dumps(json.loads(json.dumps(message, default=str)))
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec(),
+    MarshalCodec.name: MarshalCodec(),
+}
+
+# Codecs offered by a client when it opens a connection, best first.
+DEFAULT_CODECS = (JsonCodec.name, )
+
+# Codecs a skeleton accepts unless told otherwise.
+ACCEPTED_CODECS = (JsonCodec.name, )
+
+# Codecs offered and accepted by peers that trust each other, best first.
+TRUSTED_CODECS = (MarshalCodec.name, JsonCodec.name)
+
+
+def choose(offered, accepted=ACCEPTED_CODECS):
+    """Return the name of the first offered codec that is accepted and
+    known here, or None."""
+
+    for name in offered:
+        if name in accepted and name in CODECS:
+            return name
+    return None
+
+
+def frame(payload):
+    """Return the payload preceded by its length."""
+
+    return HEADER.pack(len(payload)) + payload
+
+
+def negotiation(codecs):
+    """Return the JSON line offering the given codecs."""
+
+    return ''.join((json.dumps({"method": NEGOTIATE, "args": [list(codecs)]}),
+                    '\n')).encode()
@@ -0,0 +1,59 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Diagnostic messages that can be switched off.
+
+The ORB, the peer list, the locks and the servers report what they do
+through children of the "tddd25" logger. Messages of level INFO and
+above are printed on the standard output, as they always were, until
+set_level() turns them up, down or off. Messages about every
+connection and every lock operation are at level DEBUG, so that a busy
+server does not pay for them unless asked to.
+
+"""
+
+import sys
+import logging
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "off": logging.CRITICAL + 1,
+}
+
+
+class _StdoutHandler(logging.StreamHandler):
+
+    """Writes to the current sys.stdout, so that redirecting it
+    redirects the messages as well."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+logger = logging.getLogger("tddd25")
+logger.setLevel(logging.INFO)
+logger.addHandler(_StdoutHandler())
+logger.propagate = False
+
+
+def get(name):
+    """Return the logger of a module."""
+    return logger.getChild(name)
+
+
+def set_level(level):
+    """Show the messages of level and above; level is one of LEVELS."""
+    logger.setLevel(LEVELS[level])
@@ -0,0 +1,238 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Counters, gauges and latency histograms of a process.
+
+--  Counter :: a number of events.
+--  Gauge :: a level that goes up and down, e.g., requests in flight.
+--  Histogram :: a distribution of durations, kept in log-linear
+        buckets as HDR histograms do: 2 ** SUB_BITS buckets for every
+        power of two of microseconds. Recording costs a few integer
+        operations and the percentiles are within 1 / 2 ** (SUB_BITS - 1)
+        of the true ones, whatever the number of values.
+--  Registry :: the metrics by name, created on first use. The ORB,
+        the peer list and the locks record theirs in the registry of
+        the module, which orb.Peer.metrics() returns.
+--  Dump :: writes a snapshot of a registry as a JSON line every
+        interval seconds.
+
+"""
+
+import sys
+import json
+import math
+import time
+import threading
+
+SUB_BITS = 7
+
+
+class Counter(object):
+
+    """A number of events."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def add(self, count=1):
+        self.lock.acquire()
+        try:
+            self.value += count
+        finally:
+            self.lock.release()
+
+
+class Gauge(Counter):
+
+    """A level that goes up and down."""
+
+    def remove(self, count=1):
+        self.add(-count)
+
+
+class Histogram(object):
+
+    """A distribution of durations, in log-linear buckets."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    # Private methods
+
+    def _value(self, index):
+        """Return the middle of a bucket, in seconds."""
+
+        exponent = index >> SUB_BITS
+        low = (index & ((1 << SUB_BITS) - 1)) << exponent
+        return (low + ((1 << exponent) - 1) / 2) / 1000000
+
+    # Public methods
+
+    def record(self, seconds):
+        """Add a duration."""
+
+        value = max(0, int(seconds * 1000000))
+        exponent = max(0, value.bit_length() - SUB_BITS)
+        index = (exponent << SUB_BITS) | (value >> exponent)
+        self.lock.acquire()
+        try:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+        finally:
+            self.lock.release()
+
+    def percentiles(self, fractions):
+        """Return the durations below which the given fractions of the
+        values lie, or None for each if there are no values."""
+
+        self.lock.acquire()
+        try:
+            buckets = sorted(self.buckets.items())
+            count = self.count
+        finally:
+            self.lock.release()
+        results = []
+        for fraction in fractions:
+            if not count:
+                results.append(None)
+                continue
+            rank = max(1, math.ceil(fraction * count))
+            seen = 0
+            for index, bucket in buckets:
+                seen += bucket
+                if seen >= rank:
+                    results.append(min(self._value(index), self.max))
+                    break
+        return results
+
+    def summary(self):
+        """Return the count, mean, p50, p99, p999 and max, in ms."""
+
+        p50, p99, p999 = self.percentiles([0.5, 0.99, 0.999])
+        self.lock.acquire()
+        try:
+            count, total, largest = self.count, self.total, self.max
+        finally:
+            self.lock.release()
+        if not count:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean_ms": total / count * 1000,
+            "p50_ms": p50 * 1000,
+            "p99_ms": p99 * 1000,
+            "p999_ms": p999 * 1000,
+            "max_ms": largest * 1000,
+        }
+
+
+class Registry(object):
+
+    """Metrics by name, created on first use."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    # Private methods
+
+    def _get(self, name, kind):
+        metric = self.metrics.get(name)
+        if metric is None:
+            self.lock.acquire()
+            try:
+                metric = self.metrics.setdefault(name, kind())
+            finally:
+                self.lock.release()
+        return metric
+
+    # Public methods
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def gauge(self, name):
+        return self._get(name, Gauge)
+
+    def histogram(self, name):
+        return self._get(name, Histogram)
+
+    def snapshot(self):
+        """Return the value of every metric, as JSON data."""
+
+        self.lock.acquire()
+        try:
+            metrics = sorted(self.metrics.items())
+        finally:
+            self.lock.release()
+        snapshot = {"counters": {}, "gauges": {}, "histograms": {}}
+        for name, metric in metrics:
+            if isinstance(metric, Histogram):
+                snapshot["histograms"][name] = metric.summary()
+            elif isinstance(metric, Gauge):
+                snapshot["gauges"][name] = metric.value
+            else:
+                snapshot["counters"][name] = metric.value
+        return snapshot
+
+
+class Dump(object):
+
+    """Writes a snapshot of a registry every interval seconds.
+
+    Every snapshot is a line of JSON with the time it was taken at, on
+    stream, by default the standard error.
+
+    """
+
+    def __init__(self, registry, interval, stream=None):
+        self.registry = registry
+        self.interval = interval
+        self.stream = stream
+        self.running = threading.Event()
+        self.thread = None
+
+    # Private methods
+
+    def _run(self):
+        while not self.running.wait(self.interval):
+            self.write()
+
+    # Public methods
+
+    def write(self):
+        """Write a snapshot now."""
+
+        snapshot = dict(self.registry.snapshot(), time=time.time())
+        stream = self.stream if self.stream is not None else sys.stderr
+        stream.write(json.dumps(snapshot) + "\n")
+        stream.flush()
+
+    def start(self):
+        self.running.clear()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+registry = Registry()
@@ -0,0 +1,200 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Implementation of a name service that can run locally.
+
+It offers the calls the labs make to the course name service:
+    --  register(type, address) -> (id, hash)
+    --  unregister(id, type, hash)
+    --  require_all(type) -> [[id, address], ...]
+    --  require_any(type) -> address
+    --  require_object(type, id) -> address
+    --  check() :: drop the objects that no longer answer
+
+and, in addition, lets objects subscribe to the changes of the objects
+of a type:
+    --  subscribe(type, address) -> [version, [[id, address], ...]]
+    --  unsubscribe(type, address)
+
+Every change of a type bumps its version. The subscribers are then
+called, in order, with name_service_update(version, event, id,
+address), where event is REGISTER or UNREGISTER, so that they can keep
+a copy of the directory up to date without listing it again. A
+subscriber that does not answer within CALL_TIMEOUT is dropped; it is
+expected to subscribe again when it has not heard from the name service
+for a while (see orb.Peer).
+
+"""
+
+import uuid
+import queue
+import random
+import threading
+
+from . import log
+from . import orb
+
+REGISTER = "register"
+UNREGISTER = "unregister"
+
+# Seconds a subscriber, or an object being checked, has to answer, so
+# that one that hangs does not hold up the others.
+CALL_TIMEOUT = 2.0
+
+logger = log.get("nameService")
+
+
+class NameService(object):
+
+    """Directory of the objects of every type."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.objects = {}
+        self.versions = {}
+        self.subscribers = {}
+        self.notifications = queue.Queue()
+
+        notifier = threading.Thread(target=self._notify)
+        notifier.daemon = True
+        notifier.start()
+
+    # Private methods
+
+    def _objects(self, otype):
+        return self.objects.setdefault(otype, {})
+
+    def _directory(self, otype):
+        return [[oid, list(entry[0])]
+                for oid, entry in sorted(self._objects(otype).items())]
+
+    def _changed(self, otype, event, oid, address):
+        """Record a change of otype; the caller must hold self.lock."""
+
+        version = self.versions.get(otype, 0) + 1
+        self.versions[otype] = version
+        for subscriber in self.subscribers.get(otype, {}).values():
+            self.notifications.put((otype, subscriber, version, event, oid,
+                                    address))
+
+    def _notify(self):
+        """Deliver the changes to the subscribers, in order."""
+
+        while True:
+            otype, subscriber, version, event, oid, address = \
+                self.notifications.get()
+            try:
+                subscriber.name_service_update(version, event, oid, address)
+            except Exception:
+                # The subscriber is gone.
+                self.unsubscribe(otype, subscriber.address)
+
+    # Public methods
+
+    def register(self, otype, address):
+        """Register an object and return its id and secret hash."""
+
+        self.lock.acquire()
+        try:
+            oid = self.next_id
+            self.next_id += 1
+            ohash = uuid.uuid4().hex
+            self._objects(otype)[oid] = (tuple(address), ohash)
+            self._changed(otype, REGISTER, oid, list(address))
+            logger.info("Registered %s of type '%s' at %s.", oid, otype,
+                        tuple(address))
+            return oid, ohash
+        finally:
+            self.lock.release()
+
+    def unregister(self, oid, otype, ohash):
+        """Remove an object; the hash proves the caller registered it."""
+
+        self.lock.acquire()
+        try:
+            objects = self._objects(otype)
+            if oid not in objects or objects[oid][1] != ohash:
+                raise Exception("No object {} of type '{}'".format(oid, otype))
+            address = objects.pop(oid)[0]
+            self._changed(otype, UNREGISTER, oid, list(address))
+            logger.info("Unregistered %s of type '%s'.", oid, otype)
+        finally:
+            self.lock.release()
+
+    def require_all(self, otype):
+        self.lock.acquire()
+        try:
+            return self._directory(otype)
+        finally:
+            self.lock.release()
+
+    def require_any(self, otype):
+        self.lock.acquire()
+        try:
+            objects = self._objects(otype)
+            if not objects:
+                raise Exception("No object of type '{}'".format(otype))
+            return list(random.choice(list(objects.values()))[0])
+        finally:
+            self.lock.release()
+
+    def require_object(self, otype, oid):
+        self.lock.acquire()
+        try:
+            objects = self._objects(otype)
+            if oid not in objects:
+                raise Exception("No object {} of type '{}'".format(oid, otype))
+            return list(objects[oid][0])
+        finally:
+            self.lock.release()
+
+    def check(self):
+        """Remove the objects that do not answer; return their number."""
+
+        self.lock.acquire()
+        try:
+            registered = [(otype, oid, entry[0], entry[1])
+                          for otype, objects in self.objects.items()
+                          for oid, entry in objects.items()]
+        finally:
+            self.lock.release()
+
+        dead = 0
+        for otype, oid, address, ohash in registered:
+            try:
+                orb.Stub(address, timeout=CALL_TIMEOUT).check()
+            except Exception:
+                try:
+                    self.unregister(oid, otype, ohash)
+                    dead += 1
+                except Exception:
+                    continue
+        return dead
+
+    def subscribe(self, otype, address):
+        """Send the changes of otype to the object at address.
+
+        Return the current version and directory of otype.
+        """
+
+        self.lock.acquire()
+        try:
+            self.subscribers.setdefault(otype, {})[tuple(address)] = \
+                orb.Stub(address, timeout=CALL_TIMEOUT)
+            return [self.versions.get(otype, 0), self._directory(otype)]
+        finally:
+            self.lock.release()
+
+    def unsubscribe(self, otype, address):
+        self.lock.acquire()
+        try:
+            self.subscribers.get(otype, {}).pop(tuple(address), None)
+        finally:
+            self.lock.release()
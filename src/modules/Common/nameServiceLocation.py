@@ -14,4 +14,12 @@ structure if the name service changes address.
 
 """
 
+import os
+
 name_service_address = ("chipolata2.ida.liu.se", 42424)
+
+# Use another name service, e.g., a local one started with
+# nameService/nameService.py, by setting TDDD25_NAME_SERVICE=host:port.
+if "TDDD25_NAME_SERVICE" in os.environ:
+    host, port = os.environ["TDDD25_NAME_SERVICE"].rsplit(":", 1)
+    name_service_address = (host, int(port))
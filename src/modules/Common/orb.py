@@ -8,9 +8,20 @@
 # -----------------------------------------------------------------------------
 
 import threading
+import itertools
+import selectors
 import socket
+import queue
 import time
 import json
+import random
+from concurrent.futures import Future, wait
+
+from . import codec
+from . import log
+from . import tracing
+from . import wire
+from .metrics import registry
 """Object Request Broker
 
 This module implements the infrastructure needed to transparently create
@@ -19,6 +30,19 @@ objects that communicate via networks. This infrastructure consists of:
 --  Strub ::
         Represents the image of a remote object on the local machine.
         Used to connect to remote objects. Also called Proxy.
+--  Batch ::
+        Calls to a remote object collected by Stub.batch() and sent
+        together, in one request, when the batch ends.
+--  gather ::
+        Wait for the Futures of several calls started with
+        Stub.async_call(), each within a timeout.
+--  Retry ::
+        Policy for making the calls of idempotent methods again when
+        they fail to reach the remote object.
+--  CircuitBreaker ::
+        Shared by all the stubs of a remote address; makes the calls to
+        it fail fast while it is known to be down.
+
 --  Skeleton ::
         Used to listen to incoming connections and forward them to the
         main object.
@@ -26,8 +50,44 @@ objects that communicate via networks. This infrastructure consists of:
         Class that implements basic bidirectional (Stub/Skeleton)
         communication. Any object wishing to transparently interact with
         remote objects should extend this class.
+--  Connection ::
+        Long-lived connection used by persistent stubs. Requests carry
+        an "id" field that is echoed in the response, so several calls
+        can share the same socket.
+--  WorkerPool ::
+        Fixed number of threads fed from a bounded queue. A Skeleton
+        given a pool runs every request on it instead of starting a
+        thread per connection.
+
+A call may have a deadline. The request then carries the seconds left
+to it ("timeout"), and the skeleton answers with a DeadlineExceeded
+error instead of running a request that has waited past it.
+
+The calls made and served, their latency, the connections set up and
+the requests in flight are recorded in the registry of the metrics
+module, which Peer.metrics() returns. Requests carry the trace context
+of their caller ("trace"), and stubs and skeletons record spans, as
+described in the tracing module.
 """
 
+logger = log.get("orb")
+
+OVERLOAD_BLOCK = "block"
+OVERLOAD_REJECT = "reject"
+
+# Seconds between two attempts to hand the requests of a parked
+# connection to a full worker pool.
+PARK_INTERVAL = 0.01
+
+# Consecutive failures to reach an address after which the calls to it
+# fail fast, and seconds before one of them is let through again.
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 2.0
+
+# Seconds after which a peer that has heard nothing from the name
+# service subscribes again, in case its subscription has been dropped.
+DIRECTORY_TTL = 10.0
+
 
 def create_request(method, args):
     if not args:
@@ -37,29 +97,113 @@ def create_request(method, args):
 
 
 def read_response(response):
+    """Decode a JSON response line and return its result."""
+    return read_result(json.loads(response))
+
+
+def remote_error(error):
+    """Return an exception standing for the error of a remote call."""
+    exception = type(error["name"], (Exception, ), {})
+    return exception(error["args"])
+
+
+def read_result(result):
         try:
-            result = json.loads(response)
             if "result" in result:
                 return result["result"]
             elif "error" in result:
-                exception = type(result["error"]["name"], (Exception, ), {})
-                raise exception(result["error"]["args"])
+                raise remote_error(result["error"])
             else:
                 raise CommunicationError("ProtocolError", ["Protocol not followed"])
         except CommunicationError as e:
-            print(e)
+            logger.warning("%s", e)
 
 
-def process_request(owner, request):
-    message = json.loads(request)
+def read_batch(response):
+    """Decode the response to a batch of calls.
+
+    Return a list with the result of every call, or the exception it
+    raised in its place, or None if the batch itself was refused.
+    """
+
+    if "batch" not in response:
+        return None
+    return [remote_error(result["error"]) if "error" in result
+            else result.get("result") for result in response["batch"]]
 
+
+def gather(futures, timeout=None):
+    """Wait for the futures of several calls.
+
+    Return a list with the result of every call, or the exception it
+    raised in its place. A call that has not completed within timeout
+    seconds gets a TimeoutError; it is not cancelled and may still take
+    effect later.
+    """
+
+    futures = list(futures)
+    wait(futures, timeout)
+    results = []
+    for future in futures:
+        if not future.done():
+            results.append(TimeoutError("The call did not complete in time."))
+        elif future.exception() is not None:
+            results.append(future.exception())
+        else:
+            results.append(future.result())
+    return results
+
+
+def expired(message):
+    """Whether the deadline of a request has passed since it arrived."""
+    return ("timeout" in message and "received" in message and
+            time.monotonic() - message["received"] > message["timeout"])
+
+
+def deadline_exceeded():
+    return {"error": {"name": "DeadlineExceeded",
+                      "args": ["The caller has stopped waiting"]}}
+
+
+def execute(owner, message):
+    """Run the call described by message on owner.
+
+    Return the response as a dictionary: {"result": ...} on success or
+    {"error": {"name": ..., "args": ...}} if the call raised. A message
+    {"batch": [call, ...]} runs the calls one after the other and is
+    answered with {"batch": [response, ...]}. Calls whose deadline has
+    passed are not run.
+
+    The calls are counted and timed in the metrics registry, under
+    "server.call.<method>".
+    """
+
+    if "batch" in message:
+        return {"batch": [deadline_exceeded() if expired(message)
+                          else execute(owner, call)
+                          for call in message["batch"]]}
+    if expired(message):
+        registry.counter("server.expired").add()
+        return deadline_exceeded()
+    start = time.perf_counter()
     try:
         method = getattr(owner, message["method"])
-        result = method(*message["args"])
-        return ''.join((json.dumps({'result': result}), '\n'))
+        return {"result": method(*message["args"])}
+    except Exception as e:
+        registry.counter("server.errors").add()
+        return {"error": {"name": type(e).__name__, "args": list(e.args)}}
+    finally:
+        registry.histogram("server.call.{}".format(message.get("method"))
+                           ).record(time.perf_counter() - start)
+
+
+def encode_response(response):
+    """Serialize a response dictionary as a JSON line."""
+    return ''.join((json.dumps(response, default=str), '\n'))
+
 
-    except AttributeError as e:
-        return ''.join(result, '\n')
+def process_request(owner, request):
+    return encode_response(execute(owner, json.loads(request)))
 
 
 class CommunicationError(Exception):
@@ -73,54 +217,961 @@ class CommunicationError(Exception):
         return self.type
 
 
+class Connection(object):
+
+    """Long-lived, multiplexed connection to a remote address.
+
+    Every request is tagged with a fresh id. A reader thread matches
+    the responses to the waiting callers by that id, so any number of
+    threads can have calls in flight on the same socket.
+
+    When opened with a list of codecs, the connection negotiates one of
+    them with the skeleton (see the codec module) and then exchanges
+    binary frames; otherwise it sends JSON lines. A skeleton that
+    answers the offer with an error is too old to negotiate and raises
+    a CommunicationError ("NotNegotiated"). Connecting and negotiating
+    take at most timeout seconds, if it is given.
+
+    """
+
+    def __init__(self, address, codecs=(), timeout=None):
+        self.address = address
+        start = time.perf_counter()
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError("Connection to {} timed out".format(address))
+        self.sock = socket.create_connection(address, timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.received = wire.ReceiveBuffer()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.closed = False
+        self.codec = None
+        if codecs:
+            if timeout is not None:
+                timeout -= time.perf_counter() - start
+            self._negotiate(codecs, timeout)
+        self.sock.settimeout(None)
+        registry.histogram("client.connect.pooled").record(
+            time.perf_counter() - start)
+
+        reader = threading.Thread(target=self._read_responses)
+        reader.daemon = True
+        reader.start()
+
+    # Private methods
+
+    def _negotiate(self, codecs, timeout=None):
+        # A busy skeleton may be slow to answer: that is no reason to
+        # take it for an old one, but the caller only waits so long.
+        if timeout is None:
+            timeout = codec.NEGOTIATION_TIMEOUT
+        try:
+            if timeout <= 0:
+                raise TimeoutError("Connection to {} timed out".format(
+                    self.address))
+            self.sock.settimeout(timeout)
+            self.sock.sendall(codec.negotiation(codecs))
+            line = self.received.read_line(self.sock)
+            if line is None:
+                raise CommunicationError(
+                    "ConnectionLost",
+                    ["{} did not negotiate".format(self.address)])
+            try:
+                response = json.loads(str(line, "utf-8"))
+            except ValueError:
+                response = {"error": "ProtocolError"}
+        except BaseException:
+            self.sock.close()
+            raise
+        if not isinstance(response, dict) or "error" in response:
+            # An old skeleton does not know the method.
+            self.sock.close()
+            raise CommunicationError(
+                "NotNegotiated",
+                ["{} does not negotiate".format(self.address)])
+        self.codec = codec.CODECS.get(response.get("result"))
+
+    def _receive(self):
+        """Read the next response; return None at the end of the stream."""
+
+        if self.codec is None:
+            line = self.received.read_line(self.sock)
+            return json.loads(str(line, "utf-8")) if line is not None else None
+        payload = self.received.read_frame(self.sock)
+        return self.codec.loads(payload) if payload is not None else None
+
+    def _read_responses(self):
+        error = CommunicationError("ConnectionLost",
+                                   ["Connection to {} lost".format(self.address)])
+        try:
+            while True:
+                response = self._receive()
+                if response is None:
+                    break
+                self.lock.acquire()
+                try:
+                    future = self.pending.pop(response.get("id"), None)
+                finally:
+                    self.lock.release()
+                if future is not None:
+                    future.set_result(response)
+        except (OSError, ValueError, EOFError):
+            pass
+        finally:
+            self.close(error)
+
+    def _encode(self, message):
+        """Return the buffers to send for a request message."""
+
+        if self.codec is None:
+            return [json.dumps(message).encode(), b"\n"]
+        payload = self.codec.dumps(message)
+        return [codec.HEADER.pack(len(payload)), payload]
+
+    # Public methods
+
+    def submit(self, method, args):
+        """Send a request and return a Future for its response."""
+        return self.send({"method": method, "args": args})
+
+    def send(self, message):
+        """Send a request message and return a Future for its response."""
+
+        future = Future()
+        self.lock.acquire()
+        try:
+            if self.closed:
+                raise CommunicationError("ConnectionClosed",
+                                         ["Connection to {} closed".format(self.address)])
+            request_id = next(self.ids)
+            self.pending[request_id] = future
+        finally:
+            self.lock.release()
+
+        request = self._encode(dict(message, id=request_id))
+        try:
+            self.write_lock.acquire()
+            try:
+                wire.send_buffers(self.sock, request)
+            finally:
+                self.write_lock.release()
+        except OSError as e:
+            self.close(CommunicationError("ConnectionClosed", [str(e)]))
+            raise CommunicationError("ConnectionClosed", [str(e)])
+        return future
+
+    def forget(self, future):
+        """Stop waiting for the response of a request, e.g., one that
+        has timed out; it is dropped if it ever arrives."""
+
+        self.lock.acquire()
+        try:
+            for request_id, pending in list(self.pending.items()):
+                if pending is future:
+                    del self.pending[request_id]
+                    break
+        finally:
+            self.lock.release()
+
+    def close(self, error=None):
+        """Close the socket and fail all the calls still waiting."""
+
+        self.lock.acquire()
+        try:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        finally:
+            self.lock.release()
+
+        if error is None:
+            error = CommunicationError("ConnectionClosed", ["Connection closed"])
+        for future in pending.values():
+            future.set_exception(error)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool(object):
+
+    """Keep one Connection per remote address, shared by all stubs.
+
+    New connections offer the codecs listed in codecs. A skeleton that
+    answers the offer with an error predates persistent connections: it
+    serves one request per connection and does not echo request ids.
+    Such addresses are remembered and get() returns None for them, so
+    that stubs connect for every call. A skeleton that is slow to
+    answer or cannot be reached is only tried again on the next call.
+
+    Connections are opened outside of self.lock, so that an address
+    that cannot be reached does not hold up the calls to the others.
+
+    """
+
+    def __init__(self, codecs=codec.DEFAULT_CODECS):
+        self.codecs = tuple(codecs)
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.legacy = set()
+
+    def offer(self, codecs):
+        """Offer codecs on the connections opened from now on."""
+
+        self.lock.acquire()
+        try:
+            self.codecs = tuple(codecs)
+        finally:
+            self.lock.release()
+
+    def get(self, address, timeout=None):
+        """Return a live connection to address, connecting within timeout
+        seconds if needed."""
+
+        self.lock.acquire()
+        try:
+            if address in self.legacy:
+                return None
+            connection = self.connections.get(address)
+            if connection is not None and not connection.closed:
+                return connection
+            codecs = self.codecs
+        finally:
+            self.lock.release()
+
+        try:
+            connection = Connection(address, codecs, timeout)
+        except CommunicationError as e:
+            if e.type != "NotNegotiated":
+                raise
+            self.lock.acquire()
+            try:
+                self.legacy.add(address)
+            finally:
+                self.lock.release()
+            return None
+
+        self.lock.acquire()
+        try:
+            current = self.connections.get(address)
+            if current is None or current.closed:
+                self.connections[address] = connection
+                return connection
+        finally:
+            self.lock.release()
+        # Another caller has connected meanwhile.
+        connection.close()
+        return current
+
+    def discard(self, connection):
+        """Forget a connection that has failed."""
+
+        self.lock.acquire()
+        try:
+            if self.connections.get(connection.address) is connection:
+                del self.connections[connection.address]
+        finally:
+            self.lock.release()
+        connection.close()
+
+
+connection_pool = ConnectionPool()
+
+
+class Retry(object):
+
+    """Policy for retrying the calls of idempotent methods.
+
+    A call of one of methods that fails to reach the remote object, or
+    times out, is made again up to retries times. Before the n-th retry,
+    the caller sleeps for a random time of up to backoff * 2 ** (n - 1)
+    seconds, capped at cap, so that callers do not retry in step; the
+    call is not retried past its deadline.
+
+    """
+
+    def __init__(self, methods, retries=2, backoff=0.05, cap=1.0):
+        self.methods = frozenset(methods)
+        self.retries = retries
+        self.backoff = backoff
+        self.cap = cap
+
+    def delay(self, method, failures):
+        """Return the time to sleep before making a call again after
+        failures attempts, or None if it is not to be retried."""
+
+        if method not in self.methods or failures > self.retries:
+            return None
+        return random.uniform(0, min(self.cap,
+                                     self.backoff * 2 ** (failures - 1)))
+
+
+class CircuitBreaker(object):
+
+    """Circuit breaker for the calls to a remote address.
+
+    After threshold calls in a row have failed to reach the address,
+    the breaker opens and the calls fail fast. After reset seconds, a
+    single call is let through: the breaker closes if it succeeds and
+    opens again otherwise. A call that raises an error of the remote
+    object has reached it and counts as a success. A call that ends
+    without telling either way, e.g., because its response could not
+    be decoded, is abandon()ed, and the next one is let through.
+
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset = reset
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+
+    # Public methods
+
+    def allow(self):
+        """Whether a call may be made now."""
+
+        self.lock.acquire()
+        try:
+            if self.opened is None:
+                return True
+            if self.trial or time.monotonic() - self.opened < self.reset:
+                return False
+            self.trial = True
+            return True
+        finally:
+            self.lock.release()
+
+    def succeeded(self):
+        self.lock.acquire()
+        try:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+        finally:
+            self.lock.release()
+
+    def failed(self):
+        self.lock.acquire()
+        try:
+            self.failures += 1
+            self.trial = False
+            if self.opened is not None or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def abandon(self):
+        """End a call that has neither succeeded nor failed."""
+
+        self.lock.acquire()
+        try:
+            self.trial = False
+        finally:
+            self.lock.release()
+
+    def state(self):
+        self.lock.acquire()
+        try:
+            if self.opened is None:
+                return "closed"
+            return "half-open" if self.trial else "open"
+        finally:
+            self.lock.release()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(address):
+    """Return the circuit breaker of a remote address."""
+
+    _breakers_lock.acquire()
+    try:
+        address = tuple(address)
+        if address not in _breakers:
+            _breakers[address] = CircuitBreaker()
+        return _breakers[address]
+    finally:
+        _breakers_lock.release()
+
+
 class Stub(object):
 
     """ Stub for generic objects distributed over the network.
 
     This is  wrapper object for a socket.
 
+    By default every call opens its own connection. A persistent stub
+    instead sends its calls over the pooled Connection to its address,
+    reconnecting once if that connection turns out to be dead. It falls
+    back to a connection per call for remote objects that do not
+    support persistent connections.
+
+    A call can also be started without waiting for it, with
+    async_call() or stub.method.future(...), which return a Future;
+    gather() waits for several of them.
+
+    Calls that are given no timeout of their own get the one of the
+    stub, if any, and raise TimeoutError once it has passed. The calls
+    of the methods of retry, a Retry, are made again if they fail to
+    reach the remote object. While the circuit breaker of the address
+    is open, calls raise a CommunicationError ("CircuitOpen") at once.
+
     """
 
-    def __init__(self, address):
+    def __init__(self, address, persistent=False, timeout=None, retry=None):
         self.address = tuple(address)
+        self.persistent = persistent
+        self.timeout = timeout
+        self.retry = retry
+        self.breaker = circuit_breaker(self.address)
 
     def _rmi(self, method, *args):
+        return self.call(method, *args)
+
+    def _deadline(self, timeout):
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return None
+        return time.monotonic() + timeout
+
+    def _request(self, message, deadline=None):
+        """Send a request message and return the response dictionary."""
+
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                registry.counter("client.timeouts").add()
+                raise TimeoutError("Call to {} timed out".format(self.address))
+            message = dict(message, timeout=timeout)
+        if not self.breaker.allow():
+            registry.counter("client.circuit_open").add()
+            raise CommunicationError(
+                "CircuitOpen", ["{} is down".format(self.address)])
+        span = tracing.start("call {}".format(message.get("method", "batch")),
+                             tracing.CLIENT, self.address)
+        context = tracing.current() if span is None else span.context()
+        if context is not None:
+            message = dict(message, trace=context)
+        settled = False
+        try:
+            response = self._send(message, timeout)
+            settled = True
+        except (OSError, CommunicationError) as e:
+            settled = True
+            if isinstance(e, TimeoutError):
+                registry.counter("client.timeouts").add()
+            self.breaker.failed()
+            if span is not None:
+                span.finish(e)
+            raise
+        except Exception as e:
+            if span is not None:
+                span.finish(e)
+            raise
+        finally:
+            if not settled:
+                # Neither outcome: if this call was the trial, let
+                # another one through.
+                self.breaker.abandon()
+        self.breaker.succeeded()
+        if span is not None:
+            span.finish()
+        return response
+
+    def _send(self, message, timeout):
+        if self.persistent:
+            response = self._persistent_request(message, timeout)
+            if response is not None:
+                return response
+
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect(self.address)
+        try:
+            sock.settimeout(timeout)
+            start = time.perf_counter()
+            sock.connect(self.address)
+            registry.histogram("client.connect").record(
+                time.perf_counter() - start)
+            wire.send_buffers(sock, [json.dumps(message).encode(), b"\n"])
+            response = wire.thread_buffer().read_line(sock)
+            if response is None:
+                raise CommunicationError(
+                    "ConnectionLost",
+                    ["Connection to {} lost".format(self.address)])
+            return json.loads(str(response, "utf-8"))
+        finally:
+            sock.close()
+
+    def _persistent_request(self, message, timeout=None):
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        for attempt in range(2):
+            try:
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                connection = connection_pool.get(self.address, timeout)
+                if connection is None:
+                    # The remote object only serves a call per connection.
+                    return None
+                future = connection.send(message)
+            except (OSError, CommunicationError):
+                # The pooled connection was closed by the other end
+                # (e.g., the remote object restarted): reconnect once.
+                if attempt:
+                    raise
+                continue
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+            try:
+                return future.result(timeout)
+            except TimeoutError:
+                # The response will not be waited for any more.
+                connection.forget(future)
+                raise TimeoutError("Call to {} timed out".format(self.address))
+
+    def _resolve(self, future, response, method, start, span):
+        """Set the result of future from that of a response Future."""
+
+        registry.histogram("client.call.{}".format(method)).record(
+            time.perf_counter() - start)
+        try:
+            result = response.result()
+        except Exception as e:
+            self.breaker.failed()
+            if span is not None:
+                span.finish(e)
+            future.set_exception(e)
+            return
+        self.breaker.succeeded()
+        if span is not None:
+            span.finish()
+        try:
+            future.set_result(read_result(result))
+        except Exception as e:
+            future.set_exception(e)
 
-        request = ''.join((json.dumps({'method': method, 'args': args}), '\n'))
+    def _run(self, future, method, args, timeout, context):
+        try:
+            with tracing.activated(context):
+                future.set_result(self.call(method, *args, timeout=timeout))
+        except Exception as e:
+            future.set_exception(e)
+
+    # Public methods
+
+    def call(self, method, *args, timeout=None):
+        """Call method(*args) within timeout seconds, or the timeout of
+        the stub, retrying it as the retry policy allows.
+
+        The calls are counted and timed in the metrics registry, under
+        "client.call.<method>"."""
 
-        worker = sock.makefile(mode="rw")
-        worker.write(request)
-        worker.flush()
-        response = worker.readline()
-        sock.close()
-        return read_response(response)
+        start = time.perf_counter()
+        deadline = self._deadline(timeout)
+        failures = 0
+        try:
+            while True:
+                try:
+                    return read_result(self._request(
+                        {"method": method, "args": list(args)}, deadline))
+                except (OSError, CommunicationError) as e:
+                    failures += 1
+                    delay = None
+                    if (self.retry is not None and not
+                            getattr(e, "type", None) == "CircuitOpen"):
+                        delay = self.retry.delay(method, failures)
+                    if delay is None or (deadline is not None and
+                                         time.monotonic() + delay >= deadline):
+                        raise
+                    registry.counter("client.retries").add()
+                    time.sleep(delay)
+        finally:
+            registry.histogram("client.call.{}".format(method)).record(
+                time.perf_counter() - start)
+
+    def async_call(self, method, *args, timeout=None):
+        """Start a call and return a Future for its result.
+
+        A persistent stub sends it over the pooled connection, where any
+        number of calls can be in flight; otherwise, or if the call may
+        be retried, the call is made in a thread of its own. The Future
+        of a pipelined call does not time out; wait for it with one.
+        """
+
+        future = Future()
+        start = time.perf_counter()
+        deadline = self._deadline(timeout)
+        retried = self.retry is not None and method in self.retry.methods
+        if self.persistent and not retried:
+            message = {"method": method, "args": list(args)}
+            if deadline is not None:
+                message["timeout"] = deadline - time.monotonic()
+            for attempt in range(2):
+                if not self.breaker.allow():
+                    future.set_exception(CommunicationError(
+                        "CircuitOpen", ["{} is down".format(self.address)]))
+                    return future
+                span = None
+                try:
+                    connection = connection_pool.get(
+                        self.address, deadline - time.monotonic()
+                        if deadline is not None else None)
+                    if connection is None:
+                        # The thread below asks the breaker again.
+                        self.breaker.abandon()
+                        break
+                    span = tracing.start("call {}".format(method),
+                                         tracing.CLIENT, self.address)
+                    context = (tracing.current() if span is None
+                               else span.context())
+                    if context is not None:
+                        message["trace"] = context
+                    response = connection.send(message)
+                except (OSError, CommunicationError) as e:
+                    # Reconnect once, as _persistent_request() does.
+                    self.breaker.failed()
+                    if span is not None:
+                        span.finish(e)
+                    if attempt:
+                        future.set_exception(e)
+                        return future
+                    continue
+                except Exception:
+                    self.breaker.abandon()
+                    raise
+                response.add_done_callback(
+                    lambda response: self._resolve(future, response, method,
+                                                   start, span))
+                return future
+
+        caller = threading.Thread(target=self._run,
+                                  args=(future, method, args, timeout,
+                                        tracing.current()))
+        caller.daemon = True
+        caller.start()
+        return future
+
+    def call_many(self, calls, timeout=None):
+        """Make a list of calls, given as (method, args) pairs, in one
+        round trip, within timeout seconds or the timeout of the stub.
+
+        The remote object runs them in order. Return a list with the
+        result of every call, or the exception it raised in its place.
+        A remote object that does not know batches is sent the calls
+        one at a time.
+        """
+
+        calls = [(method, list(args)) for method, args in calls]
+        if not calls:
+            return []
+        deadline = self._deadline(timeout)
+        results = read_batch(self._request(
+            {"batch": [{"method": method, "args": args}
+                       for method, args in calls]}, deadline))
+        if results is None:
+            results = []
+            for method, args in calls:
+                try:
+                    results.append(read_result(self._request(
+                        {"method": method, "args": args}, deadline)))
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    def batch(self):
+        """Return a Batch collecting calls to this object."""
+        return Batch(self)
 
     def __getattr__(self, attr):
-        """Forward call to name over the network at the given address."""
+        """Forward call to name over the network at the given address.
+
+        stub.name.future(*args) starts the call with async_call()."""
         def rmi_call(*args):
             return self._rmi(attr, *args)
+        rmi_call.future = lambda *args: self.async_call(attr, *args)
         return rmi_call
 
 
+class Batch(object):
+
+    """Calls to a remote object sent together in one request.
+
+        with stub.batch() as batch:
+            batch.write_local("A fortune.")
+            fortune = batch.read()
+        print(fortune.result())
+
+    Every call returns a Future. When the block ends, the calls are
+    sent with Stub.call_many() and the futures get their results or
+    errors. Nothing is sent if the block raises.
+
+    """
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.calls = []
+        self.futures = []
+
+    # Public methods
+
+    def send(self):
+        """Send the calls collected so far and resolve their futures."""
+
+        calls, futures = self.calls, self.futures
+        self.calls, self.futures = [], []
+        try:
+            results = self.stub.call_many(calls)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            raise
+        for future, result in zip(futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+        return False
+
+    def __getattr__(self, attr):
+        """Record a call to be sent with the batch."""
+        def batched_call(*args):
+            future = Future()
+            self.calls.append((attr, args))
+            self.futures.append(future)
+            return future
+        return batched_call
+
+
+class Channel(object):
+
+    """Server side of a connection to a caller.
+
+    Receives the incoming bytes into a reusable buffer (see the wire
+    module), decodes the requests in place and sends back the
+    responses. Responses to tagged requests carry the same "id" and
+    may be sent in any order.
+
+    A channel starts with JSON lines. If the caller offers codecs (see
+    the codec module), the channel chooses one of those in codecs,
+    answers the offer and then reads and writes frames encoded with it.
+
+    """
+
+    def __init__(self, owner, conn, addr, codecs=codec.ACCEPTED_CODECS):
+        self.owner = owner
+        self.conn = conn
+        self.addr = addr
+        self.codecs = tuple(codecs)
+        self.received = wire.ReceiveBuffer()
+        self.codec = None
+        self.write_lock = threading.Lock()
+
+    def _negotiate(self, message):
+        name = codec.choose(message["args"][0], self.codecs)
+        self.reply(message, {"result": name})
+        if name is not None:
+            self.codec = codec.CODECS[name]
+
+    def _next_message(self):
+        """Remove the next complete request from the buffer.
+
+        Return None if the buffer does not hold a whole request.
+        """
+
+        if self.codec is None:
+            line = self.received.line()
+            if line is None:
+                return None
+            line = str(line, "utf-8")
+            return json.loads(line) if line.strip() else {}
+
+        payload = self.received.frame()
+        if payload is None:
+            return None
+        return self.codec.loads(payload)
+
+    def receive(self):
+        """Receive bytes from the caller and return the requests now
+        complete, or None once the caller has closed the connection.
+
+        A request with a deadline is stamped with the time it arrived
+        ("received"), by which the deadline is measured."""
+
+        if not self.received.fill(self.conn):
+            return None
+        messages = []
+        received = time.monotonic()
+        while True:
+            message = self._next_message()
+            if message is None:
+                return messages
+            if "timeout" in message:
+                message["received"] = received
+            if message.get("method") == codec.NEGOTIATE:
+                # The caller waits for the answer before sending frames.
+                self._negotiate(message)
+            elif message:
+                messages.append(message)
+
+    def reply(self, message, response):
+        """Send the response to the given request."""
+
+        if "id" in message:
+            response["id"] = message["id"]
+        if self.codec is None:
+            data = [json.dumps(response, default=str).encode(), b"\n"]
+        else:
+            payload = self.codec.dumps(response)
+            data = [codec.HEADER.pack(len(payload)), payload]
+        self.write_lock.acquire()
+        try:
+            wire.send_buffers(self.conn, data)
+        except OSError:
+            # The caller has gone away; nobody is left to answer.
+            pass
+        finally:
+            self.write_lock.release()
+
+    def serve(self, message):
+        """Run the request on the owner and send back the response."""
+
+        in_flight = registry.gauge("server.in_flight")
+        in_flight.add()
+        try:
+            with tracing.serving(message.get("method", "batch"),
+                                 message.get("trace")):
+                response = execute(self.owner, message)
+            self.reply(message, response)
+        finally:
+            in_flight.remove()
+
+    def reject(self, message):
+        """Answer a request the server has no capacity for."""
+
+        registry.counter("server.rejected").add()
+        self.reply(message, {"error": {"name": "ServerOverloaded",
+                                       "args": ["Server is overloaded"]}})
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
 class Request(threading.Thread):
 
     """Run the incoming requests on the owner object of the skeleton."""
 
-    def __init__(self, owner, conn, addr):
+    def __init__(self, owner, conn, addr, codecs=codec.ACCEPTED_CODECS):
         threading.Thread.__init__(self)
         self.addr = addr
         self.conn = conn
         self.owner = owner
+        self.codecs = codecs
         self.daemon = True
 
     def run(self):
-        worker = self.conn.makefile(mode="rw")
-        request = worker.readline()
-        result = process_request(self.owner, request)
-        worker.write(result)
-        worker.flush()
+        """Serve requests until the caller closes the connection.
+
+        Plain requests (without an "id") are answered in order. Tagged
+        requests come from a multiplexed Connection and are run in
+        their own thread, so a call that blocks (e.g., waiting for a
+        token) does not hold up the others sharing the socket.
+
+        """
+
+        channel = Channel(self.owner, self.conn, self.addr, self.codecs)
+        try:
+            while True:
+                messages = channel.receive()
+                if messages is None:
+                    break
+                for message in messages:
+                    if "id" in message:
+                        worker = threading.Thread(target=channel.serve,
+                                                  args=(message, ))
+                        worker.daemon = True
+                        worker.start()
+                    else:
+                        channel.serve(message)
+        except (OSError, ValueError, EOFError) as e:
+            logger.info("The connection to %s has died: %s", self.addr, e)
+        finally:
+            channel.close()
+
+
+class WorkerPool(object):
+
+    """Fixed set of worker threads fed from a bounded queue.
+
+    When the queue is full, submit either waits for room
+    (OVERLOAD_BLOCK) or refuses the task (OVERLOAD_REJECT).
+
+    Tasks that block waiting for other peers (e.g., a distributed lock)
+    hold a worker all the while, so the pool must be larger than the
+    number of such calls that can be pending at the same time, and the
+    calls that would let them go on must not need a worker (see the
+    unpooled methods of Skeleton).
+
+    """
+
+    def __init__(self, workers=8, queue_size=64, overload=OVERLOAD_BLOCK):
+        if overload not in (OVERLOAD_BLOCK, OVERLOAD_REJECT):
+            raise ValueError("Unknown overload policy: '{}'".format(overload))
+        self.overload = overload
+        self.tasks = queue.Queue(queue_size)
+        for i in range(workers):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+
+    def _work(self):
+        while True:
+            task, args = self.tasks.get()
+            try:
+                task(*args)
+            except Exception as e:
+                logger.warning("A task has failed: %s: %s", type(e), e)
+
+    # Public methods
+
+    def submit(self, task, *args):
+        """Queue task(*args). Return False if it has been rejected."""
+
+        if self.overload == OVERLOAD_REJECT:
+            try:
+                self.tasks.put_nowait((task, args))
+            except queue.Full:
+                return False
+        else:
+            self.tasks.put((task, args))
+        return True
+
+    def offer(self, task, *args):
+        """Queue task(*args) if there is room. Return whether it was."""
+
+        try:
+            self.tasks.put_nowait((task, args))
+        except queue.Full:
+            return False
+        return True
 
 
 class Skeleton(threading.Thread):
@@ -130,41 +1181,156 @@ class Skeleton(threading.Thread):
     This is used to listen to an address of the network, manage incoming
     connections and forward calls to the generic owner class.
 
+    Without a pool, every connection is served by its own Request
+    thread. With a WorkerPool, the skeleton thread reads all the
+    connections itself and hands each request to the pool, so the
+    number of threads stays fixed however many callers there are. The
+    skeleton thread never waits for the pool: when its queue is full, a
+    request is either rejected (OVERLOAD_REJECT) or its connection is
+    parked, i.e., no longer read, until the pool takes its requests
+    (OVERLOAD_BLOCK). The methods in unpooled are run in threads of
+    their own instead, so that the calls that waiting tasks depend on
+    (e.g., passing a token) are served even when all the workers wait.
+
+    Callers may only switch to the codecs in codecs (see the codec
+    module); marshal, in particular, has to be given explicitly.
+
     """
 
-    def __init__(self, owner, address):
+    def __init__(self, owner, address, pool=None, backlog=socket.SOMAXCONN,
+                 codecs=codec.ACCEPTED_CODECS, unpooled=()):
         threading.Thread.__init__(self)
         self.address = address
         self.owner = owner
+        self.pool = pool
+        self.codecs = tuple(codecs)
+        self.unpooled = frozenset(unpooled)
         self.daemon = True
 
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.bind(self.address)
-        self.server_socket.listen(1)
+        self.server_socket.listen(backlog)
 
     def run(self):
+        if self.pool is not None:
+            self._run_pooled()
         while True:
             try:
                 conn, addr = self.server_socket.accept()
-                request = Request(self.owner, conn, addr)
-                print("Serving request from {0}".format(addr))
+                request = Request(self.owner, conn, addr, self.codecs)
+                registry.counter("server.connections").add()
+                logger.debug("Serving request from %s", addr)
                 request.start()
             except socket.error:
                 continue
 
+    def _dispatch(self, channel, message, parked):
+        """Hand a request to the pool; return False if it is full and
+        the connection has to be parked."""
+
+        if message.get("method") in self.unpooled:
+            thread = threading.Thread(target=channel.serve, args=(message,))
+            thread.daemon = True
+            thread.start()
+            return True
+        if channel in parked:
+            # Keep the order of the requests of a parked connection.
+            parked[channel].append(message)
+            return True
+        if self.pool.offer(channel.serve, message):
+            return True
+        if self.pool.overload == OVERLOAD_REJECT:
+            channel.reject(message)
+            return True
+        parked[channel] = [message]
+        return False
+
+    def _unpark(self, selector, parked):
+        """Hand the requests of the parked connections to the pool, and
+        read again those that have none left."""
+
+        for channel in list(parked):
+            messages = parked[channel]
+            while messages and self.pool.offer(channel.serve, messages[0]):
+                messages.pop(0)
+            if messages:
+                # The pool is still full.
+                return
+            del parked[channel]
+            selector.register(channel.conn, selectors.EVENT_READ, channel)
+
+    def _run_pooled(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.server_socket, selectors.EVENT_READ)
+        parked = {}
+        while True:
+            if parked:
+                self._unpark(selector, parked)
+            timeout = PARK_INTERVAL if parked else None
+            for key, events in selector.select(timeout):
+                if key.fileobj is self.server_socket:
+                    try:
+                        conn, addr = self.server_socket.accept()
+                    except socket.error:
+                        continue
+                    registry.counter("server.connections").add()
+                    logger.debug("Serving request from %s", addr)
+                    selector.register(conn, selectors.EVENT_READ,
+                                      Channel(self.owner, conn, addr,
+                                              self.codecs))
+                    continue
+
+                channel = key.data
+                try:
+                    messages = channel.receive()
+                except (OSError, ValueError, EOFError):
+                    messages = None
+                if messages is None:
+                    selector.unregister(channel.conn)
+                    channel.close()
+                    continue
+                for message in messages:
+                    if not self._dispatch(channel, message, parked):
+                        registry.counter("server.parked").add()
+                        selector.unregister(channel.conn)
+
 
 class Peer:
 
-    """Class, extended by objects that communicate over the network."""
+    """Class, extended by objects that communicate over the network.
+
+    When the name service supports it, the peer subscribes to the
+    changes of the objects of its type and keeps a copy of their
+    directory, so that require_all() is answered locally. The name
+    service drops subscribers it cannot notify, so a copy that has not
+    been confirmed for DIRECTORY_TTL seconds is fetched again, which
+    subscribes the peer anew.
 
-    def __init__(self, l_address, ns_address, ptype):
+    A trusted peer offers and accepts codec.TRUSTED_CODECS, marshal
+    included, on the persistent connections of the process; all the
+    callers that can reach its skeleton must then be trusted.
+
+    """
+
+    def __init__(self, l_address, ns_address, ptype, pool=None,
+                 backlog=socket.SOMAXCONN, unpooled=(), trusted=False):
         self.type = ptype
         self.hash = ""
         self.id = -1
         self.address = self._get_external_interface(l_address)
-        self.skeleton = Skeleton(self, self.address)
+        codecs = codec.ACCEPTED_CODECS
+        if trusted:
+            # The peers of the network trust each other.
+            codecs = codec.TRUSTED_CODECS
+            connection_pool.offer(codecs)
+        self.skeleton = Skeleton(self, self.address, pool, backlog, codecs,
+                                 unpooled)
         self.name_service_address = self._get_external_interface(ns_address)
         self.name_service = Stub(self.name_service_address)
+        self.directory_lock = threading.Lock()
+        self.directory = None
+        self.directory_version = 0
+        self.directory_checked = None
 
     # Private methods
 
@@ -190,6 +1356,25 @@ class Peer:
         addr[0] = addr_name
         return tuple(addr)
 
+    def _subscribe(self):
+        """Fetch the directory of our type and follow its changes."""
+
+        try:
+            version, entries = self.name_service.subscribe(self.type,
+                                                           self.address)
+        except Exception:
+            # The name service does not support subscriptions.
+            return
+        self.directory_lock.acquire()
+        try:
+            if self.directory is None or version > self.directory_version:
+                self.directory = dict((pid, tuple(paddr))
+                                      for pid, paddr in entries)
+                self.directory_version = version
+            self.directory_checked = time.monotonic()
+        finally:
+            self.directory_lock.release()
+
     # Public methods
 
     def start(self):
@@ -198,13 +1383,68 @@ class Peer:
         self.skeleton.start()
         self.id, self.hash = self.name_service.register(self.type,
                                                         self.address)
+        self._subscribe()
 
     def destroy(self):
         """Unregister the object before removal."""
 
+        if self.directory is not None:
+            try:
+                self.name_service.unsubscribe(self.type, self.address)
+            except Exception:
+                pass
         self.name_service.unregister(self.id, self.type, self.hash)
 
+    def require_all(self):
+        """Return the ids and addresses of all the objects of our type."""
+
+        self.directory_lock.acquire()
+        try:
+            expired = (self.directory is not None and
+                       time.monotonic() - self.directory_checked >
+                       DIRECTORY_TTL)
+        finally:
+            self.directory_lock.release()
+        if expired:
+            self._subscribe()
+
+        self.directory_lock.acquire()
+        try:
+            if self.directory is not None:
+                return [[pid, paddr]
+                        for pid, paddr in sorted(self.directory.items())]
+        finally:
+            self.directory_lock.release()
+        return self.name_service.require_all(self.type)
+
+    def name_service_update(self, version, event, pid, paddr):
+        """Apply a change of the directory pushed by the name service."""
+
+        self.directory_lock.acquire()
+        try:
+            if self.directory is None or version <= self.directory_version:
+                return
+            in_order = version == self.directory_version + 1
+            if in_order:
+                if event == "register":
+                    self.directory[pid] = tuple(paddr)
+                else:
+                    self.directory.pop(pid, None)
+                self.directory_version = version
+                self.directory_checked = time.monotonic()
+        finally:
+            self.directory_lock.release()
+        if not in_order:
+            # A change has been missed: fetch the whole directory again.
+            self._subscribe()
+
     def check(self):
         """Checking to see if the object is still alive."""
 
         return (self.id, self.type)
+
+    def metrics(self):
+        """Return the counters, gauges and latency histograms of this
+        process (see the metrics module)."""
+
+        return registry.snapshot()
@@ -0,0 +1,317 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Client-side cache of the fortunes of a database.
+
+The fortunes change far less often than they are read, so a client may
+keep copies of them. ReadCache.read() picks a random position in the
+database, as the server would, and serves it from the cache when the
+fortune at that position is there. Otherwise it fetches that fortune
+along with prefetch - 1 other random ones it does not have, in a single
+read_records() call.
+
+The cache holds at most size fortunes and evicts them by one of the
+policies:
+    --  LRU :: the least recently read,
+    --  CLOCK :: the first one found, sweeping the cache in a circle,
+        that has not been read since the previous sweep; prefetched
+        fortunes go first unless they are read.
+Either way, the fortunes read most often stay in the cache.
+
+The database bumps its version on every write. The cache asks for it
+with version() when it is older than max_age seconds and gets it with
+every read_records(); all the copies are dropped when it has changed.
+Writes made through the cache drop them at once.
+
+The database object, a stub, must offer read(), write(fortune),
+version() -> [version, count] and read_records(positions) ->
+[[version, count], fortunes]. The hits, misses and latencies of the
+reads are recorded in the registry of the metrics module.
+
+"""
+
+import time
+import random
+import threading
+import collections
+
+from .metrics import registry
+
+LRU = "lru"
+CLOCK = "clock"
+
+
+class LruStore(object):
+
+    """Fortunes by position, evicting the least recently read."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Add a fortune; return whether another one was evicted."""
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            return True
+        return False
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ClockStore(object):
+
+    """Fortunes by position, evicted by the CLOCK algorithm.
+
+    Every slot has a reference bit, set when its fortune is read. The
+    hand sweeps the slots, clearing the bits it finds set, and evicts
+    the first fortune whose bit is clear.
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.clear()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def get(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        self.referenced[slot] = True
+        return self.values[slot]
+
+    def put(self, key, value):
+        """Add a fortune; return whether another one was evicted."""
+
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.values[slot] = value
+            return False
+        if len(self.keys) < self.size:
+            self.slots[key] = len(self.keys)
+            self.keys.append(key)
+            self.values.append(value)
+            self.referenced.append(False)
+            return False
+        while self.referenced[self.hand]:
+            self.referenced[self.hand] = False
+            self.hand = (self.hand + 1) % self.size
+        del self.slots[self.keys[self.hand]]
+        self.slots[key] = self.hand
+        self.keys[self.hand] = key
+        self.values[self.hand] = value
+        self.hand = (self.hand + 1) % self.size
+        return True
+
+    def clear(self):
+        self.keys = []
+        self.values = []
+        self.referenced = []
+        self.slots = {}
+        self.hand = 0
+
+
+STORES = {LRU: LruStore, CLOCK: ClockStore}
+
+
+class ReadCache(object):
+
+    """Reads of a fortune database served from a cache of its records.
+
+    Public methods:
+        --  __init__(db, size, policy, prefetch, max_age)
+        --  read()
+        --  write(fortune)
+        --  invalidate()
+        --  stats()
+
+    """
+
+    def __init__(self, db, size=1024, policy=LRU, prefetch=32, max_age=1.0):
+        if policy not in STORES:
+            raise ValueError("Unknown eviction policy: '{}'".format(policy))
+        self.db = db
+        self.size = size
+        self.policy = policy
+        self.store = STORES[policy](size)
+        self.prefetch = max(1, min(prefetch, size))
+        self.max_age = max_age
+        self.rand = random.Random()
+        self.rand.seed()
+        self.lock = threading.Lock()
+        # The [version, count] of the database and when it was learnt.
+        self.state = None
+        self.checked = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    # Private methods
+
+    def _update(self, state):
+        """Adopt the state of the database; the caller holds self.lock."""
+
+        if self.state is None or state[0] != self.state[0]:
+            if len(self.store):
+                self.invalidations += 1
+                registry.counter("cache.invalidations").add()
+            self.store.clear()
+        self.state = list(state)
+        self.checked = time.monotonic()
+
+    def _state(self):
+        """Return the state of the database, asking for it again once it
+        is older than max_age."""
+
+        self.lock.acquire()
+        try:
+            if (self.checked is not None and
+                    time.monotonic() - self.checked < self.max_age):
+                return self.state
+        finally:
+            self.lock.release()
+
+        state = self.db.version()
+        self.lock.acquire()
+        try:
+            self._update(state)
+            return self.state
+        finally:
+            self.lock.release()
+
+    def _fetch(self, index, count):
+        """Fetch the fortune at index and prefetch others with it."""
+
+        positions = [index]
+        self.lock.acquire()
+        try:
+            wanted = min(self.prefetch, count - len(self.store))
+            for attempt in range(2 * self.prefetch):
+                if len(positions) >= wanted:
+                    break
+                position = self.rand.randrange(count)
+                if position not in self.store and position not in positions:
+                    positions.append(position)
+        finally:
+            self.lock.release()
+
+        state, fortunes = self.db.read_records(positions)
+        evicted = 0
+        self.lock.acquire()
+        try:
+            self._update(state)
+            # The fortune asked for goes in last, as the most recent.
+            for position, fortune in reversed(list(zip(positions,
+                                                       fortunes))):
+                if fortune is not None and self.store.put(position, fortune):
+                    evicted += 1
+            self.evictions += evicted
+        finally:
+            self.lock.release()
+        if evicted:
+            registry.counter("cache.evictions").add(evicted)
+        return fortunes[0]
+
+    # Public methods
+
+    def read(self):
+        """Read a random fortune, from the cache if it is there."""
+
+        start = time.perf_counter()
+        version, count = self._state()
+        if not count:
+            return None
+        index = self.rand.randrange(count)
+
+        self.lock.acquire()
+        try:
+            fortune = self.store.get(index)
+            if fortune is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        finally:
+            self.lock.release()
+
+        if fortune is not None:
+            registry.counter("cache.hits").add()
+            registry.histogram("cache.read.hit").record(
+                time.perf_counter() - start)
+            return fortune
+
+        registry.counter("cache.misses").add()
+        fortune = self._fetch(index, count)
+        if fortune is None:
+            # The database has fewer fortunes than we knew of.
+            fortune = self.db.read()
+        registry.histogram("cache.read.miss").record(
+            time.perf_counter() - start)
+        return fortune
+
+    def write(self, fortune):
+        """Write a fortune and drop the fortunes cached."""
+
+        try:
+            return self.db.write(fortune)
+        finally:
+            self.invalidate()
+
+    def invalidate(self):
+        """Drop the fortunes cached and ask for the version again."""
+
+        self.lock.acquire()
+        try:
+            self.store.clear()
+            self.state = None
+            self.checked = None
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        """Return the size, hit rate and counters of the cache."""
+
+        self.lock.acquire()
+        try:
+            reads = self.hits + self.misses
+            return {
+                "policy": self.policy,
+                "size": self.size,
+                "cached": len(self.store),
+                "version": self.state,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / reads if reads else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+        finally:
+            self.lock.release()
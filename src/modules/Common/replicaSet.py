@@ -0,0 +1,288 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Stub for a set of replicas of the same object.
+
+The replicas are all the objects of a type registered at the name
+service. Reads may be served by any of them and are sent to the one
+expected to answer fastest, according to the policy:
+    --  POWER_OF_TWO :: pick two replicas at random and use the one
+        with fewer calls in progress, then lower latency,
+    --  EWMA :: use the replica with the lowest exponentially weighted
+        moving average of its latency, except for a fraction explore
+        of the reads, sent to a random replica so that the latency of
+        all of them keeps being measured; a replica that was slow once
+        would otherwise never be called again.
+Other calls go to any live replica.
+
+A replica that cannot be reached is ejected for eject_time seconds,
+after which it is probed with check() before being used again. The
+call is then retried on another replica, unless it may already have
+been run (i.e., the connection broke after it was sent and the call is
+not a read).
+
+"""
+
+import time
+import random
+import threading
+
+from . import orb
+
+POWER_OF_TWO = "p2c"
+EWMA = "ewma"
+
+# Fraction of the reads sent to a random replica under EWMA.
+EXPLORE = 0.05
+
+
+class Replica(object):
+
+    """A replica of the set along with its statistics.
+
+    The statistics are updated by concurrent callers, under self.lock.
+
+    """
+
+    def __init__(self, pid, address):
+        self.id = pid
+        self.address = tuple(address)
+        self.stub = orb.Stub(address)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_time = 0.0
+        self.ewma = None
+        self.ejected_until = None
+
+    def begin(self):
+        """Count a call starting."""
+
+        self.lock.acquire()
+        try:
+            self.in_flight += 1
+        finally:
+            self.lock.release()
+
+    def end(self, latency=None, alpha=None):
+        """Count a call ending, recording its latency if it is given."""
+
+        self.lock.acquire()
+        try:
+            self.in_flight -= 1
+            if latency is None:
+                return
+            self.calls += 1
+            self.total_time += latency
+            if self.ewma is None:
+                self.ewma = latency
+            else:
+                self.ewma = alpha * latency + (1 - alpha) * self.ewma
+        finally:
+            self.lock.release()
+
+    def fail(self, until):
+        """Count a call that failed and eject the replica until then."""
+
+        self.lock.acquire()
+        try:
+            self.in_flight -= 1
+            self.failures += 1
+            self.ejected_until = until
+        finally:
+            self.lock.release()
+
+    def live(self):
+        self.lock.acquire()
+        try:
+            return self.ejected_until is None
+        finally:
+            self.lock.release()
+
+    def claim(self, now, eject_time):
+        """Claim the probe of an ejected replica whose time is up.
+
+        The replica stays ejected for eject_time more seconds for the
+        other callers, so that only one probes it. Return that time, or
+        None if the replica is not to be probed."""
+
+        self.lock.acquire()
+        try:
+            if self.ejected_until is None or self.ejected_until > now:
+                return None
+            self.ejected_until = now + eject_time
+            return self.ejected_until
+        finally:
+            self.lock.release()
+
+    def readmit(self, claim):
+        """Readmit a replica probed under claim, unless it has been
+        ejected again since. Return whether it is live."""
+
+        self.lock.acquire()
+        try:
+            if self.ejected_until == claim:
+                self.ejected_until = None
+            return self.ejected_until is None
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        self.lock.acquire()
+        try:
+            return {
+                "address": list(self.address),
+                "calls": self.calls,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "ewma_ms": (self.ewma * 1000 if self.ewma is not None
+                            else None),
+                "mean_ms": (self.total_time / self.calls * 1000
+                            if self.calls else None),
+                "ejected": self.ejected_until is not None,
+            }
+        finally:
+            self.lock.release()
+
+
+class ReplicaSetStub(object):
+
+    """Stub spreading the calls over all the replicas of a type.
+
+    Public methods:
+        --  __init__(name_service, server_type, policy, ...)
+        --  refresh()
+        --  stats()
+        --  any other attribute is a remote call, as for orb.Stub
+
+    """
+
+    def __init__(self, name_service, server_type, policy=EWMA,
+                 read_methods=("read", "read_many"), eject_time=5.0,
+                 alpha=0.3, explore=EXPLORE):
+        if policy not in (POWER_OF_TWO, EWMA):
+            raise ValueError("Unknown balancing policy: '{}'".format(policy))
+        self.name_service = name_service
+        self.server_type = server_type
+        self.policy = policy
+        self.read_methods = set(read_methods)
+        self.eject_time = eject_time
+        self.alpha = alpha
+        self.explore = explore
+        self.rand = random.Random()
+        self.rand.seed()
+        self.lock = threading.Lock()
+        self.replicas = {}
+        self.refresh()
+
+    # Private methods
+
+    def _probe(self, replica, claim):
+        """Check whether an ejected replica is back; if not, it stays
+        ejected until claim."""
+
+        try:
+            replica.stub.check()
+        except Exception:
+            return False
+        return replica.readmit(claim)
+
+    def _live(self):
+        self.lock.acquire()
+        try:
+            replicas = list(self.replicas.values())
+        finally:
+            self.lock.release()
+
+        now = time.monotonic()
+        live = []
+        for replica in replicas:
+            if replica.live():
+                live.append(replica)
+                continue
+            claim = replica.claim(now, self.eject_time)
+            if claim is not None and self._probe(replica, claim):
+                live.append(replica)
+        return live
+
+    def _choose(self, read, exclude):
+        live = [r for r in self._live() if r not in exclude]
+        if not live:
+            self.refresh()
+            live = [r for r in self._live() if r not in exclude]
+        if not live:
+            raise orb.CommunicationError(
+                "NoReplica",
+                ["No live replica of type '{}'".format(self.server_type)])
+        if not read or len(live) == 1:
+            return self.rand.choice(live)
+        if self.policy == POWER_OF_TWO:
+            first, second = self.rand.sample(live, 2)
+            return min(first, second,
+                       key=lambda r: (r.in_flight, r.ewma or 0.0))
+        if self.rand.random() < self.explore:
+            return self.rand.choice(live)
+        # Replicas never measured come first so that all get measured.
+        return min(live, key=lambda r: r.ewma or 0.0)
+
+    def _call(self, method, args):
+        read = method in self.read_methods
+        tried = []
+        while True:
+            replica = self._choose(read, tried)
+            tried.append(replica)
+            replica.begin()
+            start = time.perf_counter()
+            try:
+                result = getattr(replica.stub, method)(*args)
+            except (OSError, orb.CommunicationError) as e:
+                replica.fail(time.monotonic() + self.eject_time)
+                if not read and not isinstance(e, ConnectionRefusedError):
+                    raise
+                continue
+            except Exception:
+                replica.end()
+                raise
+            replica.end(time.perf_counter() - start, self.alpha)
+            return result
+
+    # Public methods
+
+    def refresh(self):
+        """Fetch the replicas from the name service again."""
+
+        entries = self.name_service.require_all(self.server_type)
+        self.lock.acquire()
+        try:
+            replicas = {}
+            for pid, address in entries:
+                replica = self.replicas.get(pid)
+                if replica is None or replica.address != tuple(address):
+                    replica = Replica(pid, address)
+                replicas[pid] = replica
+            self.replicas = replicas
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        """Return the statistics of every replica, by id."""
+
+        self.lock.acquire()
+        try:
+            return dict((pid, replica.stats())
+                        for pid, replica in self.replicas.items())
+        finally:
+            self.lock.release()
+
+    def __getattr__(self, attr):
+        """Forward the call to one of the replicas."""
+        def rmi_call(*args):
+            return self._call(attr, args)
+        return rmi_call
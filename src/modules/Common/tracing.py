@@ -0,0 +1,203 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Tracing of the remote calls that serve a request, across peers.
+
+A trace is the tree of spans, i.e., timed operations, made to serve one
+request. A span has the id of its trace, an id of its own and that of
+its parent span:
+    --  a server span (SERVER) is the run of a request by a skeleton;
+    --  a client span (CLIENT) is a call made by a stub, from sending
+        the request to reading the response;
+    --  an internal span (INTERNAL) is any other step worth timing,
+        e.g., waiting for the distributed lock.
+
+The span a thread is working for is its context, [trace id, span id].
+A stub sends the context of its client span in the request frame
+("trace"), and the skeleton runs the request in a server span that is
+a child of it, so the spans of all the peers involved form one tree.
+Stub.async_call() carries the context over to the thread or connection
+making the call.
+
+Spans are only recorded once enable() has been called, and are written
+by a FileExporter as JSON lines. A request arriving without a context
+starts a new trace if its method is one of the roots given to enable(),
+for the fraction sample of them. A process that does not record spans
+still passes on the contexts it gets.
+
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import contextlib
+
+SERVER = "server"
+CLIENT = "client"
+INTERNAL = "internal"
+
+exporter = None
+sample = 1.0
+roots = None
+process = str(os.getpid())
+
+_local = threading.local()
+
+
+class Span(object):
+
+    """A timed operation of a trace."""
+
+    def __init__(self, name, kind, trace, parent, peer=None):
+        self.name = name
+        self.kind = kind
+        self.trace = trace
+        self.id = new_id()
+        self.parent = parent
+        self.peer = peer
+        self.start = time.time()
+        self.began = time.perf_counter()
+
+    def context(self):
+        return [self.trace, self.id]
+
+    def finish(self, error=None):
+        """End the span and export it."""
+
+        record = {
+            "trace": self.trace,
+            "span": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "kind": self.kind,
+            "process": process,
+            "start": self.start,
+            "duration": time.perf_counter() - self.began,
+        }
+        if self.peer is not None:
+            record["peer"] = "{}:{}".format(*self.peer)
+        if error is not None:
+            record["error"] = type(error).__name__
+        if exporter is not None:
+            exporter.export(record)
+
+
+class FileExporter(object):
+
+    """Appends spans to a file, one JSON line each.
+
+    Every line is written with a single write() to a file opened for
+    appending, so several processes may share the file.
+
+    """
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def export(self, record):
+        os.write(self.fd, (json.dumps(record) + "\n").encode())
+
+    def close(self):
+        os.close(self.fd)
+
+
+def new_id():
+    return "{:016x}".format(random.getrandbits(64))
+
+
+def enable(path, root_methods=None, fraction=1.0, name=None):
+    """Record spans in the file at path.
+
+    Requests of root_methods (all if None) that arrive without a
+    context start a trace, a fraction of them. name tells the spans of
+    this process apart from those of others."""
+
+    global exporter, sample, roots, process
+    exporter = FileExporter(path)
+    roots = None if root_methods is None else frozenset(root_methods)
+    sample = fraction
+    if name is not None:
+        process = name
+
+
+def current():
+    """Return the context of the current thread, or None."""
+    return getattr(_local, "context", None)
+
+
+@contextlib.contextmanager
+def activated(context):
+    """Work for the given context until the block ends."""
+
+    previous = current()
+    _local.context = context
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def start(name, kind=INTERNAL, peer=None):
+    """Start a span as a child of the current context.
+
+    Return None if nothing is recorded or there is no context."""
+
+    context = current()
+    if exporter is None or context is None:
+        return None
+    return Span(name, kind, context[0], context[1], peer)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the block as an internal span of the current context."""
+
+    started = start(name)
+    if started is None:
+        yield
+        return
+    with activated(started.context()):
+        try:
+            yield
+        except Exception as e:
+            started.finish(e)
+            raise
+    started.finish()
+
+
+def server_span(method, context):
+    """Start the server span of a request, or return None.
+
+    The span is a child of the context of the caller; a request without
+    a context starts a trace if method is a root."""
+
+    if exporter is None:
+        return None
+    if context is not None:
+        return Span("serve " + str(method), SERVER, context[0], context[1])
+    if (roots is None or method in roots) and random.random() < sample:
+        return Span("serve " + str(method), SERVER, new_id(), None)
+    return None
+
+
+@contextlib.contextmanager
+def serving(method, context):
+    """Run a request with the context of its caller, in a server span."""
+
+    started = server_span(method, context)
+    if started is not None:
+        context = started.context()
+    with activated(context):
+        try:
+            yield
+        finally:
+            if started is not None:
+                started.finish()
@@ -0,0 +1,173 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Bytes-level input and output of messages on sockets.
+
+--  ReceiveBuffer ::
+        Preallocated buffer the bytes of a socket are received into with
+        recv_into. Complete JSON lines and codec frames are taken from
+        it as memoryviews, which the decoders read without a copy.
+--  send_buffers ::
+        Send a list of buffers, e.g., a payload and its line end or
+        frame header, in one sendmsg call instead of joining them.
+--  thread_buffer ::
+        A ReceiveBuffer kept by the current thread and reused from one
+        call to the next.
+
+"""
+
+import threading
+
+from . import codec
+
+# Initial size of a receive buffer; it grows for larger messages.
+BUFFER_SIZE = 65536
+
+_local = threading.local()
+
+
+class ReceiveBuffer(object):
+
+    """Bytes received from a socket and not consumed yet.
+
+    The bytes are kept in data[start:end]. Messages are taken from the
+    front as memoryviews of data, valid until the next fill(). Only
+    when a message does not fit behind start is the rest moved to the
+    front of the buffer, or the buffer doubled, so that a message of
+    any size is received in place.
+
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        self.start = 0
+        self.end = 0
+        # Bytes from start on known to hold no line end, and bytes the
+        # next frame takes.
+        self.scanned = 0
+        self.needed = 0
+
+    # Private methods
+
+    def _reserve(self, size):
+        """Make room for size bytes from start on."""
+
+        if size <= len(self.data) - self.start:
+            return
+        pending = self.end - self.start
+        if size <= len(self.data):
+            self.data[:pending] = self.data[self.start:self.end]
+        else:
+            data = bytearray(max(size, 2 * len(self.data)))
+            data[:pending] = self.view[self.start:self.end]
+            self.data = data
+            self.view = memoryview(data)
+        self.start = 0
+        self.end = pending
+
+    # Public methods
+
+    def clear(self):
+        """Drop the bytes received, and the room a large message took."""
+
+        if len(self.data) > self.size:
+            self.data = bytearray(self.size)
+            self.view = memoryview(self.data)
+        self.start = self.end = self.scanned = self.needed = 0
+
+    def fill(self, sock):
+        """Receive bytes from sock; return their number, 0 at the end of
+        the stream."""
+
+        if self.start == self.end:
+            self.start = self.end = 0
+        self._reserve(max(self.end - self.start + 1, self.needed))
+        received = sock.recv_into(self.view[self.end:])
+        self.end += received
+        return received
+
+    def line(self):
+        """Take the next line, without its end, or None if there is no
+        complete line yet."""
+
+        end = self.data.find(b"\n", self.start + self.scanned, self.end)
+        if end < 0:
+            self.scanned = self.end - self.start
+            return None
+        line = self.view[self.start:end]
+        self.start = end + 1
+        self.scanned = 0
+        return line
+
+    def frame(self):
+        """Take the payload of the next codec frame, or None if there is
+        no complete frame yet."""
+
+        if self.end - self.start < codec.HEADER.size:
+            self.needed = codec.HEADER.size
+            return None
+        length, = codec.HEADER.unpack_from(self.data, self.start)
+        end = self.start + codec.HEADER.size + length
+        if end > self.end:
+            self.needed = codec.HEADER.size + length
+            return None
+        self.needed = 0
+        payload = self.view[self.start + codec.HEADER.size:end]
+        self.start = end
+        return payload
+
+    def read_line(self, sock):
+        """Receive from sock until a line is complete and take it;
+        return None if the stream ends first."""
+
+        while True:
+            line = self.line()
+            if line is not None:
+                return line
+            if not self.fill(sock):
+                return None
+
+    def read_frame(self, sock):
+        """Receive from sock until a frame is complete and take its
+        payload; return None if the stream ends first."""
+
+        while True:
+            payload = self.frame()
+            if payload is not None:
+                return payload
+            if not self.fill(sock):
+                return None
+
+
+def thread_buffer():
+    """Return the receive buffer of the current thread, emptied."""
+
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = ReceiveBuffer()
+    buffer.clear()
+    return buffer
+
+
+def send_buffers(sock, buffers):
+    """Send all the bytes of buffers, in order, without joining them."""
+
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+    buffers = list(buffers)
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers[0])
+            buffers.pop(0)
+        if sent:
+            buffers[0] = memoryview(buffers[0])[sent:]
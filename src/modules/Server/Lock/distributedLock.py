@@ -23,41 +23,158 @@ The implementation should satisfy the following requests:
         dictionaries should be updated accordingly.
     --  when the peer that has the token (either TOKEN_PRESENT or
         TOKEN_HELD) quits, it should pass the token to some other peer.
-    --  For simplicity, we shall not handle the case when the peer
-        holding the token dies unexpectedly.
+
+The lock works in one of the following modes:
+    --  SEQUENTIAL :: the algorithm above, as written for the labs,
+        except that the requests are sent to all the peers in parallel
+        without waiting for their answers: the token goes to the first
+        waiting peer in the order of the peer list,
+    --  ROUND_ROBIN :: the requests are sent to all the peers at once;
+        the token goes to the next waiting peer in the order of the
+        ids, wrapping around, and back to the waiters of this peer when
+        no other is waiting,
+    --  TIMESTAMP :: as ROUND_ROBIN, but the requests carry a Lamport
+        timestamp and the token goes to the oldest request, be it of a
+        peer or of this one.
+
+In the last two, the threads of a peer waiting for the lock share a
+single request. When the token leaves a peer, it carries the requests
+still waiting, the peer's own included, so that they are not sent
+again. In all modes, the token is never sent while the lock of the
+peer list is held, except when the peer leaves.
+
+In all modes, the threads of a peer wait for the lock in a local FIFO
+queue in front of the token. When a thread releases the lock and
+others are queued, the token goes to the next one without any message,
+unless it has already done so local_bound times in a row while other
+peers were waiting; it is then passed on. The messages sent per
+critical section thus depend on the number of peers rather than on
+that of threads.
+
+Unlike in the labs, the token is recovered when its holder dies. It is
+leased: a peer that has been waiting for it for a whole lease, or that
+is told that the last peer it knows to have had the token has failed
+(see peer_failed() and the failureDetector module), calls
+recover_token(), which the survivor with the lowest id runs. A peer
+that passes the token on knows where it went, so the death of a holder
+is noticed by the peer that sent it the token. The survivor recovering
+the token takes a peer that does not answer it within a lease for
+dead:
+    --  it asks the survivors whether one of them has the token,
+        and stops there if one does,
+    --  otherwise, it fences them with a new epoch, higher than any they
+        know. Every token carries the epoch of its sender, and one of
+        an older epoch is refused, so a token in flight from or to a
+        dead peer can no longer show up,
+    --  a survivor that has got the token meanwhile keeps it, under
+        the new epoch,
+    --  if none does, it makes a new one from what the survivors have
+        been served and passes it on as a release would.
+The lock is thus unavailable for at most the time it takes to suspect
+the holder, or a lease, plus a round of calls to the survivors, itself
+bounded by a lease. A peer wrongly suspected while it holds the token
+keeps it if it answers; otherwise it is fenced out, but a critical
+section it is already in is not interrupted. The failure of any other
+peer fences nobody.
 
 """
 
+import time
+import threading
+
+from Common import log
+from Common import orb
+from Common.metrics import registry
+
 NO_TOKEN = 0
 TOKEN_PRESENT = 1
 TOKEN_HELD = 2
 
+SEQUENTIAL = "sequential"
+ROUND_ROBIN = "round-robin"
+TIMESTAMP = "timestamp"
+
+# Times in a row the token may go straight to the next local waiter
+# while other peers wait for it.
+LOCAL_BOUND = 8
+
+# Seconds a peer waits for the token before asking for its recovery.
+LEASE = 5.0
+
+# Holder of the lock while the token is being released.
+_RELEASING = -1
+
+logger = log.get("distributedLock")
+
 
 class DistributedLock(object):
 
     """Implementation of distributed mutual exclusion for a list of peers.
 
     Public methods:
-        --  __init__(owner, peer_list)
+        --  __init__(owner, peer_list, mode, local_bound, lease)
         --  initialize()
         --  destroy()
         --  register_peer(pid)
         --  unregister_peer(pid)
         --  acquire()
         --  release()
-        --  request_token(time, pid)
-        --  obtain_token(token)
+        --  request_token(time, pid, stamp)
+        --  obtain_token(token, pending, epoch)
+        --  fence_token(epoch) -> [epoch, holding, served, request]
+        --  recover_token() -> whether the token is known to exist
+        --  peer_failed(pid)
+        --  stats()
         --  display_status()
 
     """
 
-    def __init__(self, owner, peer_list):
+    def __init__(self, owner, peer_list, mode=SEQUENTIAL,
+                 local_bound=LOCAL_BOUND, lease=LEASE):
+        if mode not in (SEQUENTIAL, ROUND_ROBIN, TIMESTAMP):
+            raise ValueError("Unknown lock mode: '{}'".format(mode))
         self.peer_list = peer_list
         self.owner = owner
+        self.mode = mode
+        self.local_bound = local_bound
+        self.lease = lease
+        self.epoch = 0
+        self.recovery_lock = threading.Lock()
+        # The last peer known to have had the token, and since when a
+        # thread of this peer has been waiting for it.
+        self.last_holder = None
+        self.awaiting_since = None
         self.time = 0
         self.token = None
         self.request = {}
         self.state = NO_TOKEN
+        self.waiting = False
+
+        # The local queue: the ticket of every waiting thread, oldest
+        # first, and that of the thread holding the lock. In the
+        # ROUND_ROBIN and TIMESTAMP modes, the tickets are the Lamport
+        # timestamps of the requests.
+        self.clock = 0
+        self.local = []
+        self.holder = None
+        self.streak = 0
+
+        # Only used by ROUND_ROBIN and TIMESTAMP.
+        self.stamps = {}
+        self.requested = False
+
+        self.stats_lock = threading.Lock()
+        self.acquisitions = 0
+        self.batched = 0
+        self.messages = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.regenerations = 0
+        # Also recorded in the metrics registry, along with the times
+        # the lock is held and the tokens sent and received.
+        self.wait_times = registry.histogram("lock.wait")
+        self.hold_times = registry.histogram("lock.hold")
+        self.acquired = None
 
     def _prepare(self, token):
         """Prepare the token to be sent as a JSON message.
@@ -72,6 +189,421 @@ class DistributedLock(object):
         """The reverse operation to the one above."""
         return dict(token)
 
+    def _count(self, messages=0, wait=None, batched=False):
+        self.stats_lock.acquire()
+        try:
+            self.messages += messages
+            if wait is not None:
+                self.acquisitions += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+                if batched:
+                    self.batched += 1
+        finally:
+            self.stats_lock.release()
+        if wait is not None:
+            self.wait_times.record(wait)
+            self.acquired = time.perf_counter()
+
+    # The methods from _outstanding() to _hand_over() are called with
+    # peer_list.lock held. Those down to _release_batched() are only
+    # used by ROUND_ROBIN and TIMESTAMP, and the next three only by
+    # SEQUENTIAL.
+
+    def _outstanding(self):
+        """Return the ids of the peers waiting for the token."""
+        return [pid for pid in self.request
+                if self.request[pid] > self.token.get(pid, 0)]
+
+    def _pending(self):
+        """Return the requests sent along with the token."""
+        pending = [[pid, self.request[pid], self.stamps.get(pid, 0)]
+                   for pid in self._outstanding()]
+        if self.local:
+            pending.append([self.owner.id, self.time, self.local[0]])
+        return pending
+
+    def _next(self):
+        """Return the id of the next holder of the token, or None."""
+
+        remote = self._outstanding()
+        if self.mode == TIMESTAMP:
+            candidates = [(self.stamps.get(pid, 0), pid) for pid in remote]
+            if self.local:
+                candidates.append((self.local[0], self.owner.id))
+            if not candidates:
+                return None
+            return min(candidates)[1]
+        if remote:
+            later = [pid for pid in remote if pid > self.owner.id]
+            return min(later or remote)
+        if self.local:
+            return self.owner.id
+        return None
+
+    def _grant_local(self):
+        """Give the token to the oldest waiting thread of this peer."""
+
+        self.holder = self.local.pop(0)
+        self.state = TOKEN_HELD
+        self.token[self.owner.id] = self.time
+        self.peer_list.lock.notify_all()
+
+    def _hand_over(self, arrived=False):
+        """Pass on the token, which is here and not held.
+
+        Return None if it stays here, or what to give to _send() for it
+        to be sent to a peer once the lock of the peer list is released.
+        A token that has just arrived was sent for the threads waiting
+        here, if any, and goes to them first; it then goes straight to
+        the next of them local_bound times before _next() is asked.
+        """
+
+        if self.local and arrived:
+            self.streak = 0
+            self._grant_local()
+            return None
+        if self.local and self.streak < self.local_bound:
+            self.streak += 1
+            self._grant_local()
+            return None
+        pid = self._next()
+        if pid is None:
+            self.state = TOKEN_PRESENT
+            return None
+        if pid == self.owner.id:
+            self._grant_local()
+            return None
+        self.state = NO_TOKEN
+        self.streak = 0
+        if self.local:
+            # Ask again for the threads still waiting here; the
+            # request travels with the token.
+            self.time += 1
+            self.requested = True
+        return pid, self._prepare(self.token), self._pending(), self.epoch
+
+    def _acquire_batched(self):
+        start = time.perf_counter()
+        request = None
+        self.peer_list.lock.acquire()
+        try:
+            self.clock += 1
+            stamp = self.clock
+            self.local.append(stamp)
+            if self.state == TOKEN_PRESENT:
+                self.streak = 0
+                self._grant_local()
+            elif self.state == NO_TOKEN and not self.requested:
+                self.time += 1
+                self.requested = True
+                request = self.time
+        finally:
+            self.peer_list.lock.release()
+
+        if request is not None:
+            results, failures = self.peer_list.broadcast(
+                "request_token", request, self.owner.id, stamp,
+                timeout=self.lease)
+            self._count(messages=len(results) + len(failures))
+
+        self.peer_list.lock.acquire()
+        try:
+            self._await(lambda: self.holder == stamp)
+        finally:
+            self.peer_list.lock.release()
+        self._count(wait=time.perf_counter() - start,
+                    batched=request is None)
+
+    def _release_batched(self):
+        handover = None
+        self.peer_list.lock.acquire()
+        try:
+            if self.state == TOKEN_HELD:
+                self.holder = None
+                handover = self._hand_over()
+        finally:
+            self.peer_list.lock.release()
+        self._send(handover)
+
+    def _acquire_token(self):
+        """Get the token for the thread at the head of the local queue.
+
+        Return the number of messages sent."""
+
+        messages = 0
+        self.peer_list.lock.acquire()
+        if self.state == NO_TOKEN:
+            self.time += 1
+            # The token may arrive before we get to wait for it; it is
+            # then kept for us instead of being passed on by
+            # request_token() before we wake up.
+            self.waiting = True
+            messages = len(self.peer_list.peers)
+            # The requests go out in parallel and are not waited for:
+            # a peer that hangs would hold us up for a whole lease even
+            # once suspected, while the token, or its recovery, wakes
+            # us up in _await().
+            sender = threading.Thread(target=self._request_token,
+                                      args=(self.time, ))
+            sender.daemon = True
+            self.peer_list.lock.release()
+            sender.start()
+            self.peer_list.lock.acquire()
+
+            self._await(lambda: self.state != NO_TOKEN)
+            self.waiting = False
+
+        else:
+            self.token[self.owner.id] = self.time
+        self.state = TOKEN_HELD
+        self.peer_list.lock.release()
+        return messages
+
+    def _request_token(self, time):
+        """Ask all the peers for the token.
+
+        Peers that cannot be reached are unregistered by the broadcast;
+        those that do not answer are left to the failure detector."""
+
+        self.peer_list.broadcast("request_token", time, self.owner.id,
+                                 timeout=self.lease)
+
+    def _release_token(self):
+        """Pass the token on to another peer, if one is waiting."""
+
+        handover = None
+        self.peer_list.lock.acquire()
+
+        try:
+            if self.state == TOKEN_HELD:
+                self.state = TOKEN_PRESENT
+                handover = self._pass_on()
+        finally:
+            self.peer_list.lock.release()
+        self._send(handover)
+
+    def _pass_on(self):
+        """Give the token, present here, to the first peer waiting for it
+        in the order of the peer list, as release() does.
+
+        Called with peer_list.lock held, in SEQUENTIAL mode. Return what
+        to give to _send()."""
+
+        for pid in self.peer_list.peers:
+            if self.request.get(pid, 0) > self.token.get(pid, 0):
+                self.state = NO_TOKEN
+                return pid, self._prepare(self.token), None, self.epoch
+        return None
+
+    # The methods from _send() on are used in all modes.
+
+    def _send(self, handover):
+        """Send the token; if the peer is gone, take it back.
+
+        A token that the peer has not acknowledged within a lease may
+        still reach it; if it does not, it is recovered as a lost one.
+        """
+
+        while handover is not None:
+            pid, token, pending, epoch = handover
+            self.last_holder = pid
+            self._count(messages=1)
+            registry.counter("lock.tokens_sent").add()
+            try:
+                self.peer_list.call(pid, "obtain_token", token, pending,
+                                    epoch, timeout=self.lease)
+                return
+            except TimeoutError:
+                return
+            except (KeyError, OSError, orb.CommunicationError):
+                # The peer has been unregistered.
+                pass
+
+            self.peer_list.lock.acquire()
+            try:
+                handover = None
+                if epoch < self.epoch:
+                    # The token has been fenced out in the meantime.
+                    return
+                self.token = self._unprepare(token)
+                self.token.pop(pid, None)
+                self.token[self.owner.id] = self.time
+                self.requested = False
+                if self.mode != SEQUENTIAL:
+                    handover = self._hand_over()
+                elif self.waiting:
+                    self.state = TOKEN_HELD
+                    self.peer_list.lock.notify_all()
+                else:
+                    self.state = TOKEN_PRESENT
+                    handover = self._pass_on()
+            finally:
+                self.peer_list.lock.release()
+
+    def _await(self, granted):
+        """Wait, with peer_list.lock held, until granted() is true.
+
+        Whenever the token has been missing for a whole lease, ask for
+        it to be recovered."""
+
+        if self.lease is None:
+            while not granted():
+                self.peer_list.lock.wait()
+            return
+        deadline = time.monotonic() + self.lease
+        if not granted() and self.awaiting_since is None:
+            self.awaiting_since = time.monotonic()
+        while not granted():
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                self.peer_list.lock.wait(remaining)
+                continue
+            if self.state == NO_TOKEN:
+                self.peer_list.lock.release()
+                try:
+                    self.recover_token()
+                except Exception as e:
+                    logger.warning("Could not recover the token: %s", e)
+                finally:
+                    self.peer_list.lock.acquire()
+            deadline = time.monotonic() + self.lease
+        self.awaiting_since = None
+
+    def _give_up(self, pid):
+        """Take a peer that has not answered within a lease for dead."""
+
+        logger.info("Peer %s has not answered within the lease.", pid)
+        try:
+            self.owner.unregister_peer(pid)
+        except Exception:
+            # Somebody else has already removed it.
+            pass
+
+    def _current(self, epoch):
+        """Whether a token of the given epoch is to be accepted."""
+
+        if epoch < self.epoch:
+            logger.info("Refused a token of epoch %s.", epoch)
+            return False
+        self.epoch = epoch
+        return True
+
+    def _served(self):
+        """Return this peer's part in a reply to fence_token()."""
+
+        if self.mode == SEQUENTIAL:
+            asking = self.waiting
+        else:
+            asking = self.requested
+        if not asking:
+            return self.time, None
+        stamp = self.local[0] if self.local and self.mode != SEQUENTIAL else 0
+        return self.time - 1, [self.owner.id, self.time, stamp]
+
+    def _regenerate(self, replies):
+        """Make a new token from the replies of the survivors to
+        fence_token() and pass it on.
+
+        Called with peer_list.lock held. Return what to give to _send().
+        """
+
+        self.regenerations += 1
+        self.token = {}
+        for pid, (epoch, holding, served, request) in replies.items():
+            self.token[pid] = served
+            if request is not None and pid != self.owner.id:
+                pid, request, stamp = request
+                if pid in self.request and self.request[pid] < request:
+                    self.request[pid] = request
+                    self.stamps[pid] = stamp
+        self.token[self.owner.id] = self.time
+        logger.info("Token regenerated in epoch %s.", self.epoch)
+
+        if self.mode != SEQUENTIAL:
+            self.requested = False
+            return self._hand_over(arrived=True)
+        if self.waiting:
+            self.state = TOKEN_HELD
+            self.peer_list.lock.notify_all()
+            return None
+        self.state = TOKEN_PRESENT
+        return self._pass_on()
+
+    def _holding(self, epoch):
+        """Ask the survivors, without fencing them, whether one of them
+        has the token. Return None if some survivor answered with an
+        error."""
+
+        replies = {self.owner.id: self.fence_token(epoch)}
+        results, failures = self.peer_list.broadcast(
+            "fence_token", epoch, timeout=self.lease)
+        for pid, error in failures.items():
+            if isinstance(error, TimeoutError):
+                self._give_up(pid)
+            elif not isinstance(error, (OSError, orb.CommunicationError)):
+                return None
+        replies.update(results)
+        return any(reply[1] for reply in replies.values())
+
+    def _recover(self):
+        """Fence the survivors and regenerate the token if none has it.
+
+        Return False if some survivor answered with an error."""
+
+        if not self.recovery_lock.acquire(blocking=False):
+            # A round is already running here.
+            return True
+        try:
+            self.peer_list.lock.acquire()
+            try:
+                epoch = self.epoch
+            finally:
+                self.peer_list.lock.release()
+
+            # The holder may well be alive: then nobody is fenced.
+            holding = self._holding(epoch)
+            if holding is None:
+                return False
+            if holding:
+                return True
+            epoch += 1
+
+            while True:
+                replies = {self.owner.id: self.fence_token(epoch)}
+                results, failures = self.peer_list.broadcast(
+                    "fence_token", epoch, timeout=self.lease)
+                for pid, error in failures.items():
+                    # Unreachable peers have been unregistered, and so
+                    # are those that do not answer within a lease.
+                    if isinstance(error, TimeoutError):
+                        self._give_up(pid)
+                    elif not isinstance(error, (OSError,
+                                                orb.CommunicationError)):
+                        return False
+                replies.update(results)
+                highest = max(reply[0] for reply in replies.values())
+                if highest == epoch:
+                    break
+                epoch = highest + 1
+
+            if any(reply[1] for reply in replies.values()):
+                return True
+            handover = None
+            self.peer_list.lock.acquire()
+            try:
+                if self.epoch == epoch and self.state == NO_TOKEN:
+                    handover = self._regenerate(
+                        dict((pid, reply) for pid, reply in replies.items()
+                             if pid == self.owner.id or
+                             pid in self.peer_list.peers))
+            finally:
+                self.peer_list.lock.release()
+            self._send(handover)
+            return True
+        finally:
+            self.recovery_lock.release()
+
     # Public methods
 
     def initialize(self):
@@ -105,16 +637,37 @@ class DistributedLock(object):
         If we have the token (TOKEN_PRESENT or TOKEN_HELD), we must
         give it to someone else."""
 
+        if self.mode != SEQUENTIAL:
+            handover = None
+            self.peer_list.lock.acquire()
+            try:
+                if self.state == TOKEN_PRESENT or self.state == TOKEN_HELD:
+                    self.local = []
+                    self.holder = None
+                    pid = self._next()
+                    if pid is None and self.peer_list.peers:
+                        pid = min(self.peer_list.peers)
+                    if pid is not None:
+                        self.state = NO_TOKEN
+                        handover = (pid, self._prepare(self.token),
+                                    self._pending(), self.epoch)
+            finally:
+                self.peer_list.lock.release()
+            self._send(handover)
+            return
+
         self.peer_list.lock.acquire()
         try:
             if self.state == TOKEN_PRESENT or self.state == TOKEN_HELD:
                 for peer_id, peer_adress in self.peer_list.peers.items():
                     peer = self.peer_list.peers[peer_id]
                     try:
-                        peer.obtain_token(self._prepare(self.token))
+                        peer.obtain_token(self._prepare(self.token),
+                                          None, self.epoch)
                         break
                     except ConnectionRefusedError:
-                        # if the peer that has been chosen to recieve the token has crashed
+                        # if the peer that has been chosen to recieve
+                        # the token has crashed
                         continue
         finally:
             self.peer_list.lock.release()
@@ -127,6 +680,7 @@ class DistributedLock(object):
             self.request[pid] = 0
             if self.state == TOKEN_HELD or self.state == TOKEN_PRESENT:
                 self.token[pid] = 0
+            self.stamps.pop(pid, None)
         finally:
             self.peer_list.lock.release()
 
@@ -136,70 +690,97 @@ class DistributedLock(object):
         self.peer_list.lock.acquire()
         try:
             del self.request[pid]
+            self.stamps.pop(pid, None)
             if self.state == TOKEN_PRESENT or self.state == TOKEN_HELD:
-                del self.token[pid]
+                self.token.pop(pid, None)
         finally:
             self.peer_list.lock.release()
 
     def acquire(self):
         """Called when this object tries to acquire the lock."""
 
-        print("Trying to acquire the lock...")
+        logger.debug("Trying to acquire the lock...")
 
-        self.peer_list.lock.acquire()
-        if self.state == NO_TOKEN:
-            self.time += 1
-            list_peers = self.peer_list.peers
-            self.peer_list.lock.release()
-            for peer_id, peer_adress in list_peers.items():
-                peer = list_peers[peer_id]
-                try:
-                    peer.request_token(self.time, self.owner.id)
-                except Exception:
-                    self.peer_list.lock.acquire()
-                    del self.peer_list.peers[peer_id]
-                    del self.request[peer_id]
-                    self.peer_list.lock.release()
-                    continue
-            self.peer_list.lock.acquire()
+        if self.mode != SEQUENTIAL:
+            return self._acquire_batched()
 
-            while self.state == NO_TOKEN:
+        start = time.perf_counter()
+        self.peer_list.lock.acquire()
+        try:
+            self.clock += 1
+            ticket = self.clock
+            self.local.append(ticket)
+            while self.local[0] != ticket or self.holder is not None:
                 self.peer_list.lock.wait()
+            self.local.pop(0)
+            self.holder = ticket
+            # The previous holder may have left us the token.
+            handed = self.state == TOKEN_HELD
+        finally:
+            self.peer_list.lock.release()
 
+        if handed:
+            self._count(wait=time.perf_counter() - start, batched=True)
         else:
-            self.token[self.owner.id] = self.time
-        self.state = TOKEN_HELD
-        self.peer_list.lock.release()
+            messages = self._acquire_token()
+            self._count(messages, time.perf_counter() - start, messages == 0)
 
     def release(self):
         """Called when this object releases the lock."""
 
-        print("Releasing the lock...")
-        self.peer_list.lock.acquire()
+        logger.debug("Releasing the lock...")
+        if self.acquired is not None:
+            self.hold_times.record(time.perf_counter() - self.acquired)
+            self.acquired = None
+
+        if self.mode != SEQUENTIAL:
+            return self._release_batched()
 
+        self.peer_list.lock.acquire()
         try:
-            if self.state == TOKEN_HELD:
-                list_peers = self.peer_list.peers.items()
-                #self.peer_list.lock.release()
-                for peer_id, peer_adress in list_peers:
-                    if self.request[peer_id] > self.token[peer_id]:
-                        peer = self.peer_list.peers[peer_id]
-                        try:
-                            peer.obtain_token(self._prepare(self.token))
-                            self.state = NO_TOKEN
-                            break
-                        except Exception:
-                            continue
-                if self.state == TOKEN_HELD:
-                    self.state = TOKEN_PRESENT
+            if (self.state == TOKEN_HELD and self.local and
+                    (self.streak < self.local_bound or
+                     not self._outstanding())):
+                # Keep the token for the next thread in the queue.
+                self.streak += 1
+                self.holder = None
+                self.peer_list.lock.notify_all()
+                return
+            self.streak = 0
+            self.holder = _RELEASING
         finally:
             self.peer_list.lock.release()
 
+        try:
+            self._release_token()
+        finally:
+            self.peer_list.lock.acquire()
+            self.holder = None
+            self.peer_list.lock.notify_all()
+            self.peer_list.lock.release()
 
+    def request_token(self, time, pid, stamp=None):
+        """Called when some other object requests the token from us.
 
-    def request_token(self, time, pid):
-        """Called when some other object requests the token from us."""
+        stamp is the Lamport timestamp of the request, in the
+        TIMESTAMP mode."""
 
+        if self.mode != SEQUENTIAL:
+            handover = None
+            self.peer_list.lock.acquire()
+            try:
+                if pid in self.request and self.request[pid] < time:
+                    self.request[pid] = time
+                    self.stamps[pid] = stamp or 0
+                self.clock = max(self.clock, stamp or 0) + 1
+                if self.state == TOKEN_PRESENT:
+                    handover = self._hand_over()
+            finally:
+                self.peer_list.lock.release()
+            self._send(handover)
+            return
+
+        handover = None
         self.peer_list.lock.acquire()
         try:
             if self.request[pid] < time:
@@ -207,25 +788,143 @@ class DistributedLock(object):
             if self.state == TOKEN_PRESENT:
                 if self.request[pid] > self.token[pid]:
                     self.state = NO_TOKEN
-                    peer = self.peer_list.peers[pid]
-                    peer.obtain_token(self._prepare(self.token))
+                    handover = (pid, self._prepare(self.token), None,
+                                self.epoch)
         finally:
             self.peer_list.lock.release()
+        self._send(handover)
 
-    def obtain_token(self, token):
-        """Called when some other object is giving us the token."""
+    def obtain_token(self, token, pending=None, epoch=0):
+        """Called when some other object is giving us the token.
+
+        pending lists the [pid, time, stamp] requests that travel with
+        the token, and epoch is that of its sender. A token of an older
+        epoch than ours has been replaced, and is dropped."""
+
+        registry.counter("lock.tokens_received").add()
+        if self.mode != SEQUENTIAL:
+            self.peer_list.lock.acquire()
+            try:
+                if not self._current(epoch):
+                    return
+                self.token = self._unprepare(token)
+                self.token[self.owner.id] = self.time
+                self.requested = False
+                for pid, request, stamp in pending or []:
+                    if pid in self.request and self.request[pid] < request:
+                        self.request[pid] = request
+                        self.stamps[pid] = stamp
+                    self.clock = max(self.clock, stamp)
+                handover = self._hand_over(arrived=True)
+            finally:
+                self.peer_list.lock.release()
+            self._send(handover)
+            return
 
         self.peer_list.lock.acquire()
 
         try:
+            if not self._current(epoch):
+                return
             self.token = self._unprepare(token)
             self.token[self.owner.id] = self.time
-            self.state = TOKEN_PRESENT
-            self.peer_list.lock.notify()
+            if self.waiting:
+                self.state = TOKEN_HELD
+            else:
+                self.state = TOKEN_PRESENT
+            self.peer_list.lock.notify_all()
 
         finally:
             self.peer_list.lock.release()
 
+    def fence_token(self, epoch):
+        """Called by the peer recovering the token.
+
+        Move up to epoch, if it is newer, and return [epoch, holding,
+        served, request]: our epoch, whether we have the token, the
+        time of the last request of ours that was served, and our
+        [pid, time, stamp] request if one is waiting."""
+
+        self.peer_list.lock.acquire()
+        try:
+            self.epoch = max(self.epoch, epoch)
+            served, request = self._served()
+            return [self.epoch, self.state != NO_TOKEN, served, request]
+        finally:
+            self.peer_list.lock.release()
+
+    def recover_token(self):
+        """Make sure the token exists, regenerating it if it was lost.
+
+        Called when a peer has failed or the token has been missing for
+        a whole lease. The survivor with the lowest id does the work;
+        the others pass the call on to it."""
+
+        while True:
+            self.peer_list.lock.acquire()
+            try:
+                pids = sorted(self.peer_list.peers)
+            finally:
+                self.peer_list.lock.release()
+            if not pids or self.owner.id < pids[0]:
+                return self._recover()
+            try:
+                return self.peer_list.call(
+                    pids[0], "recover_token",
+                    timeout=None if self.lease is None else 2 * self.lease)
+            except TimeoutError:
+                self._give_up(pids[0])
+            except (KeyError, OSError, orb.CommunicationError):
+                # It has been unregistered; try the next one.
+                continue
+
+    def peer_failed(self, pid):
+        """Called when a peer has been suspected of having failed.
+
+        Recover the token only if that peer is the last one known to
+        have had it, or if this peer has been waiting for it for a
+        whole lease; otherwise the holder is alive and nobody needs to
+        be fenced."""
+
+        self.peer_list.lock.acquire()
+        try:
+            if self.state != NO_TOKEN:
+                return
+            lost = pid == self.last_holder
+            if (not lost and self.lease is not None and
+                    self.awaiting_since is not None):
+                lost = time.monotonic() - self.awaiting_since >= self.lease
+        finally:
+            self.peer_list.lock.release()
+        if lost:
+            self.recover_token()
+
+    def stats(self):
+        """Return the messages sent per critical section entered and the
+        time spent waiting for the lock.
+
+        batched counts the acquisitions that sent no request of their
+        own, as the token was here or already asked for."""
+
+        self.stats_lock.acquire()
+        try:
+            acquisitions = self.acquisitions
+            return {
+                "mode": self.mode,
+                "acquisitions": acquisitions,
+                "batched": self.batched,
+                "messages": self.messages,
+                "messages_per_cs": (self.messages / acquisitions
+                                    if acquisitions else None),
+                "mean_wait_ms": (self.wait_total / acquisitions * 1000
+                                 if acquisitions else None),
+                "max_wait_ms": self.wait_max * 1000,
+                "epoch": self.epoch,
+                "regenerations": self.regenerations,
+            }
+        finally:
+            self.stats_lock.release()
+
     def display_status(self):
         """Print the status of this peer."""
         self.peer_list.lock.acquire()
@@ -239,5 +938,7 @@ class DistributedLock(object):
             print("Request :: {0}".format(self.request))
             print("Token   :: {0}".format(self.token))
             print("Time    :: {0}".format(self.time))
+            print("Epoch   :: {0}".format(self.epoch))
+            print("Stats   :: {0}".format(self.stats()))
         finally:
             self.peer_list.lock.release()
\ No newline at end of file
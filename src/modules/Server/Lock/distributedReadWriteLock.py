@@ -9,19 +9,22 @@
 
 """Class implementing a distributed version of ReadWriteLock."""
 
-import threading
 from . import readWriteLock
 
 
 class DistributedReadWriteLock(readWriteLock.ReadWriteLock):
 
-    """Distributed version of ReadWriteLock."""
+    """Distributed version of ReadWriteLock.
+
+    The local writers queue up in the distributed lock itself, which
+    lets them use the token one after the other.
+
+    """
 
     def __init__(self, distributed_lock):
         readWriteLock.ReadWriteLock.__init__(self)
         # Create a distributed lock
         self.distributed_lock = distributed_lock
-        self.lock = threading.Lock()
 
     # Public methods
 
@@ -31,7 +34,6 @@ class DistributedReadWriteLock(readWriteLock.ReadWriteLock):
         Override the write_acquire method to include obtaining access
         to the rest of the peers."""
 
-        self.lock.acquire()
         self.distributed_lock.acquire()
         self.write_acquire_local()
 
@@ -43,7 +45,6 @@ class DistributedReadWriteLock(readWriteLock.ReadWriteLock):
 
         self.write_release_local()
         self.distributed_lock.release()
-        self.lock.release()
 
     def write_acquire_local(self):
         readWriteLock.ReadWriteLock.write_acquire(self)
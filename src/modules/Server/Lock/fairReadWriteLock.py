@@ -0,0 +1,216 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Class implementing a readers-writers lock with a choice of fairness."""
+
+import time
+import threading
+import contextlib
+from collections import deque
+
+READER_PREFERRING = "reader"
+WRITER_PREFERRING = "writer"
+FIFO = "fifo"
+
+READ = 0
+WRITE = 1
+
+
+class _Waiter(object):
+
+    """Place of a waiting thread in the queue of the lock."""
+
+    __slots__ = ("kind", )
+
+    def __init__(self, kind):
+        self.kind = kind
+
+
+class FairReadWriteLock(object):
+
+    """Reader-Writer lock with selectable fairness.
+
+    Same rules as ReadWriteLock, with the order in which waiting threads
+    are let in given by the policy:
+        --  READER_PREFERRING :: readers enter whenever no writer holds
+            the lock, so a steady flow of readers starves the writers
+            (the behaviour of ReadWriteLock),
+        --  WRITER_PREFERRING :: no new reader enters while a writer is
+            waiting,
+        --  FIFO :: threads enter in the order they arrived; consecutive
+            readers enter together.
+
+    The acquire methods take an optional timeout in seconds and return
+    False if it expired. A reader may upgrade to a writer and a writer
+    may downgrade to a reader without letting anybody in between. Only
+    one reader at a time may be waiting to upgrade, since two of them
+    would wait for each other forever.
+
+    Public methods:
+        --  read_acquire(timeout), read_release()
+        --  write_acquire(timeout), write_release()
+        --  upgrade(timeout), downgrade()
+        --  reading(timeout), writing(timeout) :: context managers
+
+    """
+
+    def __init__(self, policy=WRITER_PREFERRING):
+        if policy not in (READER_PREFERRING, WRITER_PREFERRING, FIFO):
+            raise ValueError("Unknown fairness policy: '{}'".format(policy))
+        self.policy = policy
+        self.lock = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.upgrading = False
+        self.waiting_writers = 0
+        self.queue = deque()
+
+    # Private methods
+
+    def _can_read(self, waiter):
+        if self.writer or self.upgrading:
+            return False
+        if self.policy == READER_PREFERRING:
+            return True
+        if self.policy == WRITER_PREFERRING:
+            return self.waiting_writers == 0
+        for other in self.queue:
+            if other is waiter:
+                return True
+            if other.kind == WRITE:
+                return False
+
+    def _can_write(self, waiter):
+        if self.writer or self.readers:
+            return False
+        if self.policy == FIFO:
+            return self.queue[0] is waiter
+        return True
+
+    def _acquire(self, kind, timeout):
+        """Wait for the lock; the caller must hold self.lock."""
+
+        waiter = _Waiter(kind)
+        can_enter = self._can_write if kind == WRITE else self._can_read
+        self.queue.append(waiter)
+        if kind == WRITE:
+            self.waiting_writers += 1
+        try:
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
+            while not can_enter(waiter):
+                if timeout is None:
+                    self.lock.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.lock.wait(remaining)
+
+            if kind == WRITE:
+                self.writer = True
+            else:
+                self.readers += 1
+            return True
+        finally:
+            self.queue.remove(waiter)
+            if kind == WRITE:
+                self.waiting_writers -= 1
+            # Leaving the queue may let in the threads behind us.
+            self.lock.notify_all()
+
+    # Public methods
+
+    def read_acquire(self, timeout=None):
+        self.lock.acquire()
+        try:
+            return self._acquire(READ, timeout)
+        finally:
+            self.lock.release()
+
+    def read_release(self):
+        self.lock.acquire()
+        try:
+            self.readers -= 1
+            if self.readers == 0:
+                self.lock.notify_all()
+        finally:
+            self.lock.release()
+
+    def write_acquire(self, timeout=None):
+        self.lock.acquire()
+        try:
+            return self._acquire(WRITE, timeout)
+        finally:
+            self.lock.release()
+
+    def write_release(self):
+        self.lock.acquire()
+        try:
+            self.writer = False
+            self.lock.notify_all()
+        finally:
+            self.lock.release()
+
+    def upgrade(self, timeout=None):
+        """Turn a read lock held by the caller into the write lock.
+
+        Return False, still holding the read lock, if the timeout
+        expired.
+        """
+
+        self.lock.acquire()
+        try:
+            if self.upgrading:
+                raise RuntimeError("Another reader is already upgrading.")
+            self.upgrading = True
+            try:
+                result = self.lock.wait_for(lambda: self.readers == 1, timeout)
+                if result:
+                    self.readers = 0
+                    self.writer = True
+                return result
+            finally:
+                self.upgrading = False
+                self.lock.notify_all()
+        finally:
+            self.lock.release()
+
+    def downgrade(self):
+        """Turn the write lock held by the caller into a read lock."""
+
+        self.lock.acquire()
+        try:
+            self.writer = False
+            self.readers += 1
+            self.lock.notify_all()
+        finally:
+            self.lock.release()
+
+    @contextlib.contextmanager
+    def reading(self, timeout=None):
+        """Hold the read lock for the duration of a with block."""
+
+        if not self.read_acquire(timeout):
+            raise TimeoutError("Timed out waiting for the read lock.")
+        try:
+            yield self
+        finally:
+            self.read_release()
+
+    @contextlib.contextmanager
+    def writing(self, timeout=None):
+        """Hold the write lock for the duration of a with block."""
+
+        if not self.write_acquire(timeout):
+            raise TimeoutError("Timed out waiting for the write lock.")
+        try:
+            yield self
+        finally:
+            self.write_release()
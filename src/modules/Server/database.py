@@ -9,35 +9,381 @@
 
 """Implementation of a simple database class."""
 
+import os
+import mmap
+import zlib
 import random
+import threading
+from array import array
+
+from .groupCommit import GroupCommitWriter
+
+# Every record in the database file is followed by this separator.
+SEPARATOR = b"\n%\n"
+
+# Fortunes a MappedDatabase writes between two mappings of its file.
+REMAP_EVERY = 1024
+
+
+def parse_records(lines, offset=0):
+    """Parse the records of a fortune file.
+
+    lines iterates over the lines of the file as bytes, starting at a
+    record boundary found at the given offset. A record is made of the
+    lines before a line holding just "%", without the last newline, so
+    both an empty record written as "\n%\n" and a bare "%" line give
+    an empty fortune.
+
+    Yield (start, end, record) for every complete record: the offset at
+    which it starts, the offset just past its separator, and its bytes.
+    Text after the last separator is not a complete record and is left
+    out. The file is never held in memory as a whole.
+
+    """
+
+    start = offset
+    record = []
+    for line in lines:
+        offset += len(line)
+        if line == b"%\n" or line == b"%":
+            yield start, offset, b"".join(record)[:-1]
+            start = offset
+            record = []
+        else:
+            record.append(line)
 
 
 class Database(object):
 
-    """Class containing a database implementation."""
+    """Class containing a database implementation.
+
+    Given a durability level (see Server.groupCommit), the database
+    keeps its file open and writes through a GroupCommitWriter. A
+    writer may then add a fortune with append() while it holds its
+    lock and wait for it to be saved with commit() after releasing the
+    lock, so that concurrent writes are saved together.
+
+    Readers take no lock. The writers, serialized by write_lock, only
+    ever add fortunes at the end of the list and then publish the
+    snapshot (data, count); a reader uses the snapshot it finds and
+    never looks past its count, so what it sees does not change.
+
+    Every write bumps version once the fortune can be read, so that
+    clients caching fortunes can tell their copies are out of date.
+
+    """
+
+    def __init__(self, db_file, durability=None):
+        self.db_file = db_file
+        self.rand = random.Random()
+        self.rand.seed()
+        self.write_lock = threading.Lock()
+
+        with open(self.db_file, "rb") as file:
+            self.data = [record.decode()
+                         for start, end, record in parse_records(file)]
+        self.snapshot = (self.data, len(self.data))
+        self.version = 0
+
+        self.writer = None
+        if durability is not None:
+            self.writer = GroupCommitWriter(self.db_file, durability)
+
+    def _sample(self, count, k, distinct):
+        """Return k random positions below count, all different if
+        distinct (then at most count of them)."""
+        if not count:
+            return []
+        randrange = self.rand.randrange
+        if not distinct:
+            return [randrange(count) for i in range(k)]
+        if k * 4 > count:
+            return self.rand.sample(range(count), min(k, count))
+        # Few positions out of many: repeats are rare, so drawing them
+        # one by one and rejecting the repeats is cheaper than sample().
+        positions = []
+        seen = set()
+        while len(positions) < k:
+            position = randrange(count)
+            if position not in seen:
+                seen.add(position)
+                positions.append(position)
+        return positions
+
+    def read(self):
+        """Read a random fortune in the database."""
+        data, count = self.snapshot
+        if not count:
+            return
+
+        randomFortune = self.rand.randint(0, count - 1)
+        return data[randomFortune]
+
+    def read_many(self, k, distinct=True):
+        """Read k random fortunes, all from the same snapshot.
+
+        If distinct, no fortune is read twice, so fewer are returned
+        when the database has fewer than k."""
+        data, count = self.snapshot
+        return [data[i] for i in self._sample(count, k, distinct)]
+
+    def __len__(self):
+        return self.snapshot[1]
+
+    def record(self, index):
+        """Return the fortune at the given position."""
+        data, count = self.snapshot
+        if not 0 <= index < count:
+            raise IndexError("No fortune at position {}".format(index))
+        return data[index]
+
+    def records(self, indices):
+        """Return the fortunes at the given positions, all from the same
+        snapshot, and None for the positions past its end."""
+        data, count = self.snapshot
+        return [data[i] if 0 <= i < count else None for i in indices]
+
+    def write(self, fortune):
+        """Write a new fortune to the database."""
+
+        self.commit(self.append(fortune))
+
+        return
+
+    def append(self, fortune):
+        """Add a new fortune and return the ticket to commit it with.
+
+        The fortune can be read at once, but it is only known to be
+        saved once commit() has returned.
+        """
+
+        self.write_lock.acquire()
+        try:
+            self.data.append(fortune)
+            self.snapshot = (self.data, len(self.data))
+            self.version += 1
+            if self.writer is None:
+                with open(self.db_file, "a") as file:
+                    file.write(fortune + "\n%\n")
+                return None
+            return self.writer.append(fortune.encode() + SEPARATOR)
+        finally:
+            self.write_lock.release()
+
+    def commit(self, ticket):
+        """Wait for the fortune appended with ticket to be saved."""
+
+        if ticket is not None:
+            self.writer.commit(ticket)
+
+
+class MappedDatabase(Database):
+
+    """Database reading its records from a memory map of the file.
+
+    Instead of a list of all the fortunes, only the offsets at which the
+    records start are kept, in an array('Q'). The index is saved next to
+    the database file (db_file + ".idx"), so a restart only scans what
+    has been appended to the file since.
+
+    Index file layout: the offset just past the last indexed record, a
+    CRC32 of that record, then the start offsets, all as unsigned 64-bit
+    integers. The CRC detects a database file replaced behind our back.
+
+    As in Database, readers take no lock: they read the snapshot (count,
+    end, map, mapped, recent). Writes append to the file and to the
+    index through handles kept open, and the fortunes written since the
+    file was last mapped, past the first mapped records, are kept in
+    recent, as Database keeps them all. Once there are REMAP_EVERY of
+    them, the file is mapped anew; the maps still used by readers stay
+    open until the last of them drops its snapshot. Every write bumps
+    version.
+    """
 
     def __init__(self, db_file):
         self.db_file = db_file
+        self.writer = None
+        self.write_lock = threading.Lock()
+        self.index_file = db_file + ".idx"
         self.rand = random.Random()
         self.rand.seed()
 
-        file = open(self.db_file)
-        self.data = file.read().split('"\n" + "%" + "\n"')
-        del self.data[len(self.data)-1]
+        self.map = None
+        self.starts = array("Q")
+        self.end = 0
+        self.crc = 0
+        self.version = 0
+        self.file = None
+        self.index = None
+
+        self._remap()
+        indexed = self._load_index()
+        self._scan()
+        self.crc = self._checksum()
+        if not indexed or len(self.starts) > indexed:
+            self._save_index()
+        self.mapped = len(self.starts)
+        self.recent = []
+        self._publish()
+
+    # Private methods
+
+    def _remap(self):
+        """Map the current content of the database file."""
+
+        with open(self.db_file, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                self.map = None
+            else:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _publish(self):
+        self.snapshot = (self.map, len(self.starts), self.end, self.mapped,
+                         self.recent)
+
+    def _checksum(self):
+        if not self.starts:
+            return 0
+        return zlib.crc32(self.map[self.starts[-1]:self.end])
+
+    def _load_index(self):
+        """Load the saved index, if it matches the database file.
+
+        Return the number of records loaded.
+        """
+
+        try:
+            with open(self.index_file, "rb") as file:
+                data = file.read()
+        except OSError:
+            return 0
+
+        size = len(self.map) if self.map is not None else 0
+        if len(data) < 16 or len(data) % 8:
+            # A truncated or corrupt index; scan the whole file instead.
+            return 0
+        header = array("Q")
+        header.frombytes(data[:16])
+        if header[0] > size:
+            return 0
+        self.starts.frombytes(data[16:])
+        self.end = header[0]
+        if self._checksum() != header[1]:
+            # The database file has been replaced; index it again.
+            self.starts = array("Q")
+            self.end = 0
+        return len(self.starts)
+
+    def _save_index(self):
+        with open(self.index_file, "wb") as file:
+            array("Q", [self.end, self._checksum()]).tofile(file)
+            self.starts.tofile(file)
+
+    def _append_index(self):
+        """Add the last record to the saved index."""
+
+        if self.index is None:
+            self.index = open(self.index_file, "r+b")
+        self.index.seek(0, os.SEEK_END)
+        self.starts[-1:].tofile(self.index)
+        self.index.seek(0)
+        array("Q", [self.end, self.crc]).tofile(self.index)
+        self.index.flush()
+
+    def _scan(self):
+        """Index the complete records found past the current end.
+
+        Return the number of records added to the index.
+        """
+
+        if self.map is None:
+            return 0
+        count = 0
+        self.map.seek(self.end)
+        for start, end, record in parse_records(iter(self.map.readline, b""),
+                                                self.end):
+            self.starts.append(start)
+            self.end = end
+            count += 1
+        return count
+
+    def _record(self, i, snapshot):
+        fmap, count, end, mapped, recent = snapshot
+        if not 0 <= i < count:
+            raise IndexError("No fortune at position {}".format(i))
+        if i >= mapped:
+            return recent[i - mapped]
+        if i + 1 < count:
+            stop = self.starts[i + 1]
+        else:
+            stop = end
+        # The slice ends with the separator line; drop it along with the
+        # newline ending the fortune.
+        record = fmap[self.starts[i]:stop]
+        record = record[:record.rindex(b"%")]
+        return record[:-1].decode()
+
+    # Public methods
 
     def read(self):
         """Read a random fortune in the database."""
-        if not len(self.data):
+        snapshot = self.snapshot
+        if not snapshot[1]:
             return
 
-        randomFortune = self.rand.randint(0, len(self.data)-1)
-        return self.data[randomFortune]
+        return self._record(self.rand.randint(0, snapshot[1] - 1), snapshot)
+
+    def read_many(self, k, distinct=True):
+        """Read k random fortunes, all from the same snapshot.
+
+        If distinct, no fortune is read twice, so fewer are returned
+        when the database has fewer than k."""
+        snapshot = self.snapshot
+        return [self._record(i, snapshot)
+                for i in self._sample(snapshot[1], k, distinct)]
+
+    def __len__(self):
+        return self.snapshot[1]
+
+    def record(self, index):
+        """Return the fortune at the given position."""
+        return self._record(index, self.snapshot)
+
+    def records(self, indices):
+        """Return the fortunes at the given positions, all from the same
+        snapshot, and None for the positions past its end."""
+        snapshot = self.snapshot
+        return [self._record(i, snapshot) if 0 <= i < snapshot[1] else None
+                for i in indices]
 
     def write(self, fortune):
         """Write a new fortune to the database."""
 
-        self.data.append(fortune)
-        with open(self.db_file, "a") as file:
-            file.write(fortune + "\n%\n")
+        record = fortune.encode() + SEPARATOR
+        self.write_lock.acquire()
+        try:
+            if self.file is None:
+                self.file = open(self.db_file, "ab")
+            self.file.write(record)
+            self.file.flush()
+            self.starts.append(self.end)
+            self.end += len(record)
+            self.crc = zlib.crc32(record)
+            self._append_index()
+            self.recent.append(fortune)
+            if len(self.recent) >= REMAP_EVERY:
+                self._remap()
+                self.mapped = len(self.starts)
+                self.recent = []
+            self._publish()
+            self.version += 1
+        finally:
+            self.write_lock.release()
 
         return
+
+    def append(self, fortune):
+        """Write a new fortune; it has to be in the file to be read."""
+
+        self.write(fortune)
+        return None
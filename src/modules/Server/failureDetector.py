@@ -0,0 +1,180 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Heartbeat failure detector for the peers of a peer list.
+
+Every interval seconds, the detector calls check() on all the peers in
+parallel; an answer is a heartbeat. A peer is suspected once it has not
+answered for too long, either:
+    --  TIMEOUT :: for more than timeout seconds, or
+    --  PHI :: for long enough that the suspicion level phi of the
+        accrual failure detector reaches the threshold. phi is
+        -log10 of the probability that a heartbeat is still to come,
+        with the times between heartbeats taken as exponentially
+        distributed around their mean over the last WINDOW ones. A
+        threshold of 1 thus means a 10% chance of a wrong suspicion,
+        and every extra unit divides that chance by 10.
+
+A peer that refuses the connection is dead and is unregistered by the
+broadcast right away. A suspected peer is unregistered from the owner as
+well, and on_failure(pid) is then called, e.g., to recover the token of
+the distributed lock.
+
+"""
+
+import math
+import time
+import threading
+import collections
+
+from Common import log
+
+logger = log.get("failureDetector")
+
+INTERVAL = 0.5
+PHI = 4.0
+
+# Number of intervals between heartbeats kept per peer.
+WINDOW = 100
+
+
+class FailureDetector(object):
+
+    """Heartbeat failure detector for a list of peers.
+
+    Public methods:
+        --  __init__(owner, peer_list, interval, timeout, phi, on_failure)
+        --  start()
+        --  stop()
+        --  phi(pid) -> suspicion level
+        --  status() -> {pid: [seconds since the last heartbeat, phi]}
+
+    If timeout is given, the peers are suspected after timeout seconds
+    without heartbeats, otherwise once phi reaches the threshold phi.
+
+    """
+
+    def __init__(self, owner, peer_list, interval=INTERVAL, timeout=None,
+                 phi=PHI, on_failure=None):
+        self.owner = owner
+        self.peer_list = peer_list
+        self.interval = interval
+        self.timeout = timeout
+        self.threshold = phi
+        self.on_failure = on_failure
+        self.lock = threading.Lock()
+        self.last = {}
+        self.intervals = {}
+        self.running = threading.Event()
+        self.thread = None
+
+    # Private methods
+
+    def _phi(self, pid, now):
+        intervals = self.intervals[pid]
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+        else:
+            mean = self.interval
+        return (now - self.last[pid]) / max(mean, 1e-6) * math.log10(math.e)
+
+    def _suspected(self, pid, now):
+        if self.timeout is not None:
+            return now - self.last[pid] > self.timeout
+        return self._phi(pid, now) >= self.threshold
+
+    def _round(self):
+        """Send a heartbeat request to every peer and judge the silent."""
+
+        results, failures = self.peer_list.broadcast("check",
+                                                     timeout=self.interval)
+        now = time.monotonic()
+        failed = []
+        self.lock.acquire()
+        try:
+            for pid in results:
+                if pid in self.last:
+                    self.intervals[pid].append(now - self.last[pid])
+                else:
+                    self.intervals[pid] = collections.deque(maxlen=WINDOW)
+                self.last[pid] = now
+            for pid in failures:
+                # A peer never heard from is given a first interval.
+                self.last.setdefault(pid, now)
+                self.intervals.setdefault(pid,
+                                          collections.deque(maxlen=WINDOW))
+
+            peers = set(self.peer_list.get_peers())
+            for pid in list(self.last):
+                if pid not in peers or self._suspected(pid, now):
+                    if pid in peers or pid in failures:
+                        failed.append(pid)
+                    del self.last[pid]
+                    del self.intervals[pid]
+        finally:
+            self.lock.release()
+
+        for pid in failed:
+            if pid in self.peer_list.get_peers():
+                logger.info("Peer %s is suspected to have failed.", pid)
+                try:
+                    self.owner.unregister_peer(pid)
+                except Exception:
+                    # Somebody else has already removed it.
+                    pass
+            if self.on_failure is not None:
+                self.on_failure(pid)
+
+    def _run(self):
+        while self.running.is_set():
+            start = time.monotonic()
+            try:
+                self._round()
+            except Exception as e:
+                logger.warning("Failure detector error: %s", e)
+            time.sleep(max(0, self.interval - (time.monotonic() - start)))
+
+    # Public methods
+
+    def start(self):
+        """Start sending heartbeat requests."""
+
+        self.running.set()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop sending heartbeat requests."""
+
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def phi(self, pid):
+        """Return the suspicion level of peer pid."""
+
+        self.lock.acquire()
+        try:
+            return self._phi(pid, time.monotonic())
+        finally:
+            self.lock.release()
+
+    def status(self):
+        """Return the seconds since the last heartbeat and the phi of
+        every peer watched."""
+
+        now = time.monotonic()
+        self.lock.acquire()
+        try:
+            return dict((pid, [now - self.last[pid], self._phi(pid, now)])
+                        for pid in self.last)
+        finally:
+            self.lock.release()
@@ -0,0 +1,124 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Append-only file writer with group commit.
+
+Writers queue their data and then wait for it to be committed. The
+first waiter to find no commit in progress writes everything queued so
+far in one go, and all the writers whose data was in that batch are
+released together. Under load, many writes thus share a single write
+and a single flush or fsync.
+
+Durability levels, i.e., what has happened to the data once commit
+returns:
+    --  DURABILITY_NONE  :: it is in the buffer of the open file,
+    --  DURABILITY_FLUSH :: it has been handed to the operating system,
+    --  DURABILITY_FSYNC :: it has been written to the disk.
+
+"""
+
+import os
+import threading
+
+DURABILITY_NONE = "none"
+DURABILITY_FLUSH = "flush"
+DURABILITY_FSYNC = "fsync"
+
+
+class GroupCommitWriter(object):
+
+    """Group-commit writer appending to one file kept open.
+
+    Public methods:
+        --  __init__(path, durability)
+        --  append(data)
+        --  commit(ticket)
+        --  write(data)
+        --  close()
+
+    """
+
+    def __init__(self, path, durability=DURABILITY_FLUSH):
+        if durability not in (DURABILITY_NONE, DURABILITY_FLUSH,
+                              DURABILITY_FSYNC):
+            raise ValueError("Unknown durability level: '{}'".format(durability))
+        self.durability = durability
+        self.file = open(path, "ab")
+        self.lock = threading.Condition()
+        self.pending = []
+        self.queued = 0
+        self.committed = 0
+        self.committing = False
+        self.error = None
+        self.batches = 0
+
+    # Private methods
+
+    def _write_batch(self, batch):
+        self.file.write(b"".join(batch))
+        if self.durability != DURABILITY_NONE:
+            self.file.flush()
+        if self.durability == DURABILITY_FSYNC:
+            os.fsync(self.file.fileno())
+
+    # Public methods
+
+    def append(self, data):
+        """Queue data (bytes) and return the ticket to commit it with.
+
+        Data is written in the order it has been queued.
+        """
+
+        self.lock.acquire()
+        try:
+            self.pending.append(data)
+            self.queued += 1
+            return self.queued
+        finally:
+            self.lock.release()
+
+    def commit(self, ticket):
+        """Return once the data of the given ticket is committed."""
+
+        self.lock.acquire()
+        try:
+            while self.committed < ticket:
+                if self.error is not None:
+                    raise self.error
+                if self.committing:
+                    self.lock.wait()
+                    continue
+
+                # Nobody is writing: commit the whole queue for everyone.
+                batch, self.pending = self.pending, []
+                last = self.queued
+                self.committing = True
+                self.lock.release()
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.error = e
+                finally:
+                    self.lock.acquire()
+                    self.committing = False
+                    if self.error is None:
+                        self.committed = last
+                        self.batches += 1
+                    self.lock.notify_all()
+        finally:
+            self.lock.release()
+
+    def write(self, data):
+        """Append data and wait for it to be committed."""
+
+        self.commit(self.append(data))
+
+    def close(self):
+        self.commit(self.queued)
+        self.file.close()
@@ -10,18 +10,41 @@
 """Package for handling a list of objects of the same type as a given one."""
 
 import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from Common import log
 from Common import orb
 
+logger = log.get("peerList")
+
 
 class PeerList(object):
 
-    """Class that builds a list of objects of the same type as this one."""
+    """Class that builds a list of objects of the same type as this one.
+
+    If persistent is set, the stubs of the peers keep a pooled
+    connection open instead of connecting for every call. The peers are
+    called in parallel when joining and leaving, each within timeout
+    seconds, so that the time taken does not grow with their number.
+    The calls given no timeout of their own get this one as well, and
+    those of the idempotent methods are retried as retry, an orb.Retry,
+    allows.
 
-    def __init__(self, owner):
+    """
+
+    def __init__(self, owner, persistent=False, timeout=None, retry=None):
         self.owner = owner
+        self.persistent = persistent
+        self.timeout = timeout
+        self.retry = retry
         self.lock = threading.Condition()
         self.peers = {}
 
+    # Private methods
+
+    def _stub(self, address):
+        return orb.Stub(address, self.persistent, self.timeout, self.retry)
+
     # Public methods
 
     def initialize(self):
@@ -36,18 +59,19 @@ class PeerList(object):
 
         self.lock.acquire()
         try:
-            peers_to_register_at = self.owner.name_service.require_all(self.owner.type)
+            peers_to_register_at = self.owner.require_all()
             for peer_id, peer_address in peers_to_register_at:
                 if peer_id >= self.owner.id:
                     continue
-                self.peers[peer_id] = orb.Stub(peer_address)
-
-            for peer_id, peer_address in self.peers.items():
-                peer = self.peers[peer_id]
-                try:
-                    peer.register_peer(self.owner.id, self.owner.address)
-                except Exception as e:
-                    del self.peers[peer_id]
+                self.peers[peer_id] = self._stub(peer_address)
+
+            pids = list(self.peers)
+            calls = [self.peers[pid].register_peer.future(self.owner.id,
+                                                          self.owner.address)
+                     for pid in pids]
+            for pid, result in zip(pids, orb.gather(calls, self.timeout)):
+                if isinstance(result, Exception):
+                    del self.peers[pid]
         finally:
             self.lock.release()
 
@@ -56,15 +80,9 @@ class PeerList(object):
 
         self.lock.acquire()
         try:
-            registered_peers = self.peers
-            if registered_peers:
-                for peer_id, peer_address in registered_peers.items():
-                    print(len(self.peers))
-                    peer = self.peers[peer_id]
-                    try:
-                        peer.unregister_peer(self.owner.id)
-                    except Exception:
-                        continue
+            # Peers that cannot be reached need not be told.
+            orb.gather([peer.unregister_peer.future(self.owner.id)
+                        for peer in self.peers.values()], self.timeout)
         finally:
             self.lock.release()
 
@@ -75,8 +93,8 @@ class PeerList(object):
         # this method in parallel.
         self.lock.acquire()
         try:
-            self.peers[pid] = orb.Stub(paddr)
-            print("Peer {} has joined the system.".format(pid))
+            self.peers[pid] = self._stub(paddr)
+            logger.info("Peer %s has joined the system.", pid)
         finally:
             self.lock.release()
 
@@ -89,12 +107,107 @@ class PeerList(object):
         try:
             if pid in self.peers:
                 del self.peers[pid]
-                print("Peer {} has left the system.".format(pid))
+                logger.info("Peer %s has left the system.", pid)
             else:
                 raise Exception("No peer with id: '{}'".format(pid))
         finally:
             self.lock.release()
 
+    def broadcast(self, method, *args, timeout=None, quorum=None):
+        """Call method(*args) on all the peers in parallel.
+
+        Return the pair (results, failures) of dictionaries mapping peer
+        ids to the value returned by the call, respectively to the
+        exception it raised. A call that has not completed within
+        timeout seconds, or the timeout of the list, is reported as a
+        TimeoutError; it is not cancelled and may still take effect
+        later, unless its peer finds it expired before running it.
+
+        If quorum is given, return as soon as that many calls have
+        succeeded; the calls still running are then left out of both
+        dictionaries.
+
+        Peers that cannot be reached are unregistered from the owner.
+
+        """
+
+        self.lock.acquire()
+        try:
+            peers = dict(self.peers)
+        finally:
+            self.lock.release()
+
+        if timeout is None:
+            timeout = self.timeout
+        calls = dict((pid, peer.async_call(method, *args, timeout=timeout))
+                     for pid, peer in peers.items())
+
+        if quorum is None:
+            wait(calls.values(), timeout)
+        else:
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
+            running = set(calls.values())
+            succeeded = 0
+            while running and succeeded < quorum:
+                remaining = None
+                if timeout is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                done, running = wait(running, remaining, FIRST_COMPLETED)
+                succeeded += len([c for c in done if c.exception() is None])
+
+        results = {}
+        failures = {}
+        for pid, call in calls.items():
+            if not call.done() and quorum is not None and succeeded >= quorum:
+                continue
+            if not call.done():
+                failures[pid] = TimeoutError(
+                    "Peer {} did not answer in time.".format(pid))
+            elif call.exception() is not None:
+                failures[pid] = call.exception()
+            else:
+                results[pid] = call.result()
+
+        for pid, error in failures.items():
+            # A peer that is merely slow is kept in the list.
+            if isinstance(error, TimeoutError):
+                continue
+            if isinstance(error, (OSError, orb.CommunicationError)):
+                try:
+                    self.owner.unregister_peer(pid)
+                except Exception:
+                    # Somebody else has already removed it.
+                    continue
+        return results, failures
+
+    def call(self, pid, method, *args, timeout=None):
+        """Call method(*args) on peer pid and return its result.
+
+        Raise TimeoutError if the call has not completed within timeout
+        seconds, or the timeout of the list; it is not cancelled and may
+        still take effect later. A peer that cannot be reached is
+        unregistered from the owner.
+
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+        call = self.peer(pid).async_call(method, *args, timeout=timeout)
+        if not wait([call], timeout).done:
+            raise TimeoutError("Peer {} did not answer in time.".format(pid))
+        error = call.exception()
+        if (isinstance(error, (OSError, orb.CommunicationError)) and
+                not isinstance(error, TimeoutError)):
+            try:
+                self.owner.unregister_peer(pid)
+            except Exception:
+                # Somebody else has already removed it.
+                pass
+        return call.result()
+
     def display_peers(self):
         """Display all the peers in the list."""
 
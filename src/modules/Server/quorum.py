@@ -0,0 +1,291 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Quorum replication of the fortune database.
+
+An alternative to 'read any write all' under the distributed lock. With
+N replicas, a write returns once W of them have stored the fortune and
+a read consults R of them. If R + W > N, every read quorum overlaps the
+quorum of every write that has returned, so no such write is missed,
+and no replica has to hold a lock shared by the whole group.
+
+N is the size of the group as configured, not the number of replicas
+registered at the time: a replica cut off from the others must not
+count itself as a quorum. Reads and writes that fewer than R or W
+replicas answer raise an exception.
+
+Every fortune written is identified by a key [time, pid], where time is
+the Lamport clock of the replica that wrote it and pid its id; keys are
+unique and totally ordered. The fortunes of the initial database get
+the keys [0, -1], [0, -2], ... so that they are the same everywhere.
+The keys of the fortunes written are saved next to the database file
+(db_file + ".ver"): a first "base count" line with the number of
+fortunes of the initial database, then one "time pid position" line
+per fortune written, position being its index in the database. The
+database file, written with group commit, may be behind or ahead of
+the keys file after a crash, so the keys of positions that are not in
+the database are dropped, and the fortunes with no key are not served
+to the other replicas; the read repair brings them back under their
+key.
+
+A read asks R - 1 other replicas (this one is the R-th) for a digest of
+the keys they store. If all of them match the local one, the fortune is
+read locally. Otherwise, the keys of the replicas that differ are
+fetched and the missing fortunes are copied both ways (read repair)
+before reading locally.
+
+A write is refused at once when fewer than W replicas are registered.
+One that does not reach its quorum otherwise raises an exception; it
+is not undone on the replicas that have stored it, and may be read
+later.
+
+"""
+
+import os
+import threading
+
+from Server.Lock.readWriteLock import ReadWriteLock
+
+
+def _digest(keys):
+    """Return a digest of a set of keys, independent of their order."""
+
+    # The hash of a tuple of ints is the same in every process.
+    digest = 0
+    for key in keys:
+        digest ^= hash(key)
+    return [len(keys), digest]
+
+
+class QuorumStore(object):
+
+    """Fortune database replicated by quorums.
+
+    Public methods, called locally:
+        --  read()
+        --  read_many(k, distinct)
+        --  write(fortune)
+
+    and remotely, by the other replicas:
+        --  quorum_store(records) -> number of records added
+        --  quorum_digest() -> [count, hash]
+        --  quorum_keys() -> [key, ...]
+        --  quorum_records(keys) -> [[key, fortune], ...]
+
+    read_quorum and write_quorum default to a majority of the replicas.
+
+    """
+
+    def __init__(self, owner, peer_list, db, replicas, read_quorum=None,
+                 write_quorum=None, timeout=None):
+        majority = replicas // 2 + 1
+        read_quorum = read_quorum or majority
+        write_quorum = write_quorum or majority
+        if read_quorum + write_quorum <= replicas:
+            raise ValueError(
+                "Quorums R={} and W={} do not overlap with {} replicas".format(
+                    read_quorum, write_quorum, replicas))
+        if max(read_quorum, write_quorum) > replicas:
+            raise ValueError(
+                "Quorums R={} and W={} exceed the {} replicas".format(
+                    read_quorum, write_quorum, replicas))
+        self.owner = owner
+        self.peer_list = peer_list
+        self.db = db
+        self.replicas = replicas
+        self.read_quorum = read_quorum
+        self.write_quorum = write_quorum
+        self.timeout = timeout
+        self.rwlock = ReadWriteLock()
+        self.clock_lock = threading.Lock()
+        self.time = 0
+        self.keys_file = db.db_file + ".ver"
+        self._load_keys()
+
+    # Private methods
+
+    def _load_keys(self):
+        count = len(self.db)
+        base = None
+        lines = []
+        if os.path.exists(self.keys_file):
+            with open(self.keys_file) as file:
+                lines = [line.split() for line in file if line.strip()]
+        if lines and lines[0][0] == "base":
+            base = int(lines[0][1])
+            lines = lines[1:]
+        elif lines:
+            # A file of "time pid" lines, in the order of the database.
+            base = count - len(lines)
+            lines = [line + [base + i] for i, line in enumerate(lines)]
+        else:
+            base = count
+        if base > count:
+            raise Exception("'{}' does not match the database '{}'".format(
+                self.keys_file, self.db.db_file))
+
+        # The last key written at a position wins; those past the end of
+        # the database were not saved.
+        by_position = dict((i, (0, -(i + 1))) for i in range(base))
+        for time, pid, position in lines:
+            if base <= int(position) < count:
+                by_position[int(position)] = (int(time), int(pid))
+        self.positions = dict((key, position)
+                              for position, key in by_position.items())
+        self.keys = sorted(self.positions, key=self.positions.get)
+        self.digest = _digest(self.keys)
+        self.time = max([key[0] for key in self.keys] + [0])
+
+        # Rewrite the file, so that it only holds the keys kept.
+        with open(self.keys_file + ".tmp", "w") as file:
+            file.write("base {}\n".format(base))
+            for key in self.keys:
+                if self.positions[key] >= base:
+                    file.write("{} {} {}\n".format(key[0], key[1],
+                                                   self.positions[key]))
+        os.replace(self.keys_file + ".tmp", self.keys_file)
+
+    def _tick(self):
+        """Advance the Lamport clock for a new write and return it."""
+
+        self.clock_lock.acquire()
+        try:
+            self.time += 1
+            return self.time
+        finally:
+            self.clock_lock.release()
+
+    def _witness(self, time):
+        """Move the Lamport clock up to the time of a key seen."""
+
+        self.clock_lock.acquire()
+        try:
+            self.time = max(self.time, time)
+        finally:
+            self.clock_lock.release()
+
+    def _reachable(self, quorum, what):
+        """Raise if fewer than quorum replicas, this one included, are
+        registered, before anything is done."""
+
+        replicas = len(self.peer_list.get_peers()) + 1
+        if replicas < quorum:
+            raise Exception("{} quorum of {} not reachable: {} of {} "
+                            "replicas known".format(what, quorum, replicas,
+                                                    self.replicas))
+
+    def _repair(self, pid, keys):
+        """Copy the fortunes missing on either side of peer pid."""
+
+        keys = set(tuple(key) for key in keys)
+        self.rwlock.read_acquire()
+        try:
+            ours = set(self.positions)
+        finally:
+            self.rwlock.read_release()
+
+        peer = self.peer_list.peer(pid)
+        missing = keys - ours
+        if missing:
+            self.quorum_store(peer.quorum_records(sorted(missing)))
+        extra = ours - keys
+        if extra:
+            peer.quorum_store(self.quorum_records(sorted(extra)))
+
+    def _agree(self):
+        """Bring this replica up to date with a read quorum."""
+
+        read_quorum = self.read_quorum
+        self._reachable(read_quorum, "Read")
+        if read_quorum > 1:
+            results, failures = self.peer_list.broadcast(
+                "quorum_digest", timeout=self.timeout, quorum=read_quorum - 1)
+            if len(results) < read_quorum - 1:
+                raise Exception("Read quorum of {} not reached: {}".format(
+                    read_quorum, failures))
+            digest = self.quorum_digest()
+            for pid, peer_digest in results.items():
+                if peer_digest != digest:
+                    self._repair(pid, self.peer_list.peer(pid).quorum_keys())
+
+    # Public methods
+
+    def read(self):
+        """Read a fortune once the read quorum agrees with this replica."""
+
+        self._agree()
+        return self.db.read()
+
+    def read_many(self, k, distinct=True):
+        """Read k fortunes, consulting the read quorum once for all."""
+
+        self._agree()
+        return self.db.read_many(k, distinct)
+
+    def write(self, fortune):
+        """Write a fortune on at least a write quorum of replicas."""
+
+        write_quorum = self.write_quorum
+        self._reachable(write_quorum, "Write")
+        records = [[[self._tick(), self.owner.id], fortune]]
+        self.quorum_store(records)
+        if write_quorum > 1:
+            results, failures = self.peer_list.broadcast(
+                "quorum_store", records, timeout=self.timeout,
+                quorum=write_quorum - 1)
+            if len(results) < write_quorum - 1:
+                raise Exception("Write quorum of {} not reached: {}".format(
+                    write_quorum, failures))
+
+    def quorum_store(self, records):
+        """Store the [key, fortune] records that are not here yet."""
+
+        tickets = []
+        self.rwlock.write_acquire()
+        try:
+            with open(self.keys_file, "a") as file:
+                for key, fortune in records:
+                    key = tuple(key)
+                    self._witness(key[0])
+                    if key in self.positions:
+                        continue
+                    position = len(self.db)
+                    tickets.append(self.db.append(fortune))
+                    file.write("{} {} {}\n".format(key[0], key[1], position))
+                    self.positions[key] = position
+                    self.keys.append(key)
+                    self.digest[0] += 1
+                    self.digest[1] ^= hash(key)
+        finally:
+            self.rwlock.write_release()
+        for ticket in tickets:
+            self.db.commit(ticket)
+        return len(tickets)
+
+    def quorum_digest(self):
+        self.rwlock.read_acquire()
+        try:
+            return list(self.digest)
+        finally:
+            self.rwlock.read_release()
+
+    def quorum_keys(self):
+        self.rwlock.read_acquire()
+        try:
+            return [list(key) for key in self.keys]
+        finally:
+            self.rwlock.read_release()
+
+    def quorum_records(self, keys):
+        self.rwlock.read_acquire()
+        try:
+            return [[list(key), self.db.record(self.positions[tuple(key)])]
+                    for key in keys if tuple(key) in self.positions]
+        finally:
+            self.rwlock.read_release()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Author: Sergiu Rafiliu (sergiu.rafiliu@liu.se)
+# Modified: 18 October 2026
+#
+# Copyright 2012-2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Local name service.
+
+Stand-in for the course name service, e.g., to run the labs on a
+machine without access to it:
+
+    ./nameService.py -p 42424 &
+    export TDDD25_NAME_SERVICE=localhost:42424
+
+"""
+
+import sys
+import time
+import socket
+import argparse
+
+sys.path.append("../modules")
+from Common import orb
+from Common.nameService import NameService
+from Common.nameServiceLocation import name_service_address
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Name service for the objects of the labs."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-p", "--port", metavar="PORT", dest="port", type=int,
+    default=name_service_address[1],
+    help="Set the port to listen to. "
+         "Default: {}.".format(name_service_address[1])
+)
+parser.add_argument(
+    "-c", "--check", metavar="SECONDS", dest="check", type=float, default=0,
+    help="Remove the objects that no longer answer every SECONDS seconds. "
+         "Default: 0, never."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+name_service = NameService()
+skeleton = orb.Skeleton(name_service, ("", opts.port))
+skeleton.start()
+
+print("Listening to: {}:{}".format(socket.gethostname(), opts.port))
+print("Press Ctrl-C to stop the name service...")
+
+try:
+    while True:
+        if opts.check > 0:
+            time.sleep(opts.check)
+            name_service.check()
+        else:
+            time.sleep(3600)
+except KeyboardInterrupt:
+    pass